@@ -1,6 +1,27 @@
-import pandas as pd
+"""
+Datos de las estaciones Cesens (clima y suelo) para los notebooks.
+
+Los Excel no se leen al importar el módulo, sino la primera vez que se usa
+cada conjunto (climate_data, soil_mini1_data, soil_mini2_data o sus listas
+*_dfs). Los archivos de un conjunto se leen en paralelo, uno por proceso, y el
+resultado concatenado se guarda en data/.cache como .npz (un array por
+columna). Mientras no cambien la fecha de modificación ni el tamaño de los
+Excel, las siguientes cargas leen solo esa copia.
+
+Las columnas de texto se guardan como cadenas junto con una máscara de las
+celdas vacías, que vuelven a ser NaN al cargar. Si una columna mezcla texto con
+otros tipos no se puede guardar sin pickle y el conjunto no se guarda en caché.
+"""
+
+import json
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
+import numpy as np
+import pandas as pd
+
 # Ruta base relativa al archivo actual
 base_path = Path(__file__).resolve().parent / "data"
 
@@ -12,23 +33,153 @@ irrigation_path = base_path / "old_obsolete_data" / "RIEGOS ALMENDRO2024.csv"
 soil_mini1_path = soil_path / "mini1"
 soil_mini2_path = soil_path / "mini2"
 
-# Cargar todos los Excel de clima
+cache_path = base_path / ".cache"
+
+# Excel de clima y de suelo
 climate_files = sorted(climate_path.glob("*.xlsx"))
-climate_dfs = [pd.read_excel(f, parse_dates=["Fecha"]) for f in climate_files]
 
-# Cargar todos los Excel de suelo
 soil_files = {
-    "mini_1": list(sorted(soil_mini1_path.glob("*.xlsx"))), 
+    "mini_1": list(sorted(soil_mini1_path.glob("*.xlsx"))),
     "mini_2" : list(sorted(soil_mini2_path.glob("*.xlsx")))
 }
 
-soil_mini1_dfs = [pd.read_excel(f, parse_dates=["Fecha"]) for f in soil_files['mini_1']]
-soil_mini2_dfs = [pd.read_excel(f, parse_dates=["Fecha"]) for f in soil_files['mini_2']]
+# Conjunto de datos -> Excel que lo forman (un archivo por año)
+DATASETS = {
+    "climate_data": climate_files,
+    "soil_mini1_data": soil_files["mini_1"],
+    "soil_mini2_data": soil_files["mini_2"],
+}
+# Listas con un DataFrame por archivo
+FILE_LISTS = {
+    "climate_dfs": "climate_data",
+    "soil_mini1_dfs": "soil_mini1_data",
+    "soil_mini2_dfs": "soil_mini2_data",
+}
+META_KEY = "__meta__"
+CACHE_VERSION = 2  # 2: columnas de texto con máscara de celdas vacías
+
+
+def __getattr__(name):
+    # Solo se llama para los nombres que aún no existen en el módulo
+    if name in DATASETS:
+        value = load_dataset(name)
+    elif name in FILE_LISTS:
+        value = split_files(FILE_LISTS[name])
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted([*globals(), *DATASETS, *FILE_LISTS])
+
+
+def load_dataset(name, refresh=False):
+    """Conjunto concatenado (todos los años); con refresh=True se vuelven a leer los Excel"""
+    files = DATASETS[name]
+    sources = source_stamps(files)
+    if not refresh:
+        cached = read_cache(name)
+        if cached is not None and cached[1].get("version") == CACHE_VERSION and cached[1]["sources"] == sources:
+            return cached[0]
+
+    dfs = read_excels(files)
+    data = pd.concat(dfs, ignore_index=True)
+    files_meta = [{"rows": len(df), "dtypes": df.dtypes.astype(str).tolist()} for df in dfs]
+    write_cache(name, data, sources, files_meta)
+    return data
+
+
+def split_files(name):
+    """Un DataFrame por Excel del conjunto, como si se hubiera leído cada archivo por separado"""
+    data = globals().get(name)
+    if data is None:
+        data = __getattr__(name)
+    files_meta = read_cache(name)[1]["files"]
+    bounds = np.cumsum([0, *(f["rows"] for f in files_meta)])
+    dfs = []
+    for start, end, f in zip(bounds[:-1], bounds[1:], files_meta):
+        # Al concatenar, un entero de un año sin huecos pasa a float si otro año tiene huecos
+        df = data.iloc[start:end].reset_index(drop=True)
+        dfs.append(df.astype(dict(zip(df.columns, f["dtypes"]))))
+    return dfs
+
+
+def source_stamps(files):
+    """Nombre, fecha de modificación y tamaño de cada Excel (si cambia alguno, la caché no vale)"""
+    stamps = []
+    for f in files:
+        stat = f.stat()
+        stamps.append([f.name, stat.st_mtime_ns, stat.st_size])
+    return stamps
+
+
+def read_excel(path):
+    return pd.read_excel(path, parse_dates=["Fecha"])
+
+
+def read_excels(files):
+    """Leer los Excel en paralelo: openpyxl es lento y cada archivo se lee en su propio proceso"""
+    workers = min(len(files), os.cpu_count() or 1)
+    if workers <= 1:
+        return [read_excel(f) for f in files]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(read_excel, files))
+
+
+def read_cache(name):
+    """(DataFrame, metadatos) de la copia guardada, o None si no existe o no se puede leer"""
+    path = cache_path / f"{name}.npz"
+    if not path.exists():
+        return None
+    try:
+        with np.load(path, allow_pickle=False) as arrays:
+            meta = json.loads(bytes(arrays[META_KEY]).decode())
+            columns = {}
+            for i, column in enumerate(meta["columns"]):
+                values = arrays[f"c{i}"]
+                if f"m{i}" in arrays.files:
+                    # Columna de texto: las celdas vacías vuelven a ser NaN
+                    values = values.astype(object)
+                    values[arrays[f"m{i}"]] = np.nan
+                columns[column] = values
+            data = pd.DataFrame(columns)
+    except Exception:
+        # Copia dañada o de otra versión: se vuelve a leer de los Excel
+        return None
+    return data, meta
+
 
-# Concatenar todos los años
-climate_data = pd.concat(climate_dfs, ignore_index=True)
-soil_mini1_data = pd.concat(soil_mini1_dfs, ignore_index=True)
-soil_mini2_data = pd.concat(soil_mini2_dfs, ignore_index=True)
+def write_cache(name, data, sources, files_meta):
+    """Guardar el conjunto concatenado (escritura atómica); si alguna columna no se puede guardar, se borra la copia"""
+    cache_path.mkdir(exist_ok=True)
+    meta = {"version": CACHE_VERSION, "columns": [str(column) for column in data.columns],
+            "sources": sources, "files": files_meta}
+    arrays = {}
+    for i, (_, column) in enumerate(data.items()):
+        try:
+            values, missing = plain_array(column)
+        except ValueError:
+            (cache_path / f"{name}.npz").unlink(missing_ok=True)
+            return
+        arrays[f"c{i}"] = values
+        if missing is not None:
+            arrays[f"m{i}"] = missing
+    with tempfile.NamedTemporaryFile(dir=cache_path, suffix=".tmp", delete=False) as f:
+        np.savez(f, **arrays, **{META_KEY: np.frombuffer(json.dumps(meta).encode(), dtype=np.uint8)})
+    os.replace(f.name, cache_path / f"{name}.npz")
 
 
+def plain_array(values):
+    """(array sin objetos de Python, máscara de celdas vacías o None); ValueError si la columna mezcla tipos.
 
+    Sin objetos de Python el .npz se lee con allow_pickle=False.
+    """
+    values = np.asarray(values)
+    if values.dtype != object:
+        return values, None
+    missing = pd.isna(values)
+    if not all(isinstance(value, str) for value in values[~missing]):
+        raise ValueError("La columna mezcla texto con otros tipos")
+    return np.where(missing, "", values).astype(str), missing
@@ -2,6 +2,11 @@ from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_login import LoginManager
+from app.jobs import JobManager
+from app.model_cache import ModelCache
+from app.forecast_cache import ForecastCache
+from app.plots import PlotRenderer
+from app.job_store import JobStore
 
 
 db = SQLAlchemy()
@@ -9,6 +14,11 @@ migrate = Migrate()
 login_manager = LoginManager()
 login_manager.login_view = 'main.login'        # nombre de la vista de login
 login_manager.login_message_category = 'info'  # categoría de flash de Flask
+job_manager = JobManager()
+models_lru = ModelCache()
+forecasts_lru = ForecastCache()
+plot_renderer = PlotRenderer()
+job_records = JobStore()
 
 
 def create_app():
@@ -18,11 +28,19 @@ def create_app():
     db.init_app(app)
     migrate.init_app(app, db)
     login_manager.init_app(app)
+    job_manager.init_app(app)
+    models_lru.init_app(app)
+    forecasts_lru.init_app(app)
+    plot_renderer.init_app(app)
+    job_records.init_app(app)
 
 
     from .routes import main
     app.register_blueprint(main)
 
+    from .cli import datasets_cli
+    app.cli.add_command(datasets_cli)
+
     # user_loader (import dentro para evitar circulares al importar modelos)
     from app.models import User
     @login_manager.user_loader
@@ -0,0 +1,421 @@
+# app/artifacts.py
+"""
+Formato compacto de los modelos entrenados.
+
+En lugar de serializar con joblib el SARIMAXResults/VARResults completo (con
+los datos de entrenamiento y todas las matrices intermedias) se guardan solo
+los arrays numéricos necesarios para predecir:
+
+- SARIMA/SARIMAX: parámetros, matrices del sistema en espacio de estados,
+  estado predicho tras la última observación y coeficientes de las exógenas.
+- VAR: coeficientes de cada retardo y término independiente.
+- Escalador compartido: centro y escala de cada columna.
+
+Cada artefacto es un .npz sin comprimir (los metadatos van en JSON dentro del
+propio archivo), así que los arrays se pueden cargar con memory-map. Los
+modelos que no admiten este formato (LSTM) se siguen guardando con joblib.
+"""
+
+import json
+import struct
+import zipfile
+from pathlib import Path
+from types import SimpleNamespace
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler, RobustScaler
+
+from app.ml_models import MODELS_PATH, SarimaModel, SarimaxModel, VarModel, SharedScaler
+
+
+FORMAT_VERSION = 1
+COMPACT_EXTENSION = ".npz"
+JOBLIB_EXTENSION = ".pkl"
+MODEL_EXTENSIONS = (COMPACT_EXTENSION, JOBLIB_EXTENSION)
+
+META_KEY = "__meta__"
+
+# Parámetros que get_params devuelve como tupla y JSON guarda como lista
+TUPLE_PARAMS = ("order", "seasonal_order")
+
+
+# =========================
+# RESULTADOS COMPACTOS
+# =========================
+class CompactStateSpaceResults:
+    """Lo mínimo de un SARIMAXResults para hacer get_forecast"""
+
+    def __init__(self, params, transition, design, state_intercept, obs_intercept, state,
+                 exog_coefs, index_start, index_freq):
+        self.params = params
+        self.transition = transition
+        self.design = design
+        self.state_intercept = state_intercept
+        self.obs_intercept = obs_intercept
+        self.state = state
+        self.exog_coefs = exog_coefs
+        self.index_start = index_start
+        self.index_freq = index_freq
+
+    @classmethod
+    def from_results(cls, results):
+        """Extraer los arrays de un SARIMAXResults; None si el sistema no es invariante en el tiempo"""
+        model = results.model
+        ssm = model.ssm
+
+        transition = _time_invariant(ssm['transition'], matrix=True)
+        design = _time_invariant(ssm['design'], matrix=True)
+        state_intercept = _time_invariant(ssm['state_intercept'])
+        if transition is None or design is None or state_intercept is None:
+            return None
+
+        params = np.asarray(results.params, dtype=float)
+        exog_coefs = params[model.k_trend:model.k_trend + model.k_exog]
+        if model.k_exog:
+            # Con exógenas el término de observación es exog @ beta, se recalcula al predecir
+            obs_intercept = np.zeros(design.shape[0])
+        else:
+            obs_intercept = _time_invariant(ssm['obs_intercept'])
+            if obs_intercept is None:
+                return None
+
+        index_start, index_freq = _forecast_index_start(model)
+
+        return cls(params, transition, design, state_intercept, obs_intercept,
+                   np.asarray(results.predicted_state[:, -1], dtype=float),
+                   exog_coefs, index_start, index_freq)
+
+    def forecast(self, steps, exog=None):
+        state = self.state.copy()
+        values = np.empty(steps)
+        obs_intercept = np.zeros(steps) + self.obs_intercept[0]
+        if len(self.exog_coefs):
+            obs_intercept += np.asarray(exog, dtype=float)[:steps] @ self.exog_coefs
+
+        for t in range(steps):
+            values[t] = self.design[0] @ state + obs_intercept[t]
+            state = self.transition @ state + self.state_intercept
+
+        return pd.Series(values, index=_forecast_index(self.index_start, self.index_freq, steps),
+                         name='predicted_mean')
+
+    def get_forecast(self, steps, exog=None):
+        return SimpleNamespace(predicted_mean=self.forecast(steps, exog))
+
+    def to_arrays(self):
+        return {
+            'params': self.params,
+            'transition': self.transition,
+            'design': self.design,
+            'state_intercept': self.state_intercept,
+            'obs_intercept': self.obs_intercept,
+            'state': self.state,
+            'exog_coefs': self.exog_coefs,
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays, meta):
+        return cls(arrays['params'], arrays['transition'], arrays['design'], arrays['state_intercept'],
+                   arrays['obs_intercept'], arrays['state'], arrays['exog_coefs'],
+                   meta['index_start'], meta['index_freq'])
+
+
+class CompactVarResults:
+    """Lo mínimo de un VARResults para hacer forecast"""
+
+    def __init__(self, coefs, intercept):
+        self.coefs = coefs
+        self.intercept = intercept
+        self.k_ar = coefs.shape[0]
+
+    @classmethod
+    def from_results(cls, results):
+        if results.trend != 'c' or results.exog is not None:
+            return None
+        return cls(np.asarray(results.coefs, dtype=float), np.asarray(results.intercept, dtype=float))
+
+    def forecast(self, y, steps):
+        k_ar, neqs, _ = self.coefs.shape
+        # [A_1 | A_2 | ... | A_p] para multiplicar por [y_t, y_t-1, ..., y_t-p+1] de una vez
+        stacked_coefs = self.coefs.transpose(1, 0, 2).reshape(neqs, k_ar * neqs)
+
+        history = np.empty((k_ar + steps, neqs))
+        history[:k_ar] = np.asarray(y, dtype=float)[-k_ar:]
+        for t in range(steps):
+            lags = history[t:t + k_ar][::-1].reshape(-1)
+            history[k_ar + t] = self.intercept + stacked_coefs @ lags
+
+        return history[k_ar:]
+
+    def to_arrays(self):
+        return {'coefs': self.coefs, 'intercept': self.intercept}
+
+    @classmethod
+    def from_arrays(cls, arrays, meta):
+        return cls(arrays['coefs'], arrays['intercept'])
+
+
+class CompactScaler:
+    """Escalado por columnas (x - centro) / escala equivalente al ColumnTransformer de entrenamiento"""
+
+    def __init__(self, columns, center, scale):
+        self.columns = list(columns)
+        self.center = center
+        self.scale = scale
+
+    @classmethod
+    def from_column_transformer(cls, column_transformer):
+        """None si el ColumnTransformer usa transformaciones que no son centro/escala"""
+        columns, center, scale = [], [], []
+        for _, transformer, selected in column_transformer.transformers_:
+            if transformer == 'drop' or len(selected) == 0:
+                continue
+            selected = [column_transformer.feature_names_in_[c] if isinstance(c, (int, np.integer)) else c
+                        for c in selected]
+            n = len(selected)
+
+            if transformer == 'passthrough':
+                c, s = np.zeros(n), np.ones(n)
+            elif isinstance(transformer, StandardScaler):
+                c = transformer.mean_ if transformer.with_mean else np.zeros(n)
+                s = transformer.scale_ if transformer.with_std else np.ones(n)
+            elif isinstance(transformer, RobustScaler):
+                c = transformer.center_ if transformer.with_centering else np.zeros(n)
+                s = transformer.scale_ if transformer.with_scaling else np.ones(n)
+            else:
+                return None
+
+            columns.extend(selected)
+            center.extend(c)
+            scale.extend(s)
+
+        return cls(columns, np.asarray(center, dtype=float), np.asarray(scale, dtype=float))
+
+    def transform(self, X):
+        values = (X[self.columns].to_numpy(dtype=float) - self.center) / self.scale
+        return pd.DataFrame(values, index=X.index, columns=self.columns)
+
+    def inverse_transform(self, X):
+        values = np.asarray(X, dtype=float) * self.scale + self.center
+        return pd.DataFrame(values, index=getattr(X, 'index', None), columns=self.columns)
+
+
+# =========================
+# GUARDAR / CARGAR
+# =========================
+def save_model(name, pipeline, models_path=MODELS_PATH):
+    """Guardar un pipeline en formato compacto si es posible y, si no, con joblib"""
+    compact_path = models_path / f"{name}_model{COMPACT_EXTENSION}"
+    joblib_path = models_path / f"{name}_model{JOBLIB_EXTENSION}"
+
+    packed = _pack_pipeline(pipeline)
+    if packed is not None:
+        arrays, meta = packed
+        _write_npz(compact_path, arrays, meta)
+        save_path, stale_path = compact_path, joblib_path
+    else:
+        joblib.dump(pipeline, joblib_path)
+        save_path, stale_path = joblib_path, compact_path
+
+    # Que no convivan dos versiones del mismo modelo en formatos distintos
+    stale_path.unlink(missing_ok=True)
+    return save_path
+
+
+def load_model(path, mmap=False):
+    """Cargar un modelo listo para predecir, sea compacto (.npz) o joblib (.pkl)"""
+    path = Path(path)
+    if path.suffix != COMPACT_EXTENSION:
+        return joblib.load(path)
+
+    arrays, meta = _read_npz(path, mmap)
+    return _unpack_pipeline(arrays, meta)
+
+
+def save_scaler(column_transformer, filename, models_path=MODELS_PATH):
+    """Guardar el escalador compartido; en .npz si es posible, si no con joblib"""
+    compact = CompactScaler.from_column_transformer(column_transformer)
+    path = models_path / filename
+    if compact is None or path.suffix != COMPACT_EXTENSION:
+        joblib.dump(column_transformer, path)
+    else:
+        meta = {'format': FORMAT_VERSION, 'kind': 'scaler', 'columns': compact.columns}
+        _write_npz(path, {'center': compact.center, 'scale': compact.scale}, meta)
+    return path
+
+
+def load_scaler(path, mmap=False):
+    path = Path(path)
+    if path.suffix != COMPACT_EXTENSION:
+        return joblib.load(path)
+    arrays, meta = _read_npz(path, mmap)
+    return CompactScaler(meta['columns'], arrays['center'], arrays['scale'])
+
+
+def find_model_files(pattern="*", models_path=MODELS_PATH):
+    """Archivos de modelos (en cualquier formato) cuyo nombre encaja con el patrón"""
+    files = []
+    for extension in MODEL_EXTENSIONS:
+        files.extend(models_path.glob(f"{pattern}_model{extension}"))
+    return sorted(files)
+
+
+def model_file(name, models_path=MODELS_PATH):
+    """Ruta del modelo guardado con ese nombre, o None si no existe"""
+    for extension in MODEL_EXTENSIONS:
+        path = models_path / f"{name}_model{extension}"
+        if path.exists():
+            return path
+    return None
+
+
+def model_name(path):
+    """Nombre del modelo a partir de su archivo (sin '_model' ni extensión)"""
+    return Path(path).stem.replace('_model', '')
+
+
+# =========================
+# AUXILIARES
+# =========================
+def _pack_pipeline(pipeline):
+    if not isinstance(pipeline, Pipeline) or len(pipeline.steps) != 2:
+        return None
+    (_, scaler), (step_name, estimator) = pipeline.steps
+    if not isinstance(scaler, SharedScaler):
+        return None
+
+    if isinstance(estimator, (SarimaModel, SarimaxModel)):
+        results = CompactStateSpaceResults.from_results(estimator.fitted_model)
+        extra = {} if results is None else {'index_start': results.index_start, 'index_freq': results.index_freq}
+    elif isinstance(estimator, VarModel):
+        results = CompactVarResults.from_results(estimator.fitted_model)
+        extra = {}
+    else:
+        return None
+
+    if results is None:
+        return None
+
+    meta = {
+        'format': FORMAT_VERSION,
+        'kind': 'pipeline',
+        'scaler': scaler.get_params(),
+        'step': step_name,
+        'estimator': type(estimator).__name__,
+        'params': estimator.get_params(),
+        'attrs': {k: v for k, v in vars(estimator).items() if k.endswith('_') and not k.startswith('_')},
+        **extra,
+    }
+    if isinstance(estimator, SarimaxModel):
+        # exog_cols forma parte del estado (se rellena en fit si venía vacío)
+        meta['params'].update(target_col=estimator.target_col, exog_cols=list(estimator.exog_cols))
+
+    return results.to_arrays(), meta
+
+
+def _unpack_pipeline(arrays, meta):
+    estimator_classes = {'SarimaModel': SarimaModel, 'SarimaxModel': SarimaxModel, 'VarModel': VarModel}
+
+    params = dict(meta['params'])
+    for key in TUPLE_PARAMS:
+        if key in params:
+            params[key] = tuple(params[key])
+
+    estimator = estimator_classes[meta['estimator']](**params)
+    if meta['estimator'] == 'VarModel':
+        estimator.fitted_model = CompactVarResults.from_arrays(arrays, meta)
+    else:
+        estimator.fitted_model = CompactStateSpaceResults.from_arrays(arrays, meta)
+    for key, value in meta.get('attrs', {}).items():
+        setattr(estimator, key, value)
+
+    return Pipeline([
+        ("scaler", SharedScaler(**meta['scaler'])),
+        (meta['step'], estimator),
+    ])
+
+
+def _time_invariant(array, matrix=False):
+    """Matriz del sistema sin la dimensión temporal; None si cambia con el tiempo"""
+    array = np.asarray(array, dtype=float)
+    time_axis = 2 if matrix else 1
+    if array.ndim <= time_axis:
+        return array
+    if not np.allclose(array, array.take([-1], axis=time_axis)):
+        return None
+    return array.take(-1, axis=time_axis)
+
+
+def _forecast_index_start(model):
+    index = getattr(model, '_index', None)
+    if isinstance(index, pd.DatetimeIndex) and index.freq is not None:
+        return (index[-1] + index.freq).isoformat(), index.freqstr
+    if index is not None and len(index) and isinstance(index[-1], (int, np.integer)):
+        return int(index[-1]) + 1, None
+    return int(model.nobs), None
+
+
+def _forecast_index(start, freq, steps):
+    if freq is None:
+        return pd.RangeIndex(start, start + steps)
+    return pd.date_range(start=start, periods=steps, freq=freq)
+
+
+def _json_default(value):
+    if isinstance(value, np.integer):
+        return int(value)
+    if isinstance(value, np.floating):
+        return float(value)
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    return str(value)
+
+
+def _write_npz(path, arrays, meta):
+    meta_bytes = json.dumps(meta, default=_json_default).encode()
+    # Escritura atómica: un lector concurrente nunca ve un archivo a medias
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, **arrays, **{META_KEY: np.frombuffer(meta_bytes, dtype=np.uint8)})
+    tmp_path.replace(path)
+
+
+def _read_npz(path, mmap=False):
+    if mmap:
+        arrays = _memmap_npz(path)
+    else:
+        with np.load(path, allow_pickle=False) as data:
+            arrays = {key: data[key] for key in data.files}
+    meta = json.loads(bytes(arrays.pop(META_KEY)).decode())
+    return arrays, meta
+
+
+def _memmap_npz(path):
+    """Mapear en memoria cada array de un .npz sin comprimir (np.savez)"""
+    arrays = {}
+    with zipfile.ZipFile(path) as archive, open(path, 'rb') as f:
+        for info in archive.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError(f"{path} está comprimido y no se puede mapear en memoria")
+
+            # Cabecera local del zip: 30 bytes fijos + nombre + campo extra
+            f.seek(info.header_offset + 26)
+            name_length, extra_length = struct.unpack('<HH', f.read(4))
+            f.seek(info.header_offset + 30 + name_length + extra_length)
+
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+
+            key = info.filename[:-len(".npy")]
+            if 0 in shape:
+                arrays[key] = np.empty(shape, dtype=dtype)
+            else:
+                arrays[key] = np.memmap(path, dtype=dtype, mode='r', offset=f.tell(), shape=shape,
+                                        order='F' if fortran_order else 'C')
+    return arrays
@@ -1,23 +1,18 @@
-import joblib
 from pathlib import Path
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
-import seaborn as sns
 import numpy as np
 import pandas as pd
-import base64
-import io
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from app.ml_models import SarimaModel, SarimaxModel, VarModel, LSTMModel
+from app import models_lru
+from app.plots import render_plots
+from app.artifacts import load_model, find_model_files, model_name as artifact_model_name
+from app.datasets import load_dataset, model_variables
 
 
 MODELS_PATH = Path(__file__).resolve().parent / "models"
 UPLOAD_FOLDER = Path(__file__).resolve().parent.parent / "uploads"
 
-# Configuración de gráficos
-plt.style.use('seaborn-v0_8-darkgrid')
-sns.set_palette("husl")
-
 # ====================
 # FUNCIONES DE PREDICCIÓN
 # ====================
@@ -37,29 +32,30 @@ def load_selected_models(selected_types, progress_tracker):
 
     model_files = []
     for type in selected_types:
-        model_files.extend(MODELS_PATH.glob(f"{type}_*.pkl"))
+        model_files.extend(find_model_files(f"{type}_*"))
     # model_files.extend(MODELS_PATH.iterdir())
     
     if not model_files:
-        progress_tracker.update_progress(1, '❌ No se encontraron archivos .pkl')
+        progress_tracker.update_progress(1, '❌ No se encontraron modelos guardados')
         return models, progress_tracker
 
 
     
-    progress_tracker.update_progress(1, f'📁 Encontrados {len(model_files)} archivos .pkl')
+    progress_tracker.update_progress(1, f'📁 Encontrados {len(model_files)} modelos guardados')
     
     for file_path in model_files:
 
 
-        model_name = file_path.stem.replace('_model', '')
+        model_name = artifact_model_name(file_path)
         progress_tracker.update_progress(1, f'  📥 Cargando modelo: {model_name}', 
                        is_substep=True, substep_total=len(model_files))
         
         try:
-            model = joblib.load(file_path)
+            model, cached = models_lru.get(file_path, load_model)
 
             models[model_name] = model
-            progress_tracker.update_progress(1, f'    ✅ {model_name} cargado exitosamente',
+            status = 'ya estaba en memoria' if cached else 'cargado exitosamente'
+            progress_tracker.update_progress(1, f'    ✅ {model_name} {status}',
                            is_substep=True, substep_total=len(model_files))
         except Exception as e:
             progress_tracker.update_progress(1, f'    ❌ Error cargando {model_name}: {str(e)}',
@@ -76,24 +72,14 @@ def load_selected_file(file_path: str, progress_tracker) -> pd.DataFrame:
 
     file_path = UPLOAD_FOLDER / file_path 
 
-    # Cargar datos (ajusta según tu fuente real)
-    df = pd.read_csv(file_path, index_col='Fecha', parse_dates=True)
-
     try:
         progress_tracker.update_progress(2, f'📁 Cargando datos de: {file_path}')
 
-        # Verificar que el índice es temporal y está ordenado
-        if not isinstance(df.index, pd.DatetimeIndex):
-            df.index = pd.to_datetime(df.index)
-        
-        df = df.sort_index()
-        
-        # Completar fechas faltantes si es necesario
-        full_date_range = pd.date_range(start=df.index.min(), end=df.index.max(), freq='D')
-        df = df.reindex(full_date_range)
-        
-        # Interpolar valores faltantes
-        df = df.interpolate(method='time')
+        # Copia diaria, ordenada e interpolada del CSV (solo se vuelve a leer el CSV si ha cambiado)
+        df, cached = load_dataset(file_path)
+        if cached:
+            progress_tracker.update_progress(2, '♻️ Datos recuperados de la caché')
+        df = model_variables(df)
 
         # Mostrar primeras y últimas filas
         progress_tracker.update_progress(2, '📊 Primeras 3 filas:')
@@ -118,23 +104,87 @@ def load_selected_file(file_path: str, progress_tracker) -> pd.DataFrame:
 
     return df
 
-def make_future_predictions(progress_tracker, loaded_models: dict, last_available_data: pd.DataFrame, horizon: int = 45):
-    """Hacer predicciones futuras con modelos cargados"""
+def make_future_predictions(progress_tracker, loaded_models: dict, last_available_data: pd.DataFrame, horizon: int = 45,
+                            n_jobs: int = 1, timeout: float = None):
+    """Hacer predicciones futuras con modelos cargados
+
+    Con n_jobs > 1 (o con timeout) los modelos predicen a la vez en un pool de hilos.
+    timeout es el tiempo máximo en segundos de cada modelo: si se supera, se descarta su
+    predicción y el resto continúa. Devuelve (predicciones, descartados): las predicciones
+    conservan el orden de loaded_models, del que depende unify_predictions, y descartados
+    asocia cada modelo sin predicción (por error, tiempo agotado o sin llegar a ejecutarse)
+    con el motivo.
+    """
     
     predictions = {}
+    discarded = {}
     
     progress_tracker.update_progress(3, f'🎯 Generando predicciones para {horizon} días')
 
-
-    for name, model in loaded_models.items():
+    if n_jobs <= 1 and timeout is None:
+        for name, model in loaded_models.items():
+            try:
+                pred = model.predict(last_available_data, n_periods=horizon)
+                predictions[name] = pred
+                progress_tracker.update_progress(3, f'✓ Predicción futura generada para {name}')
+            except Exception as e:
+                discarded[name] = f'error: {e}'
+                progress_tracker.update_progress(3, f'✗ Error en predicción para {name}: {str(e)}')
+        
+        return predictions, discarded
+
+    # Instante en que cada modelo empieza a predecir (los que esperan en cola no consumen su tiempo)
+    started = {}
+
+    def predict(name, model):
+        started[name] = time.monotonic()
+        return model.predict(last_available_data, n_periods=horizon)
+
+    workers = max(1, n_jobs)
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="predict")
+    futures = {name: executor.submit(predict, name, model) for name, model in loaded_models.items()}
+    pending = set(futures.values())
+    timed_out = set()
+    skipped = set()
+
+    while pending:
+        done, pending = wait(pending, timeout=0.1 if timeout is not None else None, return_when=FIRST_COMPLETED)
+        if timeout is None:
+            continue
+        now = time.monotonic()
+        for name, future in futures.items():
+            if future in pending and name in started and now - started[name] > timeout:
+                # El hilo no se puede interrumpir: termina por su cuenta y su resultado se ignora
+                timed_out.add(name)
+                pending.discard(future)
+
+        # Si todos los hilos están ocupados por modelos descartados, los que esperan no arrancarían nunca
+        if sum(not futures[name].done() for name in timed_out) >= workers:
+            for name, future in futures.items():
+                if future in pending and future.cancel():
+                    skipped.add(name)
+                    pending.discard(future)
+
+    # No se espera a los hilos de los modelos que han superado el tiempo
+    executor.shutdown(wait=False)
+
+    for name, future in futures.items():
+        if name in timed_out:
+            discarded[name] = f'superó el tiempo máximo de {timeout:g} s'
+            progress_tracker.update_progress(3, f'⏱️ {name} superó el tiempo máximo de {timeout:g} s, se descarta')
+            continue
+        if name in skipped:
+            discarded[name] = 'no llegó a ejecutarse'
+            progress_tracker.update_progress(3, f'⏱️ {name} no llegó a ejecutarse: todos los hilos siguen ocupados por modelos descartados')
+            continue
         try:
-            pred = model.predict(last_available_data, n_periods=horizon)
-            predictions[name] = pred
+            predictions[name] = future.result()
             progress_tracker.update_progress(3, f'✓ Predicción futura generada para {name}')
         except Exception as e:
+            discarded[name] = f'error: {e}'
             progress_tracker.update_progress(3, f'✗ Error en predicción para {name}: {str(e)}')
     
-    return predictions
+    return predictions, discarded
 
 
 def unify_predictions(predictions_dict, progress_tracker):
@@ -173,17 +223,20 @@ def unify_predictions(predictions_dict, progress_tracker):
                
     return unified_predictions_dict
 
-def calculate_et0_fao_penman_monteith(df):
+# --- Parámetros de riego ---
+EFICIENCIA_RIEGO = 0.95  # Ajustar según sistema (0.95 para goteo)
+COEF_PRECIPITACION = 0.75 # Porcentaje de lluvia aprovechable (75%)
+UMBRAL_PRECIPITACION = 3  # mm; por debajo la lluvia no se considera efectiva (FAO-56)
+FRACCION_RDC = 0.2  # Fracción de ETc que se repone con riego deficitario controlado
+
+def et0_penman_monteith(T, RH, u2, P, Rs):
     """
-    Calcula la Evapotranspiración de Referencia (ET0) usando la ecuación FAO Penman-Monteith
+    ET0 FAO Penman-Monteith sobre arrays (o Series) de cualquier forma.
+
+    T [°C], RH [%], u2 [m/s], P [hPa], Rs [J/m²/día]
     """
-    
-    # Obtener datos del dataframe
-    T = df['Temperatura']  # Temperatura media del aire [°C]
-    RH = df['Humedad relativa']  # Humedad relativa [%]
-    u2 = df['Velocidad del viento']  # Velocidad del viento a 2m [m/s]
-    P = df['Presión atmosférica'] * 0.1  # Convertir hPa a kPa
-    Rs = df['Radiación solar'] / 1e6  # Convertir J/m²/día a MJ/m²/día
+    P = P * 0.1  # Convertir hPa a kPa
+    Rs = Rs / 1e6  # Convertir J/m²/día a MJ/m²/día
     
     # 1. PRESIÓN DE VAPOR DE SATURACIÓN (es)
     # Fórmula: es = 0.6108 * exp(17.27 * T / (T + 237.3))
@@ -218,21 +271,40 @@ def calculate_et0_fao_penman_monteith(df):
     
     denominador = delta + gamma * (1 + 0.34 * u2)
     
-    et0 = numerador / denominador
-    
-    return et0
+    return numerador / denominador
 
-def calcular_Kc(dia , progress_tracker):
-
-    kc_ini = 0.4
-    kc_mid = 0.9
-    kc_end = 0.65
+def calculate_et0_fao_penman_monteith(df):
+    """
+    Calcula la Evapotranspiración de Referencia (ET0) usando la ecuación FAO Penman-Monteith
+    """
+    return et0_penman_monteith(df['Temperatura'],  # Temperatura media del aire [°C]
+                               df['Humedad relativa'],  # Humedad relativa [%]
+                               df['Velocidad del viento'],  # Velocidad del viento a 2m [m/s]
+                               df['Presión atmosférica'],
+                               df['Radiación solar'])
+
+# Curva de Kc del cultivo: coeficientes de cada etapa y su duración en días
+CURVA_KC = {
+    "kc_ini": 0.4,
+    "kc_mid": 0.9,
+    "kc_end": 0.65,
+    "L_ini": 15,    # Etapa inicial
+    "L_dev": 50,    # Etapa de desarrollo
+    "L_mid": 98,    # Etapa de mediados
+    "L_late": 31,   # Etapa final
+}
+
+def calcular_Kc(dia , progress_tracker, curva=CURVA_KC):
+
+    kc_ini = curva["kc_ini"]
+    kc_mid = curva["kc_mid"]
+    kc_end = curva["kc_end"]
 
         # Duración de las etapas (días)
-    L_ini = 15    # Etapa inicial
-    L_dev = 50    # Etapa de desarrollo  
-    L_mid = 98    # Etapa de mediados
-    L_late = 31   # Etapa final
+    L_ini = curva["L_ini"]    # Etapa inicial
+    L_dev = curva["L_dev"]    # Etapa de desarrollo  
+    L_mid = curva["L_mid"]    # Etapa de mediados
+    L_late = curva["L_late"]   # Etapa final
 
     # Puntos de transición entre etapas
     dia_fin_ini = L_ini
@@ -258,6 +330,13 @@ def calcular_Kc(dia , progress_tracker):
         return kc_end
     
 
+def tabla_Kc(curva=CURVA_KC):
+    """Kc de cada día del año (posición = día del año, 1..366) para indexar en bloque"""
+    curva = {**CURVA_KC, **curva}
+    return np.array([calcular_Kc(dia, None, curva) for dia in range(367)])
+
+KC_POR_DIA = tabla_Kc()
+
 # Calcular ETc para un día específico 
 def calcular_ETc(dia, ETo, progress_tracker):
     """Calcula ETc para un día específico dado ETo"""
@@ -265,6 +344,37 @@ def calcular_ETc(dia, ETo, progress_tracker):
     return kc * ETo
 
 
+def irrigation_kernel(et0, precipitation, day_of_year, kc_table=KC_POR_DIA,
+                      eficiencia=EFICIENCIA_RIEGO, coef_precipitacion=COEF_PRECIPITACION,
+                      fraccion_rdc=FRACCION_RDC):
+    """
+    Necesidades de riego con operaciones sobre arrays completos.
+
+    et0, precipitation y day_of_year pueden tener cualquier forma compatible
+    (p. ej. (n_predicciones, n_dias) para muchas predicciones a la vez).
+    Devuelve un diccionario de arrays con ETc, Pe, NN, NB, ETc_RDC, NN_RDC y NB_RDC.
+    """
+    et0 = np.asarray(et0, dtype=float)
+    precipitation = np.asarray(precipitation, dtype=float)
+
+    etc = kc_table[np.asarray(day_of_year, dtype=np.intp)] * et0
+    # Precipitación efectiva (Pe): solo cuenta la lluvia por encima del umbral
+    pe = np.where(precipitation > UMBRAL_PRECIPITACION, precipitation * coef_precipitacion, 0.0)
+
+    # Necesidades Netas (NN = ETc - Pe) y Brutas (NB = NN / Eficiencia)
+    nn = np.maximum(etc - pe, 0)
+    etc_rdc = etc * fraccion_rdc
+    nn_rdc = np.maximum(etc_rdc - pe, 0)
+
+    return {
+        "ETc": etc,
+        "Pe": pe,
+        "NN": nn,
+        "NB": nn / eficiencia,
+        "ETc_RDC": etc_rdc,
+        "NN_RDC": nn_rdc,
+        "NB_RDC": nn_rdc / eficiencia,
+    }
 
 
 def calculate_irrigation(predictions_df, progress_tracker):
@@ -283,40 +393,14 @@ def calculate_irrigation(predictions_df, progress_tracker):
 
     predictions_df["dia"] = predictions_df.index.dayofyear
 
-    predictions_df["ETc"] = predictions_df.apply(lambda fila: calcular_ETc(fila["dia"], fila["ET0"], progress_tracker), axis=1)
-
-    # --- Configuración de parámetros ---
-    EFICIENCIA_RIEGO = 0.95  # Ajustar según sistema (0.95 para goteo)
-    COEF_PRECIPITACION = 0.75 # Porcentaje de lluvia aprovechable (75%)
-
-    # Definimos la Precipitación Efectiva (Pe)
-    # Se suele considerar efectiva si la lluvia supera un umbral mínimo (3 mm), como indica la FAO-56
-    def calcular_pe(precipitacion):
-        if precipitacion > 3:
-            return precipitacion * COEF_PRECIPITACION
-        return 0
-
-    predictions_df["Pe"] = predictions_df["Precipitaciones"].apply(calcular_pe)
-
-    # Calculamos Necesidades Netas (NN = ETc - Pe)
-    predictions_df["NN"] = (predictions_df["ETc"] - predictions_df["Pe"]).clip(lower=0)
-
-    # Calculamos Necesidades Brutas (NB = NN / Eficiencia)
-    predictions_df["NB"] = predictions_df["NN"] / EFICIENCIA_RIEGO
+    irrigation = irrigation_kernel(predictions_df["ET0"].to_numpy(),
+                                   predictions_df["Precipitaciones"].to_numpy(),
+                                   predictions_df["dia"].to_numpy())
+    for column in ("ETc", "Pe", "NN", "NB", "ETc_RDC", "NN_RDC", "NB_RDC"):
+        predictions_df[column] = irrigation[column]
 
     # Visualizar resultados
     print(predictions_df[["Precipitaciones", "ETc", "Pe", "NN", "NB"]].head())
-
-    # Calculamos ETc_RDC y lo aplicamos al dataframe en su propia columna
-    predictions_df["ETc_RDC"] = predictions_df.apply(lambda fila: calcular_ETc(fila["dia"], fila["ET0"], progress_tracker) * 0.2, axis=1)
-
-    # Calculamos Necesidades Netas (NN = ETc - Pe)
-    predictions_df["NN_RDC"] = (predictions_df["ETc_RDC"] - predictions_df["Pe"]).clip(lower=0)
-
-    # Calculamos Necesidades Brutas (NB = NN / Eficiencia)
-    predictions_df["NB_RDC"] = predictions_df["NN_RDC"] / EFICIENCIA_RIEGO
-
-    # Visualizar resultados
     print(predictions_df[["Precipitaciones", "ETc_RDC", "Pe", "NN_RDC", "NB_RDC"]].head())
     
     progress_tracker.update_progress(5, f'💦 Cálculo completado: {len(predictions_df)} días')
@@ -328,70 +412,12 @@ def calculate_irrigation(predictions_df, progress_tracker):
 
 
 def create_prediction_plots(predictions_df, progress_tracker):
-    """Crear gráficos con actualización de progreso"""
+    """Crear gráficos con actualización de progreso (en el propio hilo; ver app.plots para el pool)"""
     progress_tracker.update_progress(6, '🎨 Generando visualizaciones...')
     
-    plots = {}
-    
-    # Gráfico 1: Riego
-    progress_tracker.update_progress(6, '📊 Creando gráfico de riego...', is_substep=True, substep_total=3)
-    try:
-        fig1, ax1 = plt.subplots(figsize=(12, 6))
-        ax1.plot(predictions_df.index, predictions_df['NB'], 
-                color='blue', linewidth=2, marker='o', markersize=4)
-        ax1.fill_between(predictions_df.index, 0, predictions_df['NB'], 
-                        alpha=0.3, color='lightblue')
-        ax1.set_title('Necesidad de Riego Predicha', fontsize=14, fontweight='bold')
-        ax1.set_xlabel('Fecha')
-        ax1.set_ylabel('Riego (mm/día)')
-        ax1.grid(True, alpha=0.3)
-        ax1.tick_params(axis='x', rotation=45)
-        plt.tight_layout()
-        
-        img1 = io.BytesIO()
-        plt.savefig(img1, format='png', dpi=100, bbox_inches='tight')
-        img1.seek(0)
-        plots['riego'] = base64.b64encode(img1.getvalue()).decode()
-        plt.close(fig1)
-        progress_tracker.update_progress(6, '  ✅ Gráfico de riego generado')
-    except Exception as e:
-        progress_tracker.update_progress(6, f'  ❌ Error en gráfico de riego: {e}')
-    
-    # Gráfico 2: Variables principales
-    progress_tracker.update_progress(6, '📈 Creando gráfico de variables...', is_substep=True, substep_total=3)
-    try:
-        main_vars = []
-        for var in ['Temperatura', 'Humedad relativa', 'Precipitaciones', 'ETc']:
-            matching = [col for col in predictions_df.columns if var in col]
-            if matching:
-                main_vars.append(matching[0])
-        
-        if main_vars and len(main_vars) <= 4:
-            fig2, axes = plt.subplots(2, 2, figsize=(15, 10))
-            axes = axes.flatten()
-            
-            for i, var in enumerate(main_vars[:4]):
-                ax = axes[i]
-                ax.plot(predictions_df.index, predictions_df[var], 
-                       linewidth=2, alpha=0.7)
-                if var == 'ETc':
-                    ax.set_title(f'Cálculo: {var}')
-                ax.set_title(f'Predicción: {var}')
-                ax.set_xlabel('Fecha')
-                ax.set_ylabel(var)
-                ax.grid(True, alpha=0.3)
-                ax.tick_params(axis='x', rotation=45)
-            
-            plt.tight_layout()
-            
-            img2 = io.BytesIO()
-            plt.savefig(img2, format='png', dpi=100, bbox_inches='tight')
-            img2.seek(0)
-            plots['variables'] = base64.b64encode(img2.getvalue()).decode()
-            plt.close(fig2)
-            progress_tracker.update_progress(6, f'  ✅ Gráfico de {len(main_vars)} variables generado')
-    except Exception as e:
-        progress_tracker.update_progress(6, f'  ❌ Error en gráfico de variables: {e}')
+    plots, messages = render_plots(predictions_df)
+    for message in messages:
+        progress_tracker.update_progress(6, message)
     
     progress_tracker.update_progress(6, '✅ Visualizaciones completadas', is_substep=True, substep_total=3)
     return plots
@@ -0,0 +1,61 @@
+# app/cli.py
+"""
+Comandos de mantenimiento (flask <grupo> <comando>).
+
+flask datasets backfill completa los metadatos de los registros de datos
+que no los tienen (anteriores a su introducción, o vaciados por una
+migración) y registra como datos compartidos los CSV de uploads que no
+tienen registro (p. ej. copiados a mano). Procesa cada archivo entero, así
+que se ejecuta aparte, tras `flask db upgrade` o al añadir archivos, y no
+al listar los datos. Se puede repetir: solo procesa lo que sigue pendiente.
+"""
+
+from pathlib import Path
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+from app import db
+from app.ingestion import ingest_file
+from app.models import Dataset
+
+
+datasets_cli = AppGroup("datasets", help="Registros de los archivos de datos subidos")
+
+
+@datasets_cli.command("backfill")
+def backfill_command():
+    """Completar los metadatos pendientes y registrar los CSV de uploads sin registro"""
+    updated, failed = backfill_datasets(Path(current_app.config["UPLOAD_FOLDER"]))
+    click.echo(f"✅ Registros completados: {updated}")
+    for path, error in failed:
+        click.echo(f"❌ Error leyendo {path}: {error}", err=True)
+    if failed:
+        raise click.exceptions.Exit(1)
+
+
+def backfill_datasets(uploads_dir):
+    """Procesar los registros sin metadatos y los CSV sin registro; devuelve (completados, [(ruta, error)])"""
+    pending = Dataset.query.filter(Dataset.content_hash.is_(None)).all()
+    registered = {filename for (filename,) in db.session.query(Dataset.filename).distinct()}
+    pending += [Dataset(filename=path.name, filepath=str(path), user_id=None)
+                for path in sorted(uploads_dir.glob("*.csv")) if path.name not in registered]
+
+    updated, failed = 0, []
+    for dataset in pending:
+        path = Path(dataset.filepath)
+        if not path.is_file():
+            path = uploads_dir / dataset.filename
+        if not path.is_file():
+            continue
+        try:
+            dataset.set_metadata(ingest_file(path))
+        except Exception as e:
+            failed.append((path, e))
+            continue
+        db.session.add(dataset)
+        # Un commit por archivo: lo ya procesado no se pierde si falla o se interrumpe uno posterior
+        db.session.commit()
+        updated += 1
+    return updated, failed
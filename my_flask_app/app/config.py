@@ -8,3 +8,36 @@ class Config:
     )
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     UPLOAD_FOLDER = os.path.join(os.getcwd(), "uploads")
+
+    # Trabajos en segundo plano (entrenamiento y predicción). Su registro, progreso y resultados se
+    # guardan en "memory" o "sqlite" (compartido entre workers de Gunicorn)
+    JOBS_MAX_WORKERS = int(os.environ.get("JOBS_MAX_WORKERS", 2))
+    JOBS_BACKEND = os.environ.get("JOBS_BACKEND", "memory")  # "memory" o "sqlite"
+    JOBS_DB_PATH = os.environ.get("JOBS_DB_PATH", os.path.join(os.getcwd(), "jobs.sqlite3"))
+    # Caducidad (segundos) de los trabajos terminados y número máximo de registros en memoria
+    JOBS_TTL = int(os.environ.get("JOBS_TTL", 24 * 3600))
+    JOBS_MAX_RECORDS = int(os.environ.get("JOBS_MAX_RECORDS", 1000))
+    # Memoria máxima (MB) del progreso y los resultados de los trabajos
+    JOB_STORE_MAX_MB = int(os.environ.get("JOB_STORE_MAX_MB", 256))
+
+    # Número de procesos para entrenar los modelos en paralelo (1 = secuencial). Por defecto se reparten
+    # las CPUs entre los trabajos que pueden ejecutarse a la vez (cada proceso vuelve a importar TensorFlow)
+    TRAINING_N_JOBS = int(os.environ.get("TRAINING_N_JOBS", max(1, (os.cpu_count() or 1) // max(1, JOBS_MAX_WORKERS))))
+
+    # Memoria máxima (MB) para los modelos cargados que se reutilizan entre predicciones
+    # (estimada a partir de sus arrays y del tipo de modelo, no del tamaño de los archivos)
+    MODEL_CACHE_MAX_MB = int(os.environ.get("MODEL_CACHE_MAX_MB", 512))
+
+    # Caché de resultados de predicción: caducidad (segundos) y memoria máxima (MB)
+    FORECAST_CACHE_TTL = int(os.environ.get("FORECAST_CACHE_TTL", 3600))
+    FORECAST_CACHE_MAX_MB = int(os.environ.get("FORECAST_CACHE_MAX_MB", 64))
+
+    # Predicción: modelos que predicen a la vez y tiempo máximo (segundos) por modelo (0 = sin límite)
+    PREDICTION_N_JOBS = int(os.environ.get("PREDICTION_N_JOBS", min(4, os.cpu_count() or 1)))
+    PREDICTION_MODEL_TIMEOUT = float(os.environ.get("PREDICTION_MODEL_TIMEOUT", 120))
+
+    # Gráficos: "png" (renderizados en el servidor) o "json" (series para dibujar en el navegador)
+    PLOT_MODE = os.environ.get("PLOT_MODE", "png")
+    PLOT_WORKERS = int(os.environ.get("PLOT_WORKERS", 1))  # Procesos de renderizado (0 = en el propio trabajo)
+    PLOT_CACHE_SIZE = int(os.environ.get("PLOT_CACHE_SIZE", 128))  # Predicciones con gráficos en caché
+    PLOT_MAX_POINTS = int(os.environ.get("PLOT_MAX_POINTS", 400))  # Puntos máximos por serie en modo json
@@ -0,0 +1,136 @@
+# app/datasets.py
+"""
+Acceso a los archivos de datos subidos.
+
+Cada CSV se lee una sola vez, con la columna de fecha como índice y el resto
+como float64, y se prepara para entrenar y predecir: un valor por día (media
+de las lecturas del día, o suma para la precipitación), índice diario ordenado
+y huecos interpolados en el tiempo. Esa copia limpia se guarda junto al CSV, en
+uploads/.cache, con el mismo formato por columnas que los resultados de
+predicción (Parquet si hay pyarrow y, si no, .npz). El nombre de la copia
+incluye la fecha de modificación y el tamaño del CSV, así que solo se vuelve a
+leer el CSV cuando cambia.
+"""
+
+import csv
+import os
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+
+from app.forecast_results import decode_forecast, encode_forecast, pyarrow
+
+
+CACHE_DIRNAME = ".cache"
+CACHE_EXTENSION = ".parquet" if pyarrow is not None else ".npz"
+SUM_KEYWORDS = ("precipitacion",)  # Variables que se acumulan por día en lugar de promediarse
+# Columnas calculadas a partir del resto (p. ej. la ET0 de las estaciones): no se entrenan ni se predicen
+DERIVED_COLUMNS = ("ET0",)
+
+
+def date_column(columns):
+    """Primera columna cuyo nombre contiene 'fecha'"""
+    for column in columns:
+        if "fecha" in column.lower():
+            return column
+    raise ValueError("El archivo no tiene una columna de fecha")
+
+
+def read_dataset(path):
+    """Leer un CSV de datos en una sola pasada: índice de fechas y columnas numéricas"""
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        header = next(csv.reader(f), [])
+    date_col = date_column(header)
+    dtypes = {column: "float64" for column in header if column != date_col}
+
+    try:
+        return pd.read_csv(path, dtype=dtypes, parse_dates=[date_col], index_col=date_col, encoding="utf-8-sig")
+    except ValueError:
+        # Alguna columna no es numérica: se deja que pandas deduzca los tipos
+        return pd.read_csv(path, parse_dates=[date_col], index_col=date_col, encoding="utf-8-sig")
+
+
+def aggregation(column):
+    """Agregación diaria de una variable: suma para la precipitación y media para el resto"""
+    name = column.lower().replace("ó", "o")
+    return "sum" if any(keyword in name for keyword in SUM_KEYWORDS) else "mean"
+
+
+def daily_totals(df):
+    """Suma y número de valores de cada variable numérica por día.
+
+    Se pueden acumular por bloques (sumando los de bloques distintos) y
+    convertir al final con daily_from_totals.
+    """
+    values = df.select_dtypes("number")
+    days = values.groupby(values.index.normalize())
+    return days.sum(), days.count()
+
+
+def daily_from_totals(sums, counts):
+    """Valores diarios a partir de las sumas y cuentas (NaN los días sin ningún valor)"""
+    daily = sums.copy()
+    for column in daily.columns:
+        if aggregation(column) == "mean":
+            daily[column] = sums[column] / counts[column]
+    return daily.where(counts > 0)
+
+
+def complete_daily(daily):
+    """Ordenar, completar las fechas que faltan con frecuencia diaria e interpolar los huecos"""
+    daily = daily.sort_index()
+    full_date_range = pd.date_range(start=daily.index.min(), end=daily.index.max(), freq="D",
+                                    name=daily.index.name)
+    return daily.reindex(full_date_range).interpolate(method="time")
+
+
+def prepare_daily(df):
+    """Datos diarios limpios: agregados por día (si hay varias lecturas al día), completos e interpolados"""
+    return complete_daily(daily_from_totals(*daily_totals(df)))
+
+
+def model_variables(df):
+    """Variables que entran en los modelos: todas salvo las derivadas"""
+    return df.drop(columns=[column for column in DERIVED_COLUMNS if column in df.columns])
+
+
+def cache_path(path):
+    """Ruta de la copia limpia de un CSV para su versión actual (fecha de modificación y tamaño)"""
+    path = Path(path)
+    stat = path.stat()
+    return path.parent / CACHE_DIRNAME / f"{path.name}.{stat.st_mtime_ns}.{stat.st_size}{CACHE_EXTENSION}"
+
+
+def load_dataset(path):
+    """Datos diarios limpios de un CSV subido; devuelve (DataFrame, si venía de la caché)"""
+    cached = cache_path(path)
+    if cached.exists():
+        try:
+            return decode_forecast(cached.read_bytes()), True
+        except Exception:
+            # Copia dañada (p. ej. escrita a medias por otra versión): se regenera
+            pass
+
+    df = prepare_daily(read_dataset(path))
+    write_cache(path, cached, df)
+    return df, False
+
+
+def write_cache(path, cached, df):
+    """Guardar la copia limpia (escritura atómica) y borrar las de versiones anteriores del CSV"""
+    cached.parent.mkdir(exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=cached.parent, suffix=".tmp", delete=False) as f:
+        f.write(encode_forecast(df))
+    os.replace(f.name, cached)
+    invalidate(path, keep=cached)
+
+
+def invalidate(path, keep=None):
+    """Borrar las copias limpias de un CSV (salvo keep)"""
+    path = Path(path)
+    for cached in (path.parent / CACHE_DIRNAME).glob(f"{path.name}.*"):
+        # <nombre>.<mtime_ns>.<tamaño>.<extensión>: no confundir con las de otro CSV con el mismo prefijo
+        stamp = cached.name[len(path.name) + 1:].split(".")
+        if cached != keep and len(stamp) == 3 and stamp[0].isdigit() and stamp[1].isdigit():
+            cached.unlink(missing_ok=True)
@@ -0,0 +1,159 @@
+# app/evapotranspiration.py
+"""
+ET0 FAO-56 Penman-Monteith completo para muchas estaciones y días a la vez.
+
+A diferencia de calculate_et0_fao_penman_monteith (que usa Rn = 0.77·Rs),
+aquí la radiación neta sigue el capítulo 3 de FAO-56:
+
+    Ra  radiación extraterrestre a partir de la latitud y el día del año (ec. 21)
+    Rso radiación con cielo despejado (ec. 37)
+    Rns radiación neta de onda corta, albedo 0.23 (ec. 38)
+    Rnl radiación neta de onda larga (ec. 39)
+    Rn = Rns - Rnl
+
+Todas las entradas son arrays que se difunden a una forma común, normalmente
+(n_estaciones, n_dias), con la latitud y la altitud como (n_estaciones, 1).
+Los cálculos trabajan sobre unos pocos arrays de trabajo que se reutilizan
+con out=, así que el coste en memoria no crece con el número de términos.
+
+Unidades: temperaturas en °C, humedad relativa en %, viento a 2 m en m/s,
+presión en kPa, Rs en MJ/m²/día, latitud en grados y altitud en m.
+"""
+
+import numpy as np
+
+
+ALBEDO = 0.23
+GSC = 0.0820  # Constante solar [MJ/m²/min]
+SIGMA = 4.903e-9  # Constante de Stefan-Boltzmann [MJ/K⁴/m²/día]
+
+
+def saturation_vapour_pressure(T, out=None):
+    """e°(T) = 0.6108·exp(17.27·T / (T + 237.3)) [kPa] (ec. 11)"""
+    out = np.add(T, 237.3, out=out)
+    np.divide(T, out, out=out)
+    np.multiply(out, 17.27, out=out)
+    np.exp(out, out=out)
+    return np.multiply(out, 0.6108, out=out)
+
+
+def elevation_from_pressure(P):
+    """Altitud [m] que corresponde a la presión atmosférica P [kPa] (inversa de la ec. 7)"""
+    return 293 / 0.0065 * (1 - (np.asarray(P, dtype=float) / 101.3) ** (1 / 5.26))
+
+
+def extraterrestrial_radiation(latitude, day_of_year):
+    """Ra [MJ/m²/día] (ec. 21-25); latitud en grados y día del año 1..366"""
+    phi = np.radians(np.asarray(latitude, dtype=float))
+    J = np.asarray(day_of_year, dtype=float)
+
+    dr = 1 + 0.033 * np.cos(2 * np.pi / 365 * J)  # Distancia relativa inversa Tierra-Sol
+    delta = 0.409 * np.sin(2 * np.pi / 365 * J - 1.39)  # Declinación solar
+    # Ángulo de puesta de sol (acotado para latitudes polares)
+    ws = np.arccos(np.clip(-np.tan(phi) * np.tan(delta), -1, 1))
+
+    return (24 * 60 / np.pi * GSC * dr
+            * (ws * np.sin(phi) * np.sin(delta) + np.cos(phi) * np.cos(delta) * np.sin(ws)))
+
+
+def et0_fao56(T, RH, u2, P, Rs, day_of_year, latitude, T_max=None, T_min=None,
+              RH_max=None, RH_min=None, elevation=None, G=0.0, out=None):
+    """ET0 diaria [mm/día] por FAO-56 Penman-Monteith con la radiación neta completa.
+
+    Sin T_max/T_min se usa la temperatura media para ambas. Con RH_max y RH_min
+    la presión de vapor actual se calcula con la ec. 17; si no, con la humedad
+    relativa media (ec. 19). Sin altitud se deduce de la presión.
+    """
+    T, RH, u2, P, Rs, day_of_year = np.broadcast_arrays(
+        *(np.asarray(a, dtype=float) for a in (T, RH, u2, P, Rs, day_of_year)))
+    T_max = T if T_max is None else np.broadcast_to(np.asarray(T_max, dtype=float), T.shape)
+    T_min = T if T_min is None else np.broadcast_to(np.asarray(T_min, dtype=float), T.shape)
+    if elevation is None:
+        elevation = elevation_from_pressure(P)
+
+    # Arrays de trabajo reutilizados en todo el cálculo
+    shape = T.shape
+    es = np.empty(shape)
+    ea = np.empty(shape)
+    a = np.empty(shape)
+    b = np.empty(shape)
+    out = np.empty(shape) if out is None else out
+
+    # Presión de vapor de saturación media es = (e°(Tmax) + e°(Tmin)) / 2 (ec. 12)
+    e_tmax = saturation_vapour_pressure(T_max, out=a)
+    e_tmin = saturation_vapour_pressure(T_min, out=b)
+    np.add(e_tmax, e_tmin, out=es)
+    np.multiply(es, 0.5, out=es)
+
+    # Presión de vapor actual ea
+    if RH_max is not None and RH_min is not None:
+        # ec. 17: (e°(Tmin)·RHmax + e°(Tmax)·RHmin) / 200
+        np.multiply(e_tmin, RH_max, out=ea)
+        np.multiply(e_tmax, RH_min, out=a)
+        np.add(ea, a, out=ea)
+        np.multiply(ea, 1 / 200, out=ea)
+    else:
+        # ec. 19: RHmedia / 100 · es
+        np.multiply(es, RH, out=ea)
+        np.multiply(ea, 1 / 100, out=ea)
+
+    # Rso = (0.75 + 2e-5·z)·Ra (ec. 37) -> b
+    Ra = extraterrestrial_radiation(latitude, day_of_year)
+    np.multiply(np.broadcast_to(0.75 + 2e-5 * np.asarray(elevation, dtype=float), shape), Ra, out=b)
+
+    # Factor de nubosidad 1.35·Rs/Rso - 0.35 con Rs/Rso ≤ 1 -> b
+    np.divide(Rs, b, out=b, where=b > 0)
+    np.minimum(b, 1.0, out=b)
+    np.multiply(b, 1.35, out=b)
+    np.subtract(b, 0.35, out=b)
+
+    # Emisividad 0.34 - 0.14·√ea -> a, y se acumula en b
+    np.sqrt(ea, out=a)
+    np.multiply(a, -0.14, out=a)
+    np.add(a, 0.34, out=a)
+    np.multiply(b, a, out=b)
+
+    # σ·(Tmax,K⁴ + Tmin,K⁴)/2 -> a; Rnl = a·b (ec. 39) -> b
+    np.add(T_max, 273.16, out=a)
+    np.power(a, 4, out=a)
+    np.add(T_min, 273.16, out=out)
+    np.power(out, 4, out=out)
+    np.add(a, out, out=a)
+    np.multiply(a, SIGMA / 2, out=a)
+    np.multiply(b, a, out=b)
+
+    # Rn - G = (1 - α)·Rs - Rnl - G -> b
+    np.multiply(Rs, 1 - ALBEDO, out=a)
+    np.subtract(a, b, out=b)
+    np.subtract(b, G, out=b)
+
+    # Δ = 4098·e°(T) / (T + 237.3)² (ec. 13) -> a
+    saturation_vapour_pressure(T, out=a)
+    np.multiply(a, 4098, out=a)
+    np.add(T, 237.3, out=out)
+    np.square(out, out=out)
+    np.divide(a, out, out=a)
+
+    # Término de radiación 0.408·Δ·(Rn - G) -> b
+    np.multiply(b, a, out=b)
+    np.multiply(b, 0.408, out=b)
+
+    # γ = 0.665e-3·P (ec. 8) -> P se copia en out
+    np.multiply(P, 0.665e-3, out=out)
+
+    # Término aerodinámico γ·900/(T + 273)·u2·(es - ea) -> es
+    np.subtract(es, ea, out=es)
+    np.multiply(es, u2, out=es)
+    np.multiply(es, out, out=es)
+    np.add(T, 273, out=ea)
+    np.divide(es, ea, out=es)
+    np.multiply(es, 900, out=es)
+    np.add(b, es, out=b)
+
+    # Denominador Δ + γ·(1 + 0.34·u2) -> out
+    np.multiply(u2, 0.34, out=ea)
+    np.add(ea, 1, out=ea)
+    np.multiply(out, ea, out=out)
+    np.add(out, a, out=out)
+
+    return np.divide(b, out, out=out)
@@ -0,0 +1,142 @@
+# app/exports.py
+"""
+Exportación de las predicciones de un trabajo.
+
+Cada formato es un generador de bytes que se envía tal cual en la respuesta,
+así que el primer fragmento sale en cuanto se ha decodificado la primera
+predicción, sea cual sea el tamaño del resultado:
+
+- CSV: por bloques de filas.
+- Parquet (si pyarrow está instalado): un row group por bloque de filas.
+- ZIP: un CSV por modelo, comprimido sobre la marcha.
+- Excel: libro de openpyxl en modo write_only (las filas no se guardan como
+  celdas en memoria). Un .xlsx solo es válido una vez cerrado, así que
+  excel_file lo escribe entero en un archivo temporal antes de responder y
+  file_chunks lo envía por fragmentos.
+"""
+
+import io
+import tempfile
+import zipfile
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+
+from app.forecast_results import pyarrow
+
+
+CHUNK_ROWS = 1000
+FILE_CHUNK_BYTES = 64 * 1024
+INDEX_LABEL = "Fecha"
+
+
+class StreamSink(io.RawIOBase):
+    """Archivo de solo escritura que acumula lo escrito hasta que se recoge con drain()"""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def parquet_available():
+    return pyarrow is not None
+
+
+def row_chunks(predictions_df, chunk_rows=CHUNK_ROWS):
+    for start in range(0, len(predictions_df), chunk_rows):
+        yield predictions_df.iloc[start:start + chunk_rows]
+
+
+def csv_chunks(predictions_df, chunk_rows=CHUNK_ROWS):
+    """CSV de una predicción (con la columna de fechas) por bloques de filas"""
+    yield predictions_df.iloc[:0].to_csv(index_label=INDEX_LABEL)
+    for chunk in row_chunks(predictions_df, chunk_rows):
+        yield chunk.to_csv(header=False)
+
+
+def parquet_chunks(predictions_df, chunk_rows=CHUNK_ROWS):
+    """Parquet de una predicción, un row group por bloque de filas"""
+    import pyarrow.parquet as pq
+
+    sink = StreamSink()
+    writer = None
+    for chunk in row_chunks(predictions_df, chunk_rows):
+        table = pyarrow.Table.from_pandas(chunk, preserve_index=True)
+        if writer is None:
+            writer = pq.ParquetWriter(sink, table.schema)
+        writer.write_table(table)
+        yield sink.drain()
+    if writer is None:
+        writer = pq.ParquetWriter(sink, pyarrow.Schema.from_pandas(predictions_df, preserve_index=True))
+    writer.close()
+    yield sink.drain()
+
+
+def zip_chunks(forecasts, chunk_rows=CHUNK_ROWS):
+    """ZIP con un CSV por modelo; forecasts es un iterable de (modelo, DataFrame)"""
+    sink = StreamSink()
+    # Sobre un archivo sin seek, zipfile escribe los tamaños tras cada entrada (data descriptor)
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, predictions_df in forecasts:
+            with archive.open(f"resultados_prediccion_{name}.csv", "w") as entry:
+                for chunk in csv_chunks(predictions_df, chunk_rows):
+                    entry.write(chunk.encode())
+                    yield sink.drain()
+    yield sink.drain()
+
+
+def excel_file(forecasts, chunk_rows=CHUNK_ROWS):
+    """Libro Excel con una hoja por modelo en un archivo temporal, listo para leer desde el principio.
+
+    forecasts es un iterable de (modelo, DataFrame).
+    """
+    workbook = Workbook(write_only=True)
+    for name, predictions_df in forecasts:
+        # Nombre hoja (máx 31 caracteres en Excel)
+        sheet = workbook.create_sheet(title=name[:31].upper())
+        sheet.append([INDEX_LABEL, *map(str, predictions_df.columns)])
+        for chunk in row_chunks(predictions_df, chunk_rows):
+            for row in excel_rows(chunk):
+                sheet.append(row)
+
+    f = tempfile.TemporaryFile()
+    try:
+        workbook.save(f)
+    except BaseException:
+        f.close()
+        raise
+    f.seek(0)
+    return f
+
+
+def file_chunks(f):
+    """Contenido de un archivo abierto por fragmentos; lo cierra al terminar"""
+    with f:
+        yield from iter(lambda: f.read(FILE_CHUNK_BYTES), b"")
+
+
+def excel_rows(predictions_df):
+    """Filas para openpyxl: fechas como datetime y NaN como celda vacía (como DataFrame.to_excel)"""
+    values = predictions_df.to_numpy(dtype=object)
+    values[pd.isna(values)] = None
+    index = predictions_df.index
+    dates = index.to_pydatetime() if isinstance(index, pd.DatetimeIndex) else np.asarray(index, dtype=object)
+    for date, row in zip(dates, values):
+        yield [date, *row]
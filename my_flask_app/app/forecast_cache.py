@@ -0,0 +1,140 @@
+# app/forecast_cache.py
+"""
+Caché de resultados de predicción.
+
+Una predicción depende solo de los modelos guardados, del archivo de datos y
+del horizonte. La clave combina la versión de cada artefacto (nombre, fecha
+de modificación y tamaño) con el hash del contenido del archivo de datos; el
+horizonte no forma parte de la clave: se guarda el resultado más largo pedido
+y un horizonte más corto se sirve recortándolo, porque las predicciones y el
+cálculo de riego son día a día.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+
+class ForecastCache:
+    """Resultados de predicción recientes con caducidad y límite de memoria"""
+
+    def __init__(self, app=None, ttl=3600, max_bytes=64 * 1024 * 1024):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # {clave: entrada}
+        self._bytes = 0
+        self._file_hashes = {}  # {ruta: (mtime_ns, tamaño, hash)}
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.ttl = app.config.get("FORECAST_CACHE_TTL", 3600)
+        self.max_bytes = app.config.get("FORECAST_CACHE_MAX_MB", 64) * 1024 * 1024
+        app.extensions["forecast_cache"] = self
+
+    def key(self, selected_models, model_files, data_path):
+        """Clave de la predicción: modelos seleccionados, versión de sus artefactos y contenido de los datos"""
+        digest = hashlib.sha256()
+        digest.update(repr(sorted(selected_models)).encode())
+        for path in sorted(model_files):
+            stat = Path(path).stat()
+            digest.update(f"{Path(path).name}:{stat.st_mtime_ns}:{stat.st_size}".encode())
+        digest.update(self.file_hash(data_path).encode())
+        return digest.hexdigest()
+
+    def file_hash(self, path):
+        """Hash del contenido de un archivo (solo se recalcula si cambia en disco)"""
+        path = Path(path)
+        stat = path.stat()
+        with self._lock:
+            cached = self._file_hashes.get(str(path))
+        if cached is not None and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+            return cached[2]
+
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        with self._lock:
+            self._file_hashes[str(path)] = (stat.st_mtime_ns, stat.st_size, digest.hexdigest())
+        return digest.hexdigest()
+
+    def get(self, key, horizon):
+        """Predicciones (y gráficos si el horizonte coincide) para ese horizonte, o None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry["created_at"] > self.ttl:
+                self._discard(key)
+                self._stats["expirations"] += 1
+                entry = None
+
+            usable = entry is not None and (
+                horizon == entry["horizon"] or (horizon < entry["horizon"] and entry["sliceable"])
+            )
+            if not usable:
+                self._stats["misses"] += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+
+        predictions = {name: df.iloc[:horizon].copy() for name, df in entry["predictions"].items()}
+        # Los gráficos solo valen para el horizonte con el que se generaron
+        plots = entry["plots"] if horizon == entry["horizon"] else None
+        return predictions, plots
+
+    def put(self, key, horizon, predictions, plots, sliceable=True):
+        """Guardar el resultado de una predicción (salvo que ya haya uno más largo para la misma clave)"""
+        entry = {
+            "horizon": horizon,
+            "predictions": {name: df.copy() for name, df in predictions.items()},
+            "plots": plots,
+            "sliceable": sliceable,
+            "created_at": time.time(),
+        }
+        entry["bytes"] = (sum(int(df.memory_usage(deep=True).sum()) for df in entry["predictions"].values())
+                          + sum(len(img) for model_plots in plots.values() for img in model_plots.values()))
+
+        with self._lock:
+            previous = self._entries.get(key)
+            if previous is not None and previous["horizon"] > horizon and previous["sliceable"]:
+                return
+            self._discard(key)
+            if entry["bytes"] > self.max_bytes:
+                return
+            self._entries[key] = entry
+            self._bytes += entry["bytes"]
+            self._evict()
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                **self._stats,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+            }
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry["bytes"]
+
+    def _evict(self):
+        now = time.time()
+        for key in [k for k, e in self._entries.items() if now - e["created_at"] > self.ttl]:
+            self._discard(key)
+            self._stats["expirations"] += 1
+        while self._bytes > self.max_bytes and self._entries:
+            self._discard(next(iter(self._entries)))
+            self._stats["evictions"] += 1
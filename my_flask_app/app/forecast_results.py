@@ -0,0 +1,108 @@
+# app/forecast_results.py
+"""
+Resultados de predicción en formato binario por columnas.
+
+Cada predicción (DataFrame con índice de fechas) se guarda en los resultados
+del trabajo como bytes: Parquet si pyarrow está instalado y, si no, un .npz
+sin comprimir con un array por columna (los metadatos van en JSON dentro del
+propio archivo, como en app/artifacts.py). Los dos formatos conservan los
+tipos y el DatetimeIndex, y las vistas JSON, CSV y Excel se generan solo
+cuando se piden.
+"""
+
+import io
+import json
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+
+FORECAST_KEY_PREFIX = "forecast_"
+JSON_KEY_PREFIX = "predictions_data_"  # Claves de la vista JSON que lee la página de resultados
+META_KEY = "__meta__"
+PARQUET_MAGIC = b"PAR1"
+
+
+def encode_forecast(predictions_df, engine=None):
+    """Bytes de una predicción: "parquet" (si hay pyarrow) o "npz" """
+    engine = engine or ("parquet" if pyarrow is not None else "npz")
+    buffer = io.BytesIO()
+    if engine == "parquet":
+        predictions_df.to_parquet(buffer, engine="pyarrow")
+    else:
+        _write_columns(predictions_df, buffer)
+    return buffer.getvalue()
+
+
+def decode_forecast(data):
+    """DataFrame de una predicción guardada con encode_forecast"""
+    if data[:4] == PARQUET_MAGIC:
+        return pd.read_parquet(io.BytesIO(data))
+    return _read_columns(io.BytesIO(data))
+
+
+def store_forecasts(results, predictions):
+    """Guardar cada predicción {modelo: DataFrame} en los resultados de un trabajo"""
+    for name, predictions_df in predictions.items():
+        results[f"{FORECAST_KEY_PREFIX}{name}"] = encode_forecast(predictions_df)
+
+
+def forecast_names(results):
+    return [key[len(FORECAST_KEY_PREFIX):] for key in results if key.startswith(FORECAST_KEY_PREFIX)]
+
+
+def iter_forecasts(results, names=None):
+    """(modelo, DataFrame) de cada predicción, decodificando cada una solo cuando se llega a ella"""
+    names = forecast_names(results) if names is None else names
+    for name in names:
+        yield name, decode_forecast(results[f"{FORECAST_KEY_PREFIX}{name}"])
+
+
+def load_forecasts(results, names=None):
+    """Predicciones {modelo: DataFrame} de los resultados de un trabajo (solo las de names si se indica)"""
+    return dict(iter_forecasts(results, names))
+
+
+def results_json_view(results):
+    """Resultados con cada predicción como JSON de registros (predictions_data_<modelo>)"""
+    view = {}
+    for key, value in results.items():
+        if key.startswith(FORECAST_KEY_PREFIX):
+            name = key[len(FORECAST_KEY_PREFIX):]
+            view[f"{JSON_KEY_PREFIX}{name}"] = decode_forecast(value).to_json(orient='records', date_format='iso')
+        else:
+            view[key] = value
+    return view
+
+
+def _write_columns(predictions_df, buffer):
+    index = predictions_df.index
+    meta = {
+        "columns": [str(column) for column in predictions_df.columns],
+        "index_name": index.name,
+        "freq": index.freqstr if isinstance(index, pd.DatetimeIndex) else None,
+    }
+    arrays = {"index": _plain_array(index)}
+    for i, (_, column) in enumerate(predictions_df.items()):
+        arrays[f"c{i}"] = _plain_array(column)
+    np.savez(buffer, **arrays, **{META_KEY: np.frombuffer(json.dumps(meta).encode(), dtype=np.uint8)})
+
+
+def _read_columns(buffer):
+    with np.load(buffer, allow_pickle=False) as data:
+        meta = json.loads(bytes(data[META_KEY]).decode())
+        index = pd.Index(data["index"], name=meta["index_name"])
+        if meta["freq"]:
+            index = pd.DatetimeIndex(index, freq=meta["freq"])
+        return pd.DataFrame({name: data[f"c{i}"] for i, name in enumerate(meta["columns"])}, index=index)
+
+
+def _plain_array(values):
+    # Sin objetos de Python: el .npz se lee con allow_pickle=False
+    values = np.asarray(values)
+    return values.astype(str) if values.dtype == object else values
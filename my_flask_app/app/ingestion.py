@@ -0,0 +1,249 @@
+# app/ingestion.py
+"""
+Ingesta de archivos de datos subidos.
+
+El archivo se procesa en una sola pasada y en memoria acotada. Los bytes de
+la subida se escriben a disco y al hash según se leen, y pandas lee esos mismos
+bytes por bloques de filas. Con cada bloque:
+
+- se valida el esquema (columna de fecha y columnas numéricas) y las fechas;
+- se acumulan las sumas y cuentas por día (app.datasets.daily_totals);
+- se acumulan las estadísticas de cada variable (cuenta, media, desviación,
+  mínimo, máximo y valores vacíos).
+
+El estado acumulado crece con el número de días, no con el de filas, así que
+una exportación de sensores de cientos de MB con lecturas cada pocos minutos
+no se carga entera en memoria. Si el archivo es válido se mueve a su sitio
+y se guarda su copia diaria limpia, la misma que usa load_dataset. Si no es
+válido, el archivo anterior con el mismo nombre no se toca.
+"""
+
+import csv
+import hashlib
+import io
+import math
+import os
+import zipfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from openpyxl.utils.exceptions import InvalidFileException
+
+from app.datasets import cache_path, complete_daily, daily_from_totals, daily_totals, date_column, write_cache
+from app.station_data import aggregate, training_data
+
+
+READ_CHUNK_BYTES = 1024 * 1024
+CHUNK_ROWS = 50_000
+EXTRA_COLUMN = "__extra__"
+
+
+class IngestionError(ValueError):
+    """El archivo subido no es un CSV de datos válido"""
+
+
+class TeeReader(io.RawIOBase):
+    """Lector que copia todo lo que lee de source en sink y en el hash"""
+
+    def __init__(self, source, sink=None):
+        self.source = source
+        self.sink = sink
+        self.digest = hashlib.sha256()
+        self.size = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self.source.read(len(buffer))
+        n = len(data)
+        buffer[:n] = data
+        self.digest.update(data)
+        self.size += n
+        if self.sink is not None:
+            self.sink.write(data)
+        return n
+
+
+class ColumnStats:
+    """Estadísticas de cada variable acumuladas por bloques"""
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        zeros = np.zeros(len(self.columns))
+        self.count, self.missing = zeros.copy(), zeros.copy()
+        self.total, self.total_sq = zeros.copy(), zeros.copy()
+        self.min = np.full(len(self.columns), np.inf)
+        self.max = np.full(len(self.columns), -np.inf)
+
+    def update(self, values):
+        valid = ~np.isnan(values)
+        self.count += valid.sum(axis=0)
+        self.missing += (~valid).sum(axis=0)
+        self.total += np.nansum(values, axis=0)
+        self.total_sq += np.nansum(values * values, axis=0)
+        if len(values):
+            self.min = np.minimum(self.min, np.where(valid, values, np.inf).min(axis=0))
+            self.max = np.maximum(self.max, np.where(valid, values, -np.inf).max(axis=0))
+
+    def result(self):
+        stats = {}
+        for i, column in enumerate(self.columns):
+            n = int(self.count[i])
+            mean = self.total[i] / n if n else None
+            # Desviación muestral a partir de las sumas (acotada en 0 por errores de redondeo)
+            std = math.sqrt(max(self.total_sq[i] - n * mean * mean, 0) / (n - 1)) if n > 1 else None
+            stats[column] = {
+                "count": n,
+                "missing": int(self.missing[i]),
+                "mean": mean,
+                "std": std,
+                "min": float(self.min[i]) if n else None,
+                "max": float(self.max[i]) if n else None,
+            }
+        return stats
+
+
+def ingest_upload(stream, upload_path, chunk_rows=CHUNK_ROWS):
+    """Guardar una subida en upload_path validándola y preparando sus datos en la misma pasada.
+
+    Devuelve los metadatos del registro Dataset. Lanza IngestionError si el archivo no es válido.
+    """
+    upload_path = Path(upload_path)
+    part_path = upload_path.with_name(upload_path.name + ".part")
+    try:
+        with open(part_path, "wb") as sink:
+            tee = TeeReader(stream, sink)
+            metadata, daily = _ingest(io.BufferedReader(tee, READ_CHUNK_BYTES), chunk_rows)
+            # Lo que quede tras la última fila (p. ej. líneas vacías) también se guarda
+            while tee.read(READ_CHUNK_BYTES):
+                pass
+    except BaseException:
+        part_path.unlink(missing_ok=True)
+        raise
+
+    os.replace(part_path, upload_path)
+    write_cache(upload_path, cache_path(upload_path), daily)
+    return {**metadata, "size": tee.size, "content_hash": tee.digest.hexdigest()}
+
+
+def ingest_file(path, chunk_rows=CHUNK_ROWS):
+    """Validar y preparar un archivo que ya está en disco (registros anteriores a la ingesta)"""
+    path = Path(path)
+    with open(path, "rb") as f:
+        tee = TeeReader(f)
+        metadata, daily = _ingest(io.BufferedReader(tee, READ_CHUNK_BYTES), chunk_rows)
+        while tee.read(READ_CHUNK_BYTES):
+            pass
+    write_cache(path, cache_path(path), daily)
+    return {**metadata, "size": tee.size, "content_hash": tee.digest.hexdigest()}
+
+
+def ingest_station_exports(sources, uploads_dir, chunk_rows=CHUNK_ROWS):
+    """Convertir exportaciones de estación (pares (archivo, nombre), uno por año) en un CSV de entrenamiento.
+
+    Las lecturas se agregan por día (app.station_data) y el CSV se guarda en uploads_dir con el rango
+    de fechas en el nombre. Devuelve (nombre del CSV, metadatos del registro Dataset).
+    """
+    try:
+        training = training_data(aggregate(sources, chunk_rows))
+    except (zipfile.BadZipFile, InvalidFileException) as e:
+        raise IngestionError("El archivo no es un Excel válido") from e
+    except (ValueError, KeyError, pd.errors.ParserError) as e:
+        raise IngestionError(str(e)) from e
+
+    filename = f"datos_estacion_{training.index.min():%Y-%m-%d}_{training.index.max():%Y-%m-%d}.csv"
+    path = Path(uploads_dir) / filename
+    part_path = path.with_name(path.name + ".part")
+    try:
+        training.to_csv(part_path, index_label=training.index.name)
+    except BaseException:
+        part_path.unlink(missing_ok=True)
+        raise
+    os.replace(part_path, path)
+    return filename, ingest_file(path, chunk_rows)
+
+
+def _ingest(reader, chunk_rows):
+    header = _read_header(reader)
+    date_col = _date_column(header)
+    value_cols = [column for column in header if column != date_col]
+    if not value_cols:
+        raise IngestionError("El archivo no tiene columnas de datos además de la fecha")
+
+    stats = ColumnStats(value_cols)
+    sums, counts = [], []
+    rows, date_start, date_end = 0, None, None
+
+    chunks = pd.read_csv(
+        # Columna centinela: con chunksize pandas descarta sin avisar los campos que sobran
+        reader, names=[*header, EXTRA_COLUMN], header=None, index_col=False, chunksize=chunk_rows,
+        encoding="utf-8", dtype={date_col: str, EXTRA_COLUMN: str, **{column: "float64" for column in value_cols}},
+    )
+    try:
+        for chunk in chunks:
+            extra = chunk[EXTRA_COLUMN].notna().to_numpy()
+            if extra.any():
+                raise IngestionError(f"La línea {rows + 2 + int(np.argmax(extra))} tiene más campos que la cabecera")
+            dates = _parse_dates(chunk[date_col], first_line=rows + 2)
+            values = chunk[value_cols].set_axis(pd.DatetimeIndex(dates, name=date_col))
+
+            stats.update(values.to_numpy())
+            chunk_sums, chunk_counts = daily_totals(values)
+            sums.append(chunk_sums)
+            counts.append(chunk_counts)
+
+            rows += len(chunk)
+            date_start = min(date_start, dates.min()) if date_start is not None else dates.min()
+            date_end = max(date_end, dates.max()) if date_end is not None else dates.max()
+    except (ValueError, pd.errors.ParserError) as e:
+        if isinstance(e, IngestionError):
+            raise
+        raise IngestionError(f"Valores no válidos tras la línea {rows + 1}: {e}") from e
+
+    if not rows:
+        raise IngestionError("El archivo no tiene filas de datos")
+
+    # Los bloques pueden partir un día: se suman las sumas y cuentas de cada día
+    daily = daily_from_totals(pd.concat(sums).groupby(level=0).sum(), pd.concat(counts).groupby(level=0).sum())
+    metadata = {
+        "rows": rows,
+        "columns": header,
+        "date_start": date_start.date(),
+        "date_end": date_end.date(),
+        "stats": stats.result(),
+    }
+    return metadata, complete_daily(daily)
+
+
+def _date_column(header):
+    try:
+        return date_column(header)
+    except ValueError as e:
+        raise IngestionError(str(e)) from e
+
+
+def _read_header(reader):
+    line = reader.readline()
+    header = next(csv.reader([line.decode("utf-8-sig")]), [])
+    if not header:
+        raise IngestionError("El archivo está vacío")
+    if len(set(header)) != len(header):
+        raise IngestionError("El archivo tiene columnas repetidas")
+    return header
+
+
+def _parse_dates(raw, first_line):
+    """Fechas de un bloque; first_line es la línea del archivo de la primera fila (para los mensajes)"""
+    dates = pd.to_datetime(raw, errors="coerce")
+    if dates.isna().any():
+        # El formato se deduce de la primera fecha; con formatos distintos se interpreta cada una por separado
+        dates = pd.to_datetime(raw, errors="coerce", format="mixed")
+    invalid = dates.isna()
+    if invalid.any():
+        position = int(np.argmax(invalid.to_numpy()))
+        value = raw.iloc[position]
+        raise IngestionError(f"Fecha no válida en la línea {first_line + position}: "
+                             f"{'vacía' if pd.isna(value) else repr(value)}")
+    return dates
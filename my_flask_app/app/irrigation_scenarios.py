@@ -0,0 +1,86 @@
+# app/irrigation_scenarios.py
+"""
+Comparación de escenarios de riego.
+
+Evalúa de una vez todas las combinaciones de predicción (modelo), curva de Kc,
+eficiencia de riego y fracción de riego deficitario (RDC). Los cálculos se
+hacen sobre un único array con un eje por parámetro,
+(predicción, curva, eficiencia, fracción RDC, día), y el resultado es una tabla
+resumen con una fila por escenario en lugar de un DataFrame por escenario.
+"""
+
+import numpy as np
+import pandas as pd
+
+from app.auxiliary_prediction_functions import (
+    COEF_PRECIPITACION, EFICIENCIA_RIEGO, FRACCION_RDC, UMBRAL_PRECIPITACION,
+    CURVA_KC, calculate_et0_fao_penman_monteith, tabla_Kc,
+)
+
+
+def forecast_arrays(forecasts, n_days=None):
+    """ET0, precipitación y día del año de cada predicción como arrays (n_predicciones, n_dias).
+
+    Las predicciones más cortas se rellenan con NaN (no suman en los totales).
+    """
+    n_days = n_days or max(len(df) for df in forecasts.values())
+    shape = (len(forecasts), n_days)
+    et0, precipitation = np.full(shape, np.nan), np.full(shape, np.nan)
+    day_of_year = np.ones(shape, dtype=np.intp)
+
+    for i, df in enumerate(forecasts.values()):
+        df = df.iloc[:n_days]
+        n = len(df)
+        et0[i, :n] = df['ET0'] if 'ET0' in df else calculate_et0_fao_penman_monteith(df)
+        precipitation[i, :n] = df['Precipitaciones']
+        # Los resultados guardados en JSON pierden el índice de fechas pero conservan la columna 'dia'
+        day_of_year[i, :n] = df['dia'] if 'dia' in df else pd.to_datetime(df.index).dayofyear
+
+    return et0, precipitation, day_of_year
+
+
+def irrigation_scenarios(forecasts, deficit_fractions=(FRACCION_RDC,), efficiencies=(EFICIENCIA_RIEGO,),
+                         kc_curves=None, coef_precipitacion=COEF_PRECIPITACION, n_days=None):
+    """Totales de riego de todas las combinaciones de parámetros.
+
+    forecasts: {modelo: DataFrame de predicción}
+    kc_curves: {nombre: curva} donde la curva es un diccionario con las claves de
+        CURVA_KC que cambian, o directamente un array de Kc por día del año (367 valores).
+    Devuelve un DataFrame con una fila por (modelo, curva_kc, eficiencia, fraccion_rdc).
+    """
+    kc_curves = kc_curves or {'referencia': CURVA_KC}
+    deficit_fractions = np.asarray(deficit_fractions, dtype=float)
+    efficiencies = np.asarray(efficiencies, dtype=float)
+    kc_tables = np.stack([np.asarray(c, dtype=float) if not isinstance(c, dict) else tabla_Kc(c)
+                          for c in kc_curves.values()])
+
+    et0, precipitation, day_of_year = forecast_arrays(forecasts, n_days)
+
+    # Ejes: (predicción F, curva K, eficiencia E, fracción RDC D, día T)
+    etc = kc_tables[:, day_of_year].transpose(1, 0, 2) * et0[:, None, :]            # (F, K, T)
+    pe = np.where(precipitation > UMBRAL_PRECIPITACION, precipitation * coef_precipitacion, 0.0)[:, None, :]
+
+    nn = np.maximum(etc - pe, 0)                                                     # (F, K, T)
+    nn_rdc = np.maximum(etc[:, :, None, :] * deficit_fractions[:, None] - pe[:, :, None, :], 0)  # (F, K, D, T)
+
+    # Los días de relleno tienen ET0 NaN y no cuentan en los totales
+    eff = efficiencies[:, None, None]                                                # (E, 1, 1)
+    nb_total = np.nansum(nn[:, :, None, None, :] / eff, axis=-1)                     # (F, K, E, 1)
+    nb_rdc_total = np.nansum(nn_rdc[:, :, None, :, :] / eff, axis=-1)                # (F, K, E, D)
+    nb_total = np.broadcast_to(nb_total, nb_rdc_total.shape)
+    n_valid = np.sum(~np.isnan(et0), axis=-1)[:, None, None, None]                   # (F, 1, 1, 1)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ahorro = np.where(nb_total > 0, 100 * (1 - nb_rdc_total / nb_total), 0.0)
+
+    index = pd.MultiIndex.from_product(
+        [list(forecasts), list(kc_curves), efficiencies, deficit_fractions],
+        names=['modelo', 'curva_kc', 'eficiencia', 'fraccion_rdc'],
+    )
+    return pd.DataFrame({
+        'dias': np.broadcast_to(n_valid, nb_total.shape).ravel(),
+        'NB_total': nb_total.ravel(),
+        'NB_RDC_total': nb_rdc_total.ravel(),
+        'NB_RDC_medio': (nb_rdc_total / np.maximum(n_valid, 1)).ravel(),
+        'ahorro_RDC_%': ahorro.ravel(),
+    }, index=index).reset_index()
@@ -0,0 +1,299 @@
+# app/job_store.py
+"""
+Almacén del progreso y los resultados de cada trabajo.
+
+Cada trabajo guarda su usuario, el estado de progreso, los mensajes de
+progreso (numerados desde 1) y sus resultados. Solo el usuario que lanzó un
+trabajo puede leerlo.
+
+Hay dos backends, los mismos que en app/jobs.py y elegidos con la misma
+opción (JOBS_BACKEND), para que el registro de un trabajo y su progreso
+estén siempre en el mismo sitio:
+
+- en memoria: rápido, pero solo lo ve el proceso que ejecuta el trabajo;
+- SQLite: compartido por todos los procesos (p. ej. varios workers de Gunicorn).
+
+Los trabajos caducan tras JOBS_TTL segundos sin cambios y, si se supera
+JOB_STORE_MAX_MB, se descartan primero los trabajos terminados menos usados.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def estimate_size(value):
+    """Tamaño aproximado en bytes de un resultado (cadenas JSON y base64 dominan)"""
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(len(str(k)) + estimate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sum(estimate_size(v) for v in value)
+    return 16
+
+
+class MemoryStoreBackend:
+    """Progreso y resultados en memoria del proceso"""
+
+    def __init__(self, max_bytes=256 * 1024 * 1024, ttl=24 * 3600):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._jobs = OrderedDict()
+        self._bytes = 0
+        self._condition = threading.Condition()
+
+    def create(self, job_id, user_id, state):
+        with self._condition:
+            self._discard(job_id)
+            self._jobs[job_id] = {
+                "user_id": user_id,
+                "state": dict(state),
+                "messages": [],
+                "results": {},
+                "bytes": 0,
+                "updated_at": time.time(),
+            }
+            self._evict()
+
+    def update_progress(self, job_id, state, message=None):
+        with self._condition:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job["state"].update(state)
+            if message is not None:
+                job["messages"].append(dict(message))
+                self._resize(job, estimate_size(message["message"]))
+            self._touch(job_id)
+            self._condition.notify_all()
+
+    def get_progress(self, job_id, since=0):
+        with self._condition:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            self._jobs.move_to_end(job_id)
+            return {**job["state"], "step_messages": job["messages"][since:], "user_id": job["user_id"]}
+
+    def wait(self, job_id, since, timeout):
+        """Esperar a que haya mensajes posteriores a since o a que el trabajo termine"""
+        def has_news():
+            job = self._jobs.get(job_id)
+            return job is None or job["state"].get("is_complete") or len(job["messages"]) > since
+
+        with self._condition:
+            self._condition.wait_for(has_news, timeout=timeout)
+
+    def save_results(self, job_id, results):
+        with self._condition:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            for key, value in results.items():
+                self._resize(job, estimate_size(value) - estimate_size(job["results"].get(key, "")))
+                job["results"][key] = value
+            self._touch(job_id)
+            self._evict()
+
+    def get_results(self, job_id):
+        with self._condition:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            self._jobs.move_to_end(job_id)
+            return {"results": dict(job["results"]), "user_id": job["user_id"]}
+
+    def _touch(self, job_id):
+        self._jobs[job_id]["updated_at"] = time.time()
+        self._jobs.move_to_end(job_id)
+
+    def _resize(self, job, delta):
+        job["bytes"] += delta
+        self._bytes += delta
+
+    def _discard(self, job_id):
+        job = self._jobs.pop(job_id, None)
+        if job is not None:
+            self._bytes -= job["bytes"]
+
+    def _evict(self):
+        now = time.time()
+        for job_id in [j for j, job in self._jobs.items() if now - job["updated_at"] > self.ttl]:
+            self._discard(job_id)
+        # Los trabajos en marcha no se descartan por tamaño
+        for job_id in [j for j, job in self._jobs.items() if job["state"].get("is_complete")]:
+            if self._bytes <= self.max_bytes:
+                break
+            self._discard(job_id)
+
+
+class SQLiteStoreBackend:
+    """Progreso y resultados en una base de datos SQLite compartida entre procesos"""
+
+    # Sin Condition entre procesos: los streams consultan la base de datos cada POLL_INTERVAL segundos
+    POLL_INTERVAL = 0.25
+
+    def __init__(self, db_path, max_bytes=256 * 1024 * 1024, ttl=24 * 3600):
+        self.db_path = str(db_path)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS job_progress ("
+                "job_id TEXT PRIMARY KEY, user_id INTEGER, state TEXT, n_messages INTEGER, "
+                "is_complete INTEGER, bytes INTEGER, updated_at REAL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS job_messages ("
+                "job_id TEXT, id INTEGER, timestamp REAL, message TEXT, PRIMARY KEY (job_id, id))"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS job_results ("
+                "job_id TEXT, key TEXT, value TEXT, bytes INTEGER, PRIMARY KEY (job_id, key))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_job_progress_updated ON job_progress (updated_at)")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def create(self, job_id, user_id, state):
+        with self._connect() as conn:
+            self._delete(conn, [job_id])
+            conn.execute("INSERT INTO job_progress VALUES (?, ?, ?, 0, 0, 0, ?)",
+                         (job_id, user_id, json.dumps(state), time.time()))
+            self._evict(conn)
+
+    def update_progress(self, job_id, state, message=None):
+        with self._connect() as conn:
+            if message is not None:
+                conn.execute("INSERT OR REPLACE INTO job_messages VALUES (?, ?, ?, ?)",
+                             (job_id, message["id"], message["timestamp"], message["message"]))
+            conn.execute(
+                "UPDATE job_progress SET state = ?, is_complete = ?, updated_at = ?, "
+                "n_messages = n_messages + ?, bytes = bytes + ? WHERE job_id = ?",
+                (json.dumps(state), int(bool(state.get("is_complete"))), time.time(),
+                 int(message is not None), estimate_size(message["message"]) if message else 0, job_id)
+            )
+
+    def get_progress(self, job_id, since=0):
+        with self._connect() as conn:
+            row = conn.execute("SELECT user_id, state FROM job_progress WHERE job_id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            messages = conn.execute(
+                "SELECT id, timestamp, message FROM job_messages WHERE job_id = ? AND id > ? ORDER BY id",
+                (job_id, since)
+            ).fetchall()
+        return {**json.loads(row[1]),
+                "step_messages": [{"id": i, "timestamp": t, "message": m} for i, t, m in messages],
+                "user_id": row[0]}
+
+    def wait(self, job_id, since, timeout):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self._connect() as conn:
+                row = conn.execute("SELECT n_messages, is_complete FROM job_progress WHERE job_id = ?",
+                                   (job_id,)).fetchone()
+            if row is None or row[1] or row[0] > since:
+                return
+            time.sleep(self.POLL_INTERVAL)
+
+    def save_results(self, job_id, results):
+        with self._connect() as conn:
+            for key, value in results.items():
+                # Los bytes (predicciones en formato binario) se guardan como BLOB y el resto como JSON
+                encoded = value if isinstance(value, bytes) else json.dumps(value, default=str)
+                conn.execute("INSERT OR REPLACE INTO job_results VALUES (?, ?, ?, ?)",
+                             (job_id, key, encoded, len(encoded)))
+            conn.execute(
+                "UPDATE job_progress SET updated_at = ?, bytes = "
+                "(SELECT COALESCE(SUM(bytes), 0) FROM job_results WHERE job_id = ?) + "
+                "(SELECT COALESCE(SUM(LENGTH(message)), 0) FROM job_messages WHERE job_id = ?) "
+                "WHERE job_id = ?",
+                (time.time(), job_id, job_id, job_id)
+            )
+            self._evict(conn)
+
+    def get_results(self, job_id):
+        with self._connect() as conn:
+            row = conn.execute("SELECT user_id FROM job_progress WHERE job_id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            rows = conn.execute("SELECT key, value FROM job_results WHERE job_id = ?", (job_id,)).fetchall()
+        return {"results": {key: value if isinstance(value, bytes) else json.loads(value) for key, value in rows},
+                "user_id": row[0]}
+
+    def _delete(self, conn, job_ids):
+        for table in ("job_progress", "job_messages", "job_results"):
+            conn.executemany(f"DELETE FROM {table} WHERE job_id = ?", [(j,) for j in job_ids])
+
+    def _evict(self, conn):
+        expired = conn.execute("SELECT job_id FROM job_progress WHERE updated_at < ?",
+                               (time.time() - self.ttl,)).fetchall()
+        self._delete(conn, [j for (j,) in expired])
+
+        total = conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM job_progress").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = []
+        for job_id, size in conn.execute("SELECT job_id, bytes FROM job_progress WHERE is_complete = 1 "
+                                         "ORDER BY updated_at"):
+            if total <= self.max_bytes:
+                break
+            evicted.append(job_id)
+            total -= size
+        self._delete(conn, evicted)
+
+
+class JobStore:
+    """Progreso y resultados de los trabajos, visibles solo para el usuario que los lanzó"""
+
+    def __init__(self, app=None):
+        self.backend = MemoryStoreBackend()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        max_bytes = app.config.get("JOB_STORE_MAX_MB", 256) * 1024 * 1024
+        ttl = app.config.get("JOBS_TTL", 24 * 3600)
+        if app.config.get("JOBS_BACKEND", "memory") == "sqlite":
+            self.backend = SQLiteStoreBackend(app.config["JOBS_DB_PATH"], max_bytes, ttl)
+        else:
+            self.backend = MemoryStoreBackend(max_bytes, ttl)
+        app.extensions["job_store"] = self
+
+    def start_progress(self, job_id, state, user_id=None):
+        self.backend.create(job_id, user_id, state)
+
+    def update_progress(self, job_id, state, message=None):
+        self.backend.update_progress(job_id, state, message)
+
+    def get_progress(self, job_id, user_id=None, since=0):
+        """Estado y mensajes posteriores a since, o None si no existe o es de otro usuario"""
+        progress = self.backend.get_progress(job_id, since) if job_id else None
+        if progress is None or not self._visible(progress.pop("user_id"), user_id):
+            return None
+        return progress
+
+    def wait_for_progress(self, job_id, since, timeout):
+        self.backend.wait(job_id, since, timeout)
+
+    def save_results(self, job_id, results):
+        self.backend.save_results(job_id, results)
+
+    def get_results(self, job_id, user_id=None):
+        """Resultados del trabajo, o None si no existe o es de otro usuario"""
+        record = self.backend.get_results(job_id) if job_id else None
+        if record is None or not self._visible(record["user_id"], user_id):
+            return None
+        return record["results"]
+
+    @staticmethod
+    def _visible(owner_id, user_id):
+        return owner_id is None or owner_id == user_id
@@ -0,0 +1,208 @@
+# app/jobs.py
+"""
+Motor de trabajos en segundo plano para entrenamiento y predicción.
+
+Los trabajos se ejecutan en un pool acotado de hilos del propio proceso,
+así que no hace falta ningún broker externo. El estado de cada trabajo se
+guarda en memoria o, si se configura, en una base de datos SQLite local
+(JOBS_BACKEND, el mismo que usa app/job_store.py para el progreso y los
+resultados). Los trabajos terminados caducan tras JOBS_TTL segundos y, en
+memoria, se guardan como mucho JOBS_MAX_RECORDS (se descartan primero los
+terminados más antiguos).
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+# Estados posibles de un trabajo
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+FINISHED = (DONE, FAILED)
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryJobBackend:
+    """Registro de trabajos en un diccionario del proceso, acotado por caducidad y número de trabajos"""
+
+    def __init__(self, ttl=24 * 3600, max_records=1000):
+        self.ttl = ttl
+        self.max_records = max_records
+        self._jobs = OrderedDict()  # En orden de creación
+        self._lock = threading.Lock()
+
+    def save(self, job):
+        with self._lock:
+            self._jobs.pop(job["id"], None)
+            self._jobs[job["id"]] = dict(job)
+            self._evict()
+
+    def update(self, job_id, **fields):
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id].update(fields)
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def latest(self, kind, user_id=None):
+        with self._lock:
+            jobs = [j for j in self._jobs.values()
+                    if j["kind"] == kind and (user_id is None or j["user_id"] == user_id)]
+        if not jobs:
+            return None
+        return dict(max(jobs, key=lambda j: j["created_at"]))
+
+    def _evict(self):
+        now = time.time()
+        finished = [job_id for job_id, job in self._jobs.items() if job["status"] in FINISHED]
+        for job_id in finished:
+            if now - self._jobs[job_id]["finished_at"] > self.ttl:
+                del self._jobs[job_id]
+        # Los trabajos pendientes o en marcha no se descartan por número
+        for job_id in finished:
+            if len(self._jobs) <= self.max_records:
+                break
+            self._jobs.pop(job_id, None)
+
+
+class SQLiteJobBackend:
+    """Registro de trabajos en una base de datos SQLite local"""
+
+    COLUMNS = ("id", "kind", "user_id", "status", "created_at", "started_at", "finished_at", "error", "params")
+
+    def __init__(self, db_path, ttl=24 * 3600):
+        self.db_path = str(db_path)
+        self.ttl = ttl
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, kind TEXT, user_id INTEGER, status TEXT, "
+                "created_at REAL, started_at REAL, finished_at REAL, error TEXT, params TEXT)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_jobs_kind ON jobs (kind, created_at)")
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def _row_to_job(self, row):
+        if row is None:
+            return None
+        job = dict(zip(self.COLUMNS, row))
+        job["params"] = json.loads(job["params"]) if job["params"] else {}
+        return job
+
+    def save(self, job):
+        values = [job.get(c) for c in self.COLUMNS]
+        values[-1] = json.dumps(job.get("params") or {}, default=str)
+        with self._connect() as conn:
+            conn.execute(f"INSERT OR REPLACE INTO jobs VALUES ({', '.join('?' * len(self.COLUMNS))})", values)
+            conn.execute("DELETE FROM jobs WHERE status IN (?, ?) AND finished_at < ?",
+                         (*FINISHED, time.time() - self.ttl))
+
+    def update(self, job_id, **fields):
+        if not fields:
+            return
+        assignments = ", ".join(f"{k} = ?" for k in fields)
+        with self._connect() as conn:
+            conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", [*fields.values(), job_id])
+
+    def get(self, job_id):
+        with self._connect() as conn:
+            row = conn.execute(f"SELECT {', '.join(self.COLUMNS)} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row)
+
+    def latest(self, kind, user_id=None):
+        query = f"SELECT {', '.join(self.COLUMNS)} FROM jobs WHERE kind = ?"
+        args = [kind]
+        if user_id is not None:
+            query += " AND user_id = ?"
+            args.append(user_id)
+        query += " ORDER BY created_at DESC LIMIT 1"
+        with self._connect() as conn:
+            row = conn.execute(query, args).fetchone()
+        return self._row_to_job(row)
+
+
+class JobManager:
+    """Cola de trabajos con un número máximo de workers"""
+
+    def __init__(self, app=None):
+        self.backend = None
+        self.executor = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        max_workers = app.config.get("JOBS_MAX_WORKERS", 2)
+        ttl = app.config.get("JOBS_TTL", 24 * 3600)
+        if app.config.get("JOBS_BACKEND", "memory") == "sqlite":
+            self.backend = SQLiteJobBackend(app.config["JOBS_DB_PATH"], ttl)
+        else:
+            self.backend = MemoryJobBackend(ttl, app.config.get("JOBS_MAX_RECORDS", 1000))
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        app.extensions["job_manager"] = self
+
+    def submit(self, kind, func, *args, user_id=None, params=None, job_id=None, **kwargs):
+        """Encolar un trabajo y devolver su id inmediatamente"""
+        job_id = job_id or new_job_id()
+        self.backend.save({
+            "id": job_id,
+            "kind": kind,
+            "user_id": user_id,
+            "status": PENDING,
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "error": None,
+            "params": params or {},
+        })
+        self.executor.submit(self._run, job_id, func, args, kwargs)
+        return job_id
+
+    def record(self, kind, job_id, user_id=None, params=None):
+        """Registrar como terminado un trabajo resuelto sin pasar por la cola (p. ej. desde una caché)"""
+        now = time.time()
+        self.backend.save({
+            "id": job_id,
+            "kind": kind,
+            "user_id": user_id,
+            "status": DONE,
+            "created_at": now,
+            "started_at": now,
+            "finished_at": now,
+            "error": None,
+            "params": params or {},
+        })
+        return job_id
+
+    def _run(self, job_id, func, args, kwargs):
+        self.backend.update(job_id, status=RUNNING, started_at=time.time())
+        try:
+            func(*args, **kwargs)
+            self.backend.update(job_id, status=DONE, finished_at=time.time())
+        except Exception as e:
+            # La traza completa solo va al log del servidor; el trabajo guarda un resumen para el cliente
+            logger.exception("Error en el trabajo %s", job_id)
+            self.backend.update(job_id, status=FAILED, finished_at=time.time(), error=f"{type(e).__name__}: {e}")
+
+    def get(self, job_id):
+        return self.backend.get(job_id)
+
+    def latest(self, kind, user_id=None):
+        return self.backend.latest(kind, user_id)
+
+
+def new_job_id():
+    return uuid.uuid4().hex
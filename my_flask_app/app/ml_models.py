@@ -1,5 +1,7 @@
+from pathlib import Path
 import pandas as pd
 import numpy as np
+import tensorflow as tf
 from sklearn.base import BaseEstimator, TransformerMixin
 from statsmodels.tsa.statespace.sarimax import SARIMAX
 from statsmodels.tsa.vector_ar.var_model import VAR
@@ -7,19 +9,51 @@ from tensorflow.keras.models import Sequential
 from tensorflow.keras.layers import LSTM, Dense, Dropout, BatchNormalization
 from tensorflow.keras.optimizers import Adam
 from tensorflow.keras.callbacks import EarlyStopping, ReduceLROnPlateau
+from tensorflow.keras.utils import timeseries_dataset_from_array
 from sklearn.preprocessing import MinMaxScaler
 import warnings
 warnings.filterwarnings('ignore')
 
+MODELS_PATH = Path(__file__).resolve().parent / "models"
+# Por debajo de este tamaño las ventanas de entrenamiento del LSTM se materializan (más rápido que generarlas por lote)
+WINDOW_ARRAY_MAX_BYTES = 16 * 1024 * 1024
+
+class SharedScaler(BaseEstimator, TransformerMixin):
+    """Referencia a un escalador ajustado una sola vez por entrenamiento y guardado como artefacto compartido"""
+
+    # Escaladores ya cargados por nombre de archivo: {filename: (mtime, scaler)}
+    _loaded = {}
+
+    def __init__(self, filename: str = "shared_scaler.npz"):
+        self.filename = filename
+
+    def fit(self, X, y=None):
+        # El escalador se ajusta fuera del pipeline, una sola vez para todos los modelos
+        return self
+
+    def transform(self, X):
+        return self.get_scaler().transform(X)
+
+    def get_scaler(self):
+        path = MODELS_PATH / self.filename
+        mtime = path.stat().st_mtime_ns
+        cached = SharedScaler._loaded.get(self.filename)
+        if cached is None or cached[0] != mtime:
+            from app.artifacts import load_scaler  # import local: artifacts importa este módulo
+            cached = (mtime, load_scaler(path))
+            SharedScaler._loaded[self.filename] = cached
+        return cached[1]
+
 class SarimaModel(BaseEstimator, TransformerMixin):
     """Wrapper de SARIMA para scikit-learn"""
     
     def __init__(self, column: str = None, order: tuple = (1,1,1), 
-                 seasonal_order: tuple = (1,1,1,30), trend: str = 'c'):
+                 seasonal_order: tuple = (1,1,1,30), trend: str = 'c', warm_start: bool = False):
         self.column = column
         self.order = order
         self.seasonal_order = seasonal_order
         self.trend = trend
+        self.warm_start = warm_start
         self.model = None
         self.fitted_model = None
         
@@ -39,7 +73,12 @@ class SarimaModel(BaseEstimator, TransformerMixin):
                            enforce_stationarity=False,
                            enforce_invertibility=False)
         
-        self.fitted_model = self.model.fit(disp=False)
+        # Reentrenamiento en caliente: partir de los parámetros del ajuste anterior
+        start_params = None
+        if getattr(self, 'warm_start', False) and self.fitted_model is not None:
+            start_params = self.fitted_model.params
+        
+        self.fitted_model = self.model.fit(start_params=start_params, disp=False)
         return self
     
     def predict(self, X, n_periods: int = 30):
@@ -57,7 +96,8 @@ class SarimaModel(BaseEstimator, TransformerMixin):
         return {'column': self.column, 
                 'order': self.order, 
                 'seasonal_order': self.seasonal_order,
-                'trend': self.trend}
+                'trend': self.trend,
+                'warm_start': getattr(self, 'warm_start', False)}
     
     def set_params(self, **parameters):
         for parameter, value in parameters.items():
@@ -68,11 +108,12 @@ class SarimaxModel(BaseEstimator, TransformerMixin):
     """Wrapper de SARIMAX para scikit-learn"""
     
     def __init__(self, target_col: str = None, exog_cols: list = None, 
-                 order: tuple = (1,1,1), seasonal_order: tuple = (1,1,1,30)):
+                 order: tuple = (1,1,1), seasonal_order: tuple = (1,1,1,30), warm_start: bool = False):
         self.target_col = target_col
         self.exog_cols = exog_cols if exog_cols else []
         self.order = order
         self.seasonal_order = seasonal_order
+        self.warm_start = warm_start
         self.model = None
         self.fitted_model = None
         
@@ -92,7 +133,11 @@ class SarimaxModel(BaseEstimator, TransformerMixin):
                            enforce_stationarity=False,
                            enforce_invertibility=False)
         
-        self.fitted_model = self.model.fit(disp=False)
+        start_params = None
+        if getattr(self, 'warm_start', False) and self.fitted_model is not None:
+            start_params = self.fitted_model.params
+        
+        self.fitted_model = self.model.fit(start_params=start_params, disp=False)
         return self
     
     def predict(self, X, n_periods: int = 30):
@@ -110,15 +155,21 @@ class SarimaxModel(BaseEstimator, TransformerMixin):
 class VarModel(BaseEstimator, TransformerMixin):
     """Wrapper de VAR para scikit-learn"""
     
-    def __init__(self, maxlags: int = 15, ic: str = 'aic'):
+    def __init__(self, maxlags: int = 15, ic: str = 'aic', warm_start: bool = False):
         self.maxlags = maxlags
         self.ic = ic
+        self.warm_start = warm_start
         self.model = None
         self.fitted_model = None
         
     def fit(self, X, y=None):
         self.model = VAR(X)
-        self.fitted_model = self.model.fit(maxlags=self.maxlags, ic=self.ic)
+        if getattr(self, 'warm_start', False) and self.fitted_model is not None:
+            # Reentrenamiento en caliente: se conserva el orden ya seleccionado y solo se
+            # recalcula la estimación por mínimos cuadrados, sin repetir la búsqueda por criterio de información
+            self.fitted_model = self.model.fit(maxlags=self.fitted_model.k_ar, ic=None)
+        else:
+            self.fitted_model = self.model.fit(maxlags=self.maxlags, ic=self.ic)
         return self
     
     def predict(self, X, n_periods: int = 30):
@@ -129,7 +180,7 @@ class VarModel(BaseEstimator, TransformerMixin):
         return pd.DataFrame(forecast, columns=X.columns)
     
     def get_params(self, deep=True):
-        return {'maxlags': self.maxlags, 'ic': self.ic}
+        return {'maxlags': self.maxlags, 'ic': self.ic, 'warm_start': getattr(self, 'warm_start', False)}
     
     def set_params(self, **parameters):
         for parameter, value in parameters.items():
@@ -165,9 +216,8 @@ class LSTMModel(BaseEstimator, TransformerMixin):
         self.model = self._build_model(X_seq.shape[1:], y_seq.shape[1])
         
         self.model.fit(
-            X_seq, y_seq,
+            self._sequence_dataset(scaled_data),
             epochs=self.epochs,
-            batch_size=self.batch_size,
             verbose=0,
             shuffle=False
         )
@@ -175,11 +225,31 @@ class LSTMModel(BaseEstimator, TransformerMixin):
         return self
     
     def _create_sequences(self, data):
-        X, y = [], []
-        for i in range(self.sequence_length, len(data)):
-            X.append(data[i-self.sequence_length:i])
-            y.append(data[i])
-        return np.array(X), np.array(y)
+        """Ventanas deslizantes como vistas sin copia: X[i] = data[i:i+L], y[i] = data[i+L]"""
+        data = np.asarray(data)
+        # sliding_window_view devuelve (n - L + 1, n_features, L); se descarta la última ventana
+        # (no tiene objetivo) y se reordena a (n - L, L, n_features) sin copiar memoria
+        windows = np.lib.stride_tricks.sliding_window_view(data, self.sequence_length, axis=0)
+        return windows[:-1].transpose(0, 2, 1), data[self.sequence_length:]
+    
+    def _sequence_dataset(self, data):
+        """Dataset de Keras con las ventanas de entrenamiento, en el mismo orden y por lotes de batch_size.
+
+        En series cortas las ventanas se copian a un array float32 (generarlas por lote con un gather
+        añade sobrecarga a cada paso); en las largas se generan por lotes, sin materializar todas.
+        """
+        data = np.asarray(data, dtype=np.float32)
+        n_windows = len(data) - self.sequence_length
+        if n_windows * self.sequence_length * data.shape[1] * data.itemsize <= WINDOW_ARRAY_MAX_BYTES:
+            X_seq, y_seq = self._create_sequences(data)
+            return tf.data.Dataset.from_tensor_slices((np.ascontiguousarray(X_seq), y_seq)).batch(self.batch_size)
+        return timeseries_dataset_from_array(
+            data[:-1],
+            targets=data[self.sequence_length:],
+            sequence_length=self.sequence_length,
+            batch_size=self.batch_size,
+            shuffle=False
+        )
     
     def _build_model(self, input_shape, output_dim):
         model = Sequential()
@@ -216,18 +286,54 @@ class LSTMModel(BaseEstimator, TransformerMixin):
         else:
             last_sequence = self.last_sequence
         
-        predictions_scaled = []
-        current_sequence = last_sequence.copy()
-        
-        for _ in range(n_periods):
-            next_step = self.model.predict(current_sequence, verbose=0)
-            predictions_scaled.append(next_step[0])
-            current_sequence = np.roll(current_sequence, -1, axis=1)
-            current_sequence[0, -1, :] = next_step[0]
+        predictions_scaled = self._rollout(last_sequence, n_periods)[0]
         
-        predictions = self.scaler.inverse_transform(np.array(predictions_scaled))
+        predictions = self.scaler.inverse_transform(predictions_scaled)
         return pd.DataFrame(predictions, columns=self.feature_names)
     
+    def predict_many(self, windows, n_periods: int = 30):
+        """Predicción de varias ventanas iniciales (escenarios) en un solo lote.
+
+        windows: array (n_ventanas, sequence_length, n_features) en unidades originales.
+        Devuelve un array (n_ventanas, n_periods, n_features) en unidades originales.
+        """
+        windows = np.asarray(windows, dtype=np.float64)
+        n_windows, _, n_features = windows.shape
+        
+        scaled = self.scaler.transform(windows.reshape(-1, n_features)).reshape(windows.shape)
+        predictions_scaled = self._rollout(scaled, n_periods)
+        
+        predictions = self.scaler.inverse_transform(predictions_scaled.reshape(-1, n_features))
+        return predictions.reshape(n_windows, n_periods, n_features)
+    
+    def _rollout(self, windows, n_periods):
+        """Predicción autorregresiva por lotes con un paso compilado y un buffer preasignado"""
+        n_windows, sequence_length, n_features = windows.shape
+        
+        # Ventanas iniciales seguidas de las predicciones: la entrada del paso t es buffer[:, t:t+L],
+        # una vista del buffer, así que no hay que desplazar (np.roll) ni copiar la ventana en cada paso
+        buffer = np.empty((n_windows, sequence_length + n_periods, n_features), dtype=np.float32)
+        buffer[:, :sequence_length] = windows
+        
+        predict_step = self._get_predict_step()
+        for t in range(n_periods):
+            buffer[:, sequence_length + t] = predict_step(buffer[:, t:t + sequence_length]).numpy()
+        
+        return buffer[:, sequence_length:]
+    
+    def _get_predict_step(self):
+        # model.predict reconstruye su bucle de inferencia en cada llamada; un tf.function se traza una vez
+        if getattr(self, '_predict_step', None) is None:
+            model = self.model
+            self._predict_step = tf.function(lambda x: model(x, training=False), reduce_retracing=True)
+        return self._predict_step
+    
+    def __getstate__(self):
+        # La función compilada no se puede serializar; se vuelve a crear tras cargar el modelo
+        state = self.__dict__.copy()
+        state.pop('_predict_step', None)
+        return state
+    
     def get_params(self, deep=True):
         return {
             'sequence_length': self.sequence_length,
@@ -0,0 +1,143 @@
+# app/model_cache.py
+"""
+Caché en memoria de los modelos cargados para predecir.
+
+Cada predicción cargaba de disco todos los modelos seleccionados. Ahora los
+modelos ya cargados se guardan en un LRU del proceso, con la ruta, la fecha
+de modificación y el tamaño del archivo como clave: si el archivo cambia en
+disco (reentrenamiento, incluso desde otro proceso) la entrada deja de
+coincidir y se vuelve a cargar.
+
+El total se acota con la memoria que ocupa cada modelo ya cargado, no con el
+tamaño del archivo (un .pkl de un LSTM apenas pesa unos KB en disco, pero
+TensorFlow reserva mucho más al cargarlo): se suman los bytes de sus arrays
+(numpy, pandas y pesos de Keras) más una cantidad fija por tipo de estimador.
+Es una estimación, no una medida exacta del proceso.
+"""
+
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+
+# Memoria fija de cada modelo además de sus arrays (objetos de Python, metadatos)
+BASE_OVERHEAD = 8 * 1024
+# Memoria adicional por tipo de estimador: el LSTM arrastra el grafo y las capas de Keras
+ESTIMATOR_OVERHEAD = {"LSTMModel": 4 * 1024 * 1024}
+# Solo se recorren los atributos de los objetos de estos paquetes (no los internos de TensorFlow)
+WALKED_PACKAGES = {"app", "sklearn", "statsmodels"}
+MAX_DEPTH = 8
+
+
+def model_size(model):
+    """Memoria aproximada (bytes) de un modelo cargado: sus arrays más una cantidad fija por tipo"""
+    size = BASE_OVERHEAD + _array_bytes(model, set(), MAX_DEPTH)
+    for _, step in getattr(model, "steps", [("", model)]):
+        size += ESTIMATOR_OVERHEAD.get(type(step).__name__, 0)
+    return size
+
+
+def _array_bytes(obj, seen, depth):
+    if id(obj) in seen or depth < 0:
+        return 0
+    seen.add(id(obj))
+
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    if isinstance(obj, (pd.DataFrame, pd.Series, pd.Index)):
+        usage = obj.memory_usage(deep=True)
+        return int(usage.sum() if isinstance(usage, pd.Series) else usage)
+    if hasattr(obj, "count_params") and hasattr(obj, "weights"):
+        # Modelo de Keras: pesos (variables de TensorFlow, no arrays de numpy)
+        return sum(int(np.prod(w.shape)) * np.dtype(w.dtype).itemsize for w in obj.weights)
+    if isinstance(obj, dict):
+        return sum(_array_bytes(value, seen, depth - 1) for value in obj.values())
+    if isinstance(obj, (list, tuple)):
+        return sum(_array_bytes(value, seen, depth - 1) for value in obj)
+    if type(obj).__module__.split(".", 1)[0] in WALKED_PACKAGES and hasattr(obj, "__dict__"):
+        return _array_bytes(vars(obj), seen, depth - 1)
+    return 0
+
+
+class ModelCache:
+    """LRU de modelos cargados acotado por memoria"""
+
+    def __init__(self, app=None, max_bytes=512 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # {ruta: (mtime_ns, tamaño del archivo, modelo, memoria estimada)}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.max_bytes = app.config.get("MODEL_CACHE_MAX_MB", 512) * 1024 * 1024
+        app.extensions["model_cache"] = self
+
+    def get(self, path, loader):
+        """Devolver el modelo de la ruta, cargándolo con loader(path) si no está en caché o ha cambiado.
+
+        Devuelve (modelo, True si venía de la caché). El modelo se comparte entre
+        predicciones: no debe modificarse.
+        """
+        path = Path(path)
+        stat = path.stat()
+        key = str(path.resolve())
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[:2] == (stat.st_mtime_ns, stat.st_size):
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return entry[2], True
+            self._stats["misses"] += 1
+
+        # La carga se hace fuera del lock para no bloquear al resto de predicciones
+        model = loader(path)
+        size = model_size(model)
+
+        with self._lock:
+            self._discard(key)
+            if size <= self.max_bytes:
+                self._entries[key] = (stat.st_mtime_ns, stat.st_size, model, size)
+                self._bytes += size
+                self._evict()
+        return model, False
+
+    def invalidate(self, paths=None):
+        """Vaciar la caché (o solo las rutas indicadas), p. ej. tras reentrenar"""
+        with self._lock:
+            keys = list(self._entries) if paths is None else [str(Path(p).resolve()) for p in paths]
+            for key in keys:
+                if self._discard(key):
+                    self._stats["invalidations"] += 1
+
+    def stats(self):
+        with self._lock:
+            requests = self._stats["hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "hit_rate": self._stats["hits"] / requests if requests else None,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "models": [Path(key).name for key in self._entries],
+            }
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        self._bytes -= entry[3]
+        return True
+
+    def _evict(self):
+        # Se descartan los menos usados recientemente hasta volver al límite
+        while self._bytes > self.max_bytes and self._entries:
+            key = next(iter(self._entries))
+            self._discard(key)
+            self._stats["evictions"] += 1
@@ -4,14 +4,15 @@ Registro de clases personalizadas para deserialización de modelos.
 Esto es necesario porque joblib necesita acceso a las clases originales.
 """
 
-from app.ml_models import SarimaModel, SarimaxModel, VarModel, LSTMModel
+from app.ml_models import SarimaModel, SarimaxModel, VarModel, LSTMModel, SharedScaler
 
 # Lista de todas las clases personalizadas que se usan en los modelos
 CUSTOM_CLASSES = {
     'SarimaModel': SarimaModel,
     'SarimaxModel': SarimaxModel,
     'VarModel': VarModel,
-    'LSTMModel': LSTMModel
+    'LSTMModel': LSTMModel,
+    'SharedScaler': SharedScaler
 }
 
 def register_custom_classes():
@@ -19,9 +19,35 @@ class User(db.Model, UserMixin):
 
 class Dataset(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    filename = db.Column(db.String(120), nullable=False)
+    filename = db.Column(db.String(120), nullable=False, index=True)
     uploaded_at = db.Column(db.DateTime, default=datetime.utcnow)
     filepath = db.Column(db.String(200), nullable=False)  # ruta en disco
-    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)    
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=True)  # None: datos compartidos
+
+    # Metadatos calculados al subir el archivo (None en registros anteriores hasta que se completan)
+    rows = db.Column(db.Integer)
+    columns = db.Column(db.JSON)
+    date_start = db.Column(db.Date)
+    date_end = db.Column(db.Date)
+    size = db.Column(db.BigInteger)
+    content_hash = db.Column(db.String(64), index=True)
+    stats = db.Column(db.JSON)  # {variable: {count, missing, mean, std, min, max}}
+
+    def set_metadata(self, metadata):
+        for key, value in metadata.items():
+            setattr(self, key, value)
+
+    def to_file_info(self):
+        return {
+            'name': self.filename,
+            'size': self.size,
+            'columns': self.columns,
+            'rows': self.rows,
+            'date_start': self.date_start.isoformat() if self.date_start else None,
+            'date_end': self.date_end.isoformat() if self.date_end else None,
+            'content_hash': self.content_hash,
+            'stats': self.stats,
+            'uploaded_at': self.uploaded_at.isoformat() if self.uploaded_at else None,
+        }
 
 
@@ -0,0 +1,137 @@
+# app/order_search.py
+"""
+Búsqueda automática del orden SARIMA/SARIMAX.
+
+Los candidatos se evalúan en paralelo en un pool de procesos en dos rondas:
+una ronda rápida (pocas iteraciones del optimizador) que descarta los órdenes
+cuyo criterio de información es claramente peor que el mejor, y una ronda
+con el ajuste completo solo para los supervivientes. Un presupuesto de
+tiempo detiene la búsqueda y se queda con el mejor orden encontrado: al
+agotarse se cancelan los candidatos pendientes y no se espera a los ajustes
+que ya están en marcha (terminan en segundo plano y se descartan).
+"""
+
+import itertools
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+import numpy as np
+from statsmodels.tsa.statespace.sarimax import SARIMAX
+
+
+# Iteraciones del ajuste completo (las mismas que usa statsmodels por defecto en SarimaModel.fit)
+FULL_MAXITER = 50
+
+
+def candidate_orders(order, seasonal_order, max_p=2, max_q=2, max_P=1, max_Q=1):
+    """Rejilla de candidatos alrededor de la diferenciación (d, D) y el periodo s indicados"""
+    _, d, _ = order
+    _, D, _, s = seasonal_order
+
+    candidates = []
+    for p, q, P, Q in itertools.product(range(max_p + 1), range(max_q + 1), range(max_P + 1), range(max_Q + 1)):
+        candidates.append(((p, d, q), (P, D, Q, s)))
+    # Primero los modelos más sencillos: si se agota el tiempo, al menos estarán evaluados
+    candidates.sort(key=lambda c: sum(c[0]) + sum(c[1][:3]))
+    return candidates
+
+
+def fit_candidate(endog, exog, order, seasonal_order, trend, maxiter, criterion):
+    """Ajustar un candidato y devolver su criterio de información (inf si falla)"""
+    try:
+        model = SARIMAX(endog, exog=exog,
+                        order=order,
+                        seasonal_order=seasonal_order,
+                        trend=trend,
+                        enforce_stationarity=False,
+                        enforce_invertibility=False)
+        result = model.fit(disp=False, maxiter=maxiter, cov_type='none')
+        value = getattr(result, criterion)
+        return order, seasonal_order, float(value) if np.isfinite(value) else np.inf
+    except Exception:
+        return order, seasonal_order, np.inf
+
+
+def _run_round(executor, endog, exog, candidates, trend, maxiter, criterion, deadline):
+    """Evaluar un conjunto de candidatos hasta que terminen o se agote el tiempo"""
+    # Se envían en orden (los más sencillos primero) y el pool los ejecuta en ese mismo orden
+    futures = set()
+    for order, seasonal_order in candidates:
+        futures.add(executor.submit(fit_candidate, endog, exog, order, seasonal_order, trend, maxiter, criterion))
+    scores = {}
+
+    while futures:
+        timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+        done, futures = wait(futures, timeout=timeout, return_when=FIRST_COMPLETED)
+        for future in done:
+            order, seasonal_order, value = future.result()
+            scores[(order, seasonal_order)] = value
+        if deadline is not None and time.monotonic() >= deadline:
+            for future in futures:
+                future.cancel()
+            break
+
+    return scores
+
+
+def search_sarima_order(series, candidates, exog=None, trend='c', criterion='aic', n_jobs=1,
+                        time_budget=None, prune_delta=10.0, screening_maxiter=10, progress_callback=None):
+    """Buscar el mejor orden SARIMA entre los candidatos.
+
+    Devuelve un diccionario con el orden ganador, su criterio y el resumen de la búsqueda.
+    """
+    if time_budget is not None and not time_budget > 0:
+        raise ValueError(f"El presupuesto de tiempo debe ser positivo (o None, sin límite): {time_budget}")
+    if n_jobs < 1:
+        raise ValueError(f"El número de procesos debe ser al menos 1: {n_jobs}")
+
+    started = time.monotonic()
+    deadline = None if time_budget is None else started + time_budget
+    endog = np.asarray(series, dtype=float)
+    exog = None if exog is None else np.asarray(exog, dtype=float)
+    notify = progress_callback or (lambda message: None)
+
+    # 'spawn' por el mismo motivo que en el entrenamiento en paralelo
+    context = multiprocessing.get_context("spawn")
+    # Un proceso por candidato como mucho y no más que CPUs: al agotarse el tiempo, los ajustes en
+    # marcha siguen ocupando sus procesos hasta terminar
+    workers = max(1, min(n_jobs, len(candidates), os.cpu_count() or 1))
+    executor = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+    try:
+        # Ronda 1: ajuste rápido de todos los candidatos
+        screening = _run_round(executor, endog, exog, candidates, trend, screening_maxiter, criterion, deadline)
+        finite = {c: v for c, v in screening.items() if np.isfinite(v)}
+        if not finite:
+            return None
+
+        best_screening = min(finite.values())
+        survivors = sorted((c for c, v in finite.items() if v <= best_screening + prune_delta), key=finite.get)
+        notify(f"🔎 {len(screening)}/{len(candidates)} candidatos evaluados, "
+               f"{len(survivors)} tras la poda ({criterion.upper()} ≤ {best_screening + prune_delta:.1f})")
+
+        # Ronda 2: ajuste completo de los supervivientes
+        final = {}
+        if deadline is None or time.monotonic() < deadline:
+            final = _run_round(executor, endog, exog, survivors, trend, FULL_MAXITER, criterion, deadline)
+        final = {c: v for c, v in final.items() if np.isfinite(v)}
+    finally:
+        # Salir del pool con wait=True esperaría a los ajustes en marcha, que pueden tardar sin límite
+        timed_out = deadline is not None and time.monotonic() >= deadline
+        executor.shutdown(wait=not timed_out, cancel_futures=True)
+
+    scores = final or finite
+    order, seasonal_order = min(scores, key=scores.get)
+
+    return {
+        'order': order,
+        'seasonal_order': seasonal_order,
+        'criterion': criterion,
+        'value': scores[(order, seasonal_order)],
+        'evaluated': len(screening),
+        'candidates': len(candidates),
+        'survivors': len(survivors),
+        'complete': len(screening) == len(candidates) and len(final) == len(survivors),
+        'elapsed': time.monotonic() - started,
+    }
@@ -0,0 +1,203 @@
+# app/plots.py
+"""
+Gráficos de las predicciones.
+
+Las figuras se construyen con la API orientada a objetos de matplotlib
+(Figure, sin el estado global de pyplot), así que se pueden renderizar en un
+pool de procesos fuera del trabajo de predicción. Las imágenes se guardan en
+una caché por hash de la predicción: la misma predicción no se vuelve a
+rasterizar. En modo "json" no se genera ninguna imagen y el navegador dibuja
+las series (diezmadas) que se devuelven con los resultados.
+"""
+
+import base64
+import hashlib
+import io
+import multiprocessing
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.style
+from matplotlib.figure import Figure
+import numpy as np
+import pandas as pd
+import seaborn as sns
+
+# Configuración de gráficos (también en los procesos del pool, que importan este módulo)
+matplotlib.style.use('seaborn-v0_8-darkgrid')
+sns.set_palette("husl")
+
+MAIN_VARIABLES = ['Temperatura', 'Humedad relativa', 'Precipitaciones', 'ETc']
+SERIES_COLUMNS = ['NB', 'NB_RDC', 'ETc', 'ET0', 'Temperatura', 'Humedad relativa', 'Precipitaciones']
+
+
+def figure_to_base64(fig):
+    img = io.BytesIO()
+    fig.savefig(img, format='png', dpi=100, bbox_inches='tight')
+    return base64.b64encode(img.getvalue()).decode()
+
+
+def irrigation_figure(predictions_df):
+    """Gráfico 1: necesidad de riego"""
+    fig = Figure(figsize=(12, 6), layout='tight')
+    ax = fig.subplots()
+    ax.plot(predictions_df.index, predictions_df['NB'],
+            color='blue', linewidth=2, marker='o', markersize=4)
+    ax.fill_between(predictions_df.index, 0, predictions_df['NB'],
+                    alpha=0.3, color='lightblue')
+    ax.set_title('Necesidad de Riego Predicha', fontsize=14, fontweight='bold')
+    ax.set_xlabel('Fecha')
+    ax.set_ylabel('Riego (mm/día)')
+    ax.grid(True, alpha=0.3)
+    ax.tick_params(axis='x', rotation=45)
+    return fig
+
+
+def variables_figure(predictions_df, main_vars):
+    """Gráfico 2: variables principales"""
+    fig = Figure(figsize=(15, 10), layout='tight')
+    axes = fig.subplots(2, 2).flatten()
+
+    for ax, var in zip(axes, main_vars[:4]):
+        ax.plot(predictions_df.index, predictions_df[var],
+                linewidth=2, alpha=0.7)
+        ax.set_title(f'Predicción: {var}')
+        ax.set_xlabel('Fecha')
+        ax.set_ylabel(var)
+        ax.grid(True, alpha=0.3)
+        ax.tick_params(axis='x', rotation=45)
+    return fig
+
+
+def render_plots(predictions_df):
+    """Renderizar los gráficos de una predicción.
+
+    Devuelve (gráficos en base64, mensajes de progreso); se ejecuta en los procesos del pool.
+    """
+    plots, messages = {}, []
+
+    try:
+        plots['riego'] = figure_to_base64(irrigation_figure(predictions_df))
+        messages.append('  ✅ Gráfico de riego generado')
+    except Exception as e:
+        messages.append(f'  ❌ Error en gráfico de riego: {e}')
+
+    try:
+        main_vars = []
+        for var in MAIN_VARIABLES:
+            matching = [col for col in predictions_df.columns if var in col]
+            if matching:
+                main_vars.append(matching[0])
+
+        if main_vars and len(main_vars) <= 4:
+            plots['variables'] = figure_to_base64(variables_figure(predictions_df, main_vars))
+            messages.append(f'  ✅ Gráfico de {len(main_vars)} variables generado')
+    except Exception as e:
+        messages.append(f'  ❌ Error en gráfico de variables: {e}')
+
+    return plots, messages
+
+
+def forecast_hash(predictions_df):
+    """Hash del contenido de una predicción (índice, columnas y valores)"""
+    digest = hashlib.sha256()
+    digest.update(repr(list(predictions_df.columns)).encode())
+    digest.update(pd.util.hash_pandas_object(predictions_df, index=True).values.tobytes())
+    return digest.hexdigest()
+
+
+def decimate_series(predictions_df, max_points=400, columns=SERIES_COLUMNS):
+    """Series para dibujar en el navegador, con como mucho max_points puntos (incluye el primero y el último)"""
+    n = len(predictions_df)
+    positions = np.unique(np.linspace(0, n - 1, min(n, max_points)).round().astype(int)) if n else []
+    sampled = predictions_df.iloc[positions]
+
+    return {
+        'fechas': [d.strftime('%Y-%m-%d') for d in pd.to_datetime(sampled.index)],
+        'series': {col: [None if pd.isna(v) else round(float(v), 4) for v in sampled[col]]
+                   for col in columns if col in sampled},
+    }
+
+
+class PlotRenderer:
+    """Renderizado de gráficos en un pool de procesos con caché por hash de la predicción"""
+
+    def __init__(self, app=None, workers=1, cache_size=128, mode="png", max_points=400):
+        self.workers = workers
+        self.cache_size = cache_size
+        self.mode = mode
+        self.max_points = max_points
+        self._executor = None
+        self._cache = OrderedDict()  # {hash: gráficos}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.workers = app.config.get("PLOT_WORKERS", 1)
+        self.cache_size = app.config.get("PLOT_CACHE_SIZE", 128)
+        self.mode = app.config.get("PLOT_MODE", "png")
+        self.max_points = app.config.get("PLOT_MAX_POINTS", 400)
+        app.extensions["plot_renderer"] = self
+
+    def _get_executor(self):
+        # El pool se crea al primer uso; 'spawn' porque el proceso web tiene hilos en marcha
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                     mp_context=multiprocessing.get_context("spawn"))
+            return self._executor
+
+    def render(self, predictions, progress_tracker):
+        """Gráficos de cada predicción {modelo: {nombre: png en base64}}; vacío en modo json"""
+        if self.mode == "json":
+            progress_tracker.update_progress(6, '📈 Gráficos en el navegador: se envían las series sin rasterizar')
+            return {}
+
+        progress_tracker.update_progress(6, '🎨 Generando visualizaciones...')
+
+        plots, pending = {}, {}
+        for name, prediction_df in predictions.items():
+            key = forecast_hash(prediction_df)
+            with self._lock:
+                cached = self._cache.get(key)
+                if cached is not None:
+                    self._cache.move_to_end(key)
+            if cached is not None:
+                plots[name] = cached
+                progress_tracker.update_progress(6, f'  ♻️ Gráficos de {name} recuperados de la caché')
+            elif self.workers > 0:
+                pending[name] = (key, self._get_executor().submit(render_plots, prediction_df))
+            else:
+                pending[name] = (key, None)
+
+        for name, (key, future) in pending.items():
+            try:
+                model_plots, messages = future.result() if future else render_plots(predictions[name])
+            except Exception as e:
+                # Si el pool falla (p. ej. un proceso muere) se renderiza en el propio trabajo
+                progress_tracker.update_progress(6, f'  ⚠️ Pool de gráficos no disponible ({e}), renderizando aquí')
+                model_plots, messages = render_plots(predictions[name])
+            for message in messages:
+                progress_tracker.update_progress(6, message)
+            plots[name] = model_plots
+            self._store(key, model_plots)
+
+        # Mantener el orden de las predicciones
+        plots = {name: plots[name] for name in predictions}
+        progress_tracker.update_progress(6, '✅ Visualizaciones completadas', is_substep=True, substep_total=3)
+        return plots
+
+    def series(self, predictions):
+        """Series diezmadas de cada predicción para dibujarlas en el navegador"""
+        return {name: decimate_series(prediction_df, self.max_points) for name, prediction_df in predictions.items()}
+
+    def _store(self, key, model_plots):
+        with self._lock:
+            self._cache[key] = model_plots
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
@@ -1,23 +1,25 @@
 import time
-from app.state import PREDICTION_PROGRESS
+from app import job_records
 
 class Progress_tracker:
-    def __init__(self, process_tracked, total_steps):
+    def __init__(self, process_tracked, total_steps, user_id=None):
         self.key = process_tracked
+        self.n_messages = 0
 
-        PREDICTION_PROGRESS[self.key] = {
+        # Estado local del trabajo; cada cambio se escribe en job_records
+        self.state = {
             'current_step': 0,
             'total_steps': total_steps,
             'current_message': 'Iniciando...',
-            'step_messages': [],
             'is_complete': False,
             'start_time': time.time(),
             'current_substep': 0,
             'total_substeps': 0
         }
+        job_records.start_progress(self.key, self.state, user_id=user_id)
 
     def update_progress(self, step, message, is_substep=False, substep_total=0):
-        p = PREDICTION_PROGRESS[self.key]
+        p = self.state
 
         if is_substep:
             p['current_substep'] += 1
@@ -28,10 +30,14 @@ class Progress_tracker:
             p['current_substep'] = 0
             p['total_substeps'] = 0
 
-        p['step_messages'].append({
+        # El id de cada mensaje es su posición (desde 1): los streams reanudan a partir de él
+        self.n_messages += 1
+        job_records.update_progress(self.key, p, {
+            'id': self.n_messages,
             'timestamp': time.time(),
             'message': message
         })
 
     def complete_progress(self):
-        PREDICTION_PROGRESS[self.key]['is_complete'] = True
+        self.state['is_complete'] = True
+        job_records.update_progress(self.key, self.state)
@@ -1,14 +1,19 @@
 # routes.py
-from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app, jsonify, send_file, session
+from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app, jsonify, session, Response
 from werkzeug.utils import secure_filename
-from app import db
+from app import db, job_manager, job_records, models_lru, forecasts_lru, plot_renderer
+from app.jobs import new_job_id
 from app.models import Dataset, User
+from sqlalchemy import func
 import os
 from flask_login import login_user, logout_user, login_required, current_user
 
 import pandas as pd
 from datetime import datetime, timedelta
 import io
+import itertools
+import json
+import traceback
 from pathlib import Path
 import warnings
 warnings.filterwarnings('ignore')
@@ -19,11 +24,14 @@ register_custom_classes()
 
 from app.progress_tracker import Progress_tracker
 
-from app.auxiliary_prediction_functions import load_selected_models, load_selected_file, make_future_predictions, unify_predictions, calculate_irrigation, create_prediction_plots
+from app.auxiliary_prediction_functions import load_selected_models, load_selected_file, make_future_predictions, unify_predictions, calculate_irrigation, EFICIENCIA_RIEGO, FRACCION_RDC
 
 from app.train_models import train_and_save, Config
-
-from app.state import PREDICTION_PROGRESS, PREDICTION_RESULTS
+from app.artifacts import find_model_files
+from app.irrigation_scenarios import irrigation_scenarios
+from app.forecast_results import store_forecasts, load_forecasts, iter_forecasts, forecast_names, results_json_view
+from app import exports
+from app.ingestion import ingest_upload, ingest_station_exports, IngestionError
 
 
 
@@ -31,11 +39,96 @@ main = Blueprint("main", __name__)
 
 UPLOAD_FOLDER = "uploads"
 ALLOWED_EXTENSIONS = {"csv"}
+STATION_EXTENSIONS = {"csv", "xlsx", "xlsm"}  # Exportaciones de las estaciones Cesens
 MODELS_PATH = Path(__file__).resolve().parent / "models"
-
-
-def allowed_file(filename):
-    return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
+MAX_ESCENARIOS_RIEGO = 20000
+SSE_KEEPALIVE_SECONDS = 15
+EXPORT_MIMETYPES = {
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+    "zip": "application/zip",
+}
+
+
+def allowed_file(filename, extensions=ALLOWED_EXTENSIONS):
+    return "." in filename and filename.rsplit(".", 1)[1].lower() in extensions
+
+def request_user_id():
+    return current_user.id if current_user.is_authenticated else None
+
+def resolve_job_id(kind):
+    """Id de trabajo de la petición o, si no se indica, el último trabajo del usuario de ese tipo"""
+    job_id = request.args.get("job_id")
+    if job_id:
+        return job_id
+    job = job_manager.latest(kind, request_user_id())
+    return job["id"] if job else None
+
+def user_job(job_id, user_id):
+    """Trabajo de la cola solo si es del usuario indicado"""
+    job = job_manager.get(job_id) if job_id else None
+    if job is None or job["user_id"] != user_id:
+        return None
+    return job
+
+def job_progress(kind):
+    """Progreso de un trabajo junto con su estado en la cola (solo los mensajes posteriores a ?since=)"""
+    job_id = resolve_job_id(kind)
+    job = user_job(job_id, request_user_id())
+    progress = job_records.get_progress(job_id, request_user_id(), since=request.args.get("since", 0, type=int)) or {}
+    if job:
+        progress['job_id'] = job_id
+        progress['status'] = job['status']
+    return progress
+
+def sse_event(event, data, event_id=None):
+    """Mensaje en formato Server-Sent Events"""
+    lines = [f"event: {event}"]
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"data: {json.dumps(data, default=str)}")
+    return "\n".join(lines) + "\n\n"
+
+def job_progress_stream(kind):
+    """Stream SSE con los mensajes de progreso de un trabajo posteriores al último recibido por el cliente"""
+    job_id = resolve_job_id(kind)
+    # EventSource envía Last-Event-ID al reconectar; la primera conexión puede indicarlo por parámetro
+    try:
+        last_id = int(request.headers.get("Last-Event-ID") or request.args.get("last_event_id") or 0)
+    except ValueError:
+        last_id = 0
+
+    user_id = request_user_id()
+
+    def events():
+        nonlocal last_id
+        while True:
+            job_records.wait_for_progress(job_id, last_id, timeout=SSE_KEEPALIVE_SECONDS)
+            progress = job_records.get_progress(job_id, user_id, since=last_id)
+
+            if progress is None:
+                yield sse_event('error', {'error': 'Trabajo no encontrado'})
+                return
+            new_messages = progress.pop('step_messages')
+            state = progress
+            if not new_messages and not state['is_complete']:
+                # Comentario para que los proxies no cierren la conexión
+                yield ": keepalive\n\n"
+                continue
+
+            job = user_job(job_id, user_id)
+            state['job_id'] = job_id
+            state['status'] = job['status'] if job else None
+            for message in new_messages:
+                last_id = message['id']
+                yield sse_event('progress', {**state, 'message': message}, last_id)
+            if state['is_complete']:
+                yield sse_event('complete', state, last_id)
+                return
+
+    return Response(events(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 # ====================
 # RUTAS BÁSICAS (mantén las existentes)
@@ -90,6 +183,9 @@ def logout():
 @main.route("/upload", methods=["GET", "POST"])
 @login_required
 def upload_file():
+    if request.method == "POST" and "station_files" in request.files:
+        return upload_station_exports()
+
     if request.method == "POST":
         if "file" not in request.files:
             flash("No se ha seleccionado archivo", "danger")
@@ -106,9 +202,16 @@ def upload_file():
             upload_path = os.path.join(current_app.config["UPLOAD_FOLDER"], filename)
 
             os.makedirs(os.path.dirname(upload_path), exist_ok=True)
-            file.save(upload_path)
+
+            # Se guarda, valida y convierte en una sola pasada; /api/archivos_datos solo consulta los metadatos
+            try:
+                metadata = ingest_upload(file.stream, upload_path)
+            except IngestionError as e:
+                flash(f"Archivo no válido: {e}", "danger")
+                return redirect(request.url)
 
             dataset = Dataset(filename=filename, filepath=upload_path, user_id=current_user.id)
+            dataset.set_metadata(metadata)
             db.session.add(dataset)
             db.session.commit()
 
@@ -121,6 +224,32 @@ def upload_file():
     datasets = Dataset.query.filter_by(user_id=current_user.id).order_by(Dataset.uploaded_at.desc()).all()
     return render_template("upload.html", datasets=datasets)
 
+def upload_station_exports():
+    """Exportaciones de estación (una o varias, p. ej. una por año): se agregan por día en un CSV de entrenamiento"""
+    files = [file for file in request.files.getlist("station_files") if file.filename]
+    if not files:
+        flash("No se ha seleccionado archivo", "danger")
+        return redirect(request.url)
+    if not all(allowed_file(file.filename, STATION_EXTENSIONS) for file in files):
+        flash("Formato no permitido. Solo Excel (xlsx) o CSV", "danger")
+        return redirect(request.url)
+
+    upload_folder = current_app.config["UPLOAD_FOLDER"]
+    os.makedirs(upload_folder, exist_ok=True)
+    try:
+        filename, metadata = ingest_station_exports([(file.stream, file.filename) for file in files], upload_folder)
+    except IngestionError as e:
+        flash(f"Exportación no válida: {e}", "danger")
+        return redirect(request.url)
+
+    dataset = Dataset(filename=filename, filepath=os.path.join(upload_folder, filename), user_id=current_user.id)
+    dataset.set_metadata(metadata)
+    db.session.add(dataset)
+    db.session.commit()
+
+    flash(f"Datos diarios guardados como {filename}", "success")
+    return redirect(url_for("main.upload_file"))
+
 
 # ====================
 # RUTAS DE PREDICCIÓN
@@ -142,11 +271,56 @@ def prediccion_progreso():
 
 @main.route("/api/progreso_prediccion")
 def api_progreso_prediccion():
-    return jsonify(PREDICTION_PROGRESS.get('prediccion', {}))
+    return jsonify(job_progress("prediccion"))
+
+@main.route("/api/progreso_prediccion/stream")
+def api_progreso_prediccion_stream():
+    return job_progress_stream("prediccion")
 
 @main.route("/api/prediccion_resultados")
 def api_progreso_resultados():
-    return jsonify(PREDICTION_RESULTS)
+    # Las predicciones se guardan en binario; la vista JSON se genera aquí
+    return jsonify(results_json_view(job_records.get_results(resolve_job_id("prediccion"), request_user_id()) or {}))
+
+@main.route("/api/escenarios_riego", methods=["POST"])
+@login_required
+def api_escenarios_riego():
+    """API para comparar escenarios de riego sobre las predicciones de un trabajo"""
+    try:
+        params = request.get_json(silent=True) or {}
+        deficit_fractions = [float(f) for f in params.get("deficit_fractions", [FRACCION_RDC])]
+        efficiencies = [float(e) for e in params.get("efficiencies", [EFICIENCIA_RIEGO])]
+        kc_curves = params.get("kc_curves") or None
+        if kc_curves is not None and not isinstance(kc_curves, dict):
+            raise ValueError("kc_curves debe ser un objeto {nombre: curva}")
+        if not all(0 <= f <= 1 for f in deficit_fractions) or not all(0 < e <= 1 for e in efficiencies):
+            raise ValueError("Las fracciones RDC deben estar en [0, 1] y las eficiencias en (0, 1]")
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+
+    results = job_records.get_results(params.get("job_id") or resolve_job_id("prediccion"), current_user.id) or {}
+    forecasts = load_forecasts(results)
+    if not forecasts:
+        return jsonify({'error': 'No hay predicciones para ese trabajo'}), 404
+
+    n_scenarios = len(forecasts) * len(kc_curves or [None]) * len(deficit_fractions) * len(efficiencies)
+    if n_scenarios > MAX_ESCENARIOS_RIEGO:
+        return jsonify({'error': f'Demasiados escenarios ({n_scenarios}), el máximo es {MAX_ESCENARIOS_RIEGO}'}), 400
+
+    try:
+        summary = irrigation_scenarios(forecasts, deficit_fractions, efficiencies, kc_curves)
+    except (TypeError, ValueError, IndexError) as e:
+        return jsonify({'error': f'Parámetros de escenario no válidos: {e}'}), 400
+    return jsonify({'escenarios': summary.to_dict(orient='records')})
+
+@main.route("/api/jobs/<job_id>")
+@login_required
+def api_job(job_id):
+    """Estado de un trabajo en segundo plano (los de otros usuarios no existen para este)"""
+    job = user_job(job_id, current_user.id)
+    if job is None:
+        return jsonify({'error': 'Trabajo no encontrado'}), 404
+    return jsonify(job)
 
 @main.route("/prediccion/resultados")
 @login_required
@@ -154,127 +328,202 @@ def prediccion_resultados():
     """Página para mostrar los resultados de la prediccion"""
     return render_template("prediction_results.html")
 
-@main.route("/prediccion/proceso", methods=["POST"])
-@login_required
-def prediccion_proceso():
-            
-    # Inicializar progreso
-    progress_tracker = Progress_tracker("prediccion", 6)
-   
-
-    """Ruta para iniciar el proceso de predicción en segundo plano"""
+def prediction_cache_key(selected_models, prediction_file_path):
+    """Clave de la caché de predicciones, o None si no hay modelos o datos con los que calcularla"""
+    model_types = [selected_models] if isinstance(selected_models, str) else list(selected_models or [])
+    model_files = [f for model_type in model_types for f in find_model_files(f"{model_type}_*")]
+    data_path = Path(current_app.config["UPLOAD_FOLDER"]) / (prediction_file_path or "")
+    if not model_files or not data_path.is_file():
+        return None
+    # Cada modelo guarda el nombre de su escalador, que no cambia de contenido (su nombre es el hash de
+    # los datos de entrenamiento): la versión de los archivos de modelo ya lo cubre
+    return forecasts_lru.key(model_types, model_files, data_path)
+
+def store_prediction_results(results, predictions, plots, horizon_days):
+    """Guardar las predicciones (en binario por columnas) y los gráficos de un trabajo"""
+    store_forecasts(results, predictions)
+    results['horizon_days'] = horizon_days
+    results['prediction_plots'] = plots
+    # Series reducidas para dibujar en el navegador (modo de gráficos "json")
+    results['prediction_series'] = plot_renderer.series(predictions)
+
+def serve_cached_prediction(progress_tracker, job_id, predictions, plots, horizon_days):
+    """Completar un trabajo de predicción con un resultado de la caché"""
+    results = {}
     try:
-        # Obtener parámetros
-        horizon_days = int(request.form.get("horizon_days", 30))
-        horizon_days = min(horizon_days, 365)
-
-
-        selected_models = request.form.get("models")
+        progress_tracker.update_progress(0, '♻️ Predicción recuperada de la caché')
+        if plots is None:
+            # Horizonte más corto que el guardado: solo se regeneran los gráficos del recorte
+            plots = plot_renderer.render(predictions, progress_tracker)
+        store_prediction_results(results, predictions, plots, horizon_days)
+        progress_tracker.update_progress(6, '✅ ¡Predicción completada exitosamente!')
+    finally:
+        job_records.save_results(job_id, results)
+        progress_tracker.complete_progress()
 
+def run_prediction(progress_tracker, job_id, selected_models, prediction_file_path, horizon_days, cache_key=None,
+                   n_jobs=1, model_timeout=None):
+    """Proceso de predicción completo, ejecutado como trabajo en segundo plano"""
+    results = {}
 
-        # Ejecutar predicción (en la práctica, esto debería ser en un hilo separado)
-        # Por simplicidad, lo hacemos sincrónico
+    try:
         progress_tracker.update_progress(0, '🚀 Iniciando proceso de predicción...')
-        
 
         # Paso 1: Cargar modelos
         models = load_selected_models(selected_models, progress_tracker)
         if not models:
             progress_tracker.update_progress(1, '❌ No se pudieron cargar modelos')
-            progress_tracker.complete_progress()
-            return jsonify({'error': 'No se encontraron modelos entrenados'}), 400
-        
+            results['error'] = 'No se encontraron modelos entrenados'
+            return
 
         # Paso 2: Cargar datos
-        prediction_file_path = request.form.get("data_file")
-
         prediction_file = load_selected_file(prediction_file_path, progress_tracker)
 
-        
         # Paso 3: Hacer predicciones
-        predictions = make_future_predictions(progress_tracker, models, prediction_file, horizon_days)
+        predictions, discarded = make_future_predictions(progress_tracker, models, prediction_file, horizon_days,
+                                                         n_jobs=n_jobs, timeout=model_timeout)
+        # Modelos sin predicción y su motivo, para mostrarlos en la página de resultados
+        results['modelos_descartados'] = discarded
         if not predictions:
             progress_tracker.update_progress(3, '❌ No se pudieron generar predicciones')
-            progress_tracker.complete_progress()
-            return jsonify({'error': 'No se pudieron generar predicciones'}), 400
-        
+            results['error'] = 'No se pudieron generar predicciones'
+            return
+        # Un resultado al que le falta algún modelo (error o tiempo agotado) no se guarda en la caché
+        complete = not discarded and set(predictions) == set(models)
+
         # Paso 4: Unificar predicciones
         predictions = unify_predictions(predictions, progress_tracker)
-        
+
         # Paso 5: Calcular riego
         for name, prediction_df in predictions.items():
             predictions[name] = calculate_irrigation(prediction_df, progress_tracker)
-            PREDICTION_RESULTS[f'predictions_data_{name}'] = predictions[f'{name}'].to_json(orient='records', date_format='iso')
-
 
         # Paso 6: Crear gráficos
-        plots = {}
-        for name, prediction_df in predictions.items():
-            plots[name] = create_prediction_plots(prediction_df, progress_tracker)
-        
-        # Guardar resultados en sesión
-        PREDICTION_RESULTS['horizon_days'] = horizon_days
-        PREDICTION_RESULTS['prediction_plots'] = plots
-        
-        # Completar progreso
+        plots = plot_renderer.render(predictions, progress_tracker)
+
+        # Guardar resultados del trabajo
+        store_prediction_results(results, predictions, plots, horizon_days)
+
+        if cache_key and not complete:
+            missing = ', '.join(discarded) or ', '.join(sorted(set(models) - set(predictions)))
+            progress_tracker.update_progress(6, f'⚠️ Faltan predicciones de {missing}: el resultado no se guarda en la caché')
+        elif cache_key:
+            # Con menos filas de datos que días de horizonte SARIMAX rellena las exógenas
+            # con el último valor, así que ese resultado no sirve para recortarlo
+            forecasts_lru.put(cache_key, horizon_days, predictions, plots,
+                               sliceable=len(prediction_file) >= horizon_days)
+
         progress_tracker.update_progress(6, '✅ ¡Predicción completada exitosamente!')
-        progress_tracker.complete_progress()
-        
-        return jsonify({
-            'success': True,
-            'redirect_url': url_for('main.prediccion_resultados')
-        })
-        
-    except Exception as e:
-        import traceback
-        progress_tracker.update_progress(0, traceback.print_exc())
 
-        progress_tracker.update_progress(0, f'❌ Error en el proceso: {traceback.print_exc()}')
+    except Exception as e:
+        progress_tracker.update_progress(0, f'❌ Error en el proceso: {traceback.format_exc()}')
+        results['error'] = str(e)
+        raise
 
+    finally:
+        # Los resultados se guardan antes de marcar el trabajo como completo
+        job_records.save_results(job_id, results)
         progress_tracker.complete_progress()
-        return jsonify({'error': str(e)}), 500
 
-
-@main.route("/descargar_resultados")
+@main.route("/prediccion/proceso", methods=["POST"])
 @login_required
-def descargar_resultados():
-
+def prediccion_proceso():
+    """Ruta para iniciar el proceso de predicción en segundo plano"""
     try:
-        # Crear archivo en memoria
-        output = io.BytesIO()
-
-        # Crear Excel writer
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-
-            for key, value in PREDICTION_RESULTS.items():
-
-                # Solo procesar claves que contengan los datos de predicción
-                if key.startswith("predictions_data_"):
-
-                    model_name = key.replace("predictions_data_", "")
+        # Obtener parámetros
+        horizon_days = int(request.form.get("horizon_days", 30))
+        horizon_days = min(horizon_days, 365)
 
-                    # Convertir JSON a DataFrame
-                    df = pd.read_json(value, orient='records')
+        selected_models = request.form.get("models")
+        prediction_file_path = request.form.get("data_file")
 
-                    # Nombre hoja (máx 31 caracteres en Excel)
-                    sheet_name = model_name[:31].upper()
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
+
+    # El progreso se inicializa antes de encolar para que la página de progreso lo encuentre
+    job_id = new_job_id()
+    progress_tracker = Progress_tracker(job_id, 6, user_id=current_user.id)
+    params = {'models': selected_models, 'data_file': prediction_file_path, 'horizon_days': horizon_days}
+
+    cache_key = prediction_cache_key(selected_models, prediction_file_path)
+    cached = forecasts_lru.get(cache_key, horizon_days) if cache_key else None
+    if cached is not None:
+        # Mismos modelos y datos: se sirve el resultado guardado sin pasar por la cola
+        serve_cached_prediction(progress_tracker, job_id, *cached, horizon_days)
+        job_manager.record("prediccion", job_id, user_id=current_user.id, params=params)
+        return jsonify({
+            'success': True,
+            'cached': True,
+            'job_id': job_id,
+            'progress_url': url_for('main.prediccion_progreso', job_id=job_id),
+            'redirect_url': url_for('main.prediccion_resultados', job_id=job_id)
+        })
 
-                    df.to_excel(writer, sheet_name=sheet_name, index=False)
+    job_manager.submit(
+        "prediccion", run_prediction,
+        progress_tracker, job_id, selected_models, prediction_file_path, horizon_days, cache_key,
+        n_jobs=current_app.config["PREDICTION_N_JOBS"],
+        model_timeout=current_app.config["PREDICTION_MODEL_TIMEOUT"] or None,
+        user_id=current_user.id,
+        params=params,
+        job_id=job_id,
+    )
 
-        output.seek(0)
+    return jsonify({
+        'success': True,
+        'cached': False,
+        'job_id': job_id,
+        'progress_url': url_for('main.prediccion_progreso', job_id=job_id),
+        'redirect_url': url_for('main.prediccion_resultados', job_id=job_id)
+    }), 202
 
-        filename = f"resultados_prediccion_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
 
-        return send_file(
-            output,
-            download_name=filename,
-            as_attachment=True,
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        )
+@main.route("/descargar_resultados")
+@login_required
+def descargar_resultados():
+    """Descargar las predicciones de un trabajo.
+
+    ?formato= zip (por defecto, un CSV por modelo), xlsx (una hoja por modelo),
+    o csv / parquet de un solo modelo (?modelo=, por defecto el primero).
+    zip, csv y parquet se generan mientras se envían; el Excel se escribe entero
+    antes de responder. En todos los casos la primera predicción se decodifica
+    antes de responder, así que unos resultados ilegibles dan un error y no un
+    archivo a medias.
+    """
+    results = job_records.get_results(resolve_job_id("prediccion"), current_user.id) or {}
+    names = forecast_names(results)
+    if not names:
+        return {"error": "No hay predicciones para ese trabajo"}, 404
+
+    export_format = request.args.get("formato", "zip")
+    if export_format not in EXPORT_MIMETYPES:
+        return {"error": f"Formato no soportado: {export_format}"}, 400
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
 
-    except Exception as e:
-        current_app.logger.error(f"Error descargando resultados: {e}")
-        return {"error": "No se pudieron descargar los resultados"}, 500
+    try:
+        if export_format in ("csv", "parquet"):
+            model_name = request.args.get("modelo") or names[0]
+            if model_name not in names:
+                return {"error": "No hay predicciones de ese modelo"}, 404
+            if export_format == "parquet" and not exports.parquet_available():
+                return {"error": "La exportación a Parquet necesita pyarrow"}, 400
+            df = load_forecasts(results, [model_name])[model_name]
+            body = exports.csv_chunks(df) if export_format == "csv" else exports.parquet_chunks(df)
+            filename = f"resultados_prediccion_{model_name}_{timestamp}.{export_format}"
+        elif export_format == "zip":
+            forecasts = iter_forecasts(results)
+            first = next(forecasts)
+            body = exports.zip_chunks(itertools.chain([first], forecasts))
+            filename = f"resultados_prediccion_{timestamp}.zip"
+        else:
+            body = exports.file_chunks(exports.excel_file(iter_forecasts(results)))
+            filename = f"resultados_prediccion_{timestamp}.xlsx"
+    except Exception:
+        current_app.logger.exception("Error preparando la descarga de las predicciones")
+        return {"error": "No se pudieron leer las predicciones de ese trabajo"}, 500
+
+    return Response(body, mimetype=EXPORT_MIMETYPES[export_format],
+                    headers={'Content-Disposition': f'attachment; filename={filename}'})
     
 
 @main.route('/api/check_trained_models')
@@ -284,8 +533,8 @@ def check_trained_models():
     available_types = set()
     
     if MODELS_PATH.exists():
-        # Listamos archivos .pkl y verificamos el inicio del nombre
-        for file in MODELS_PATH.glob("*.pkl"):
+        # Listamos los modelos guardados (.npz o .pkl) y verificamos el inicio del nombre
+        for file in find_model_files():
             filename = file.name.lower()
             for p in prefixes:
                 if filename.startswith(f"{p}_"):
@@ -324,16 +573,29 @@ def entrenamiento_progreso():
 @login_required
 def api_progreso_entrenamiento():
     """API para obtener el progreso actual del entrenamiento"""
-    return jsonify(PREDICTION_PROGRESS.get('entrenamiento', {}))
+    return jsonify(job_progress("entrenamiento"))
+
+@main.route("/api/progreso_entrenamiento/stream")
+@login_required
+def api_progreso_entrenamiento_stream():
+    """Stream SSE con el progreso del entrenamiento"""
+    return job_progress_stream("entrenamiento")
+
+def run_training(progress_tracker, config):
+    """Proceso de entrenamiento completo, ejecutado como trabajo en segundo plano"""
+    progress_tracker.update_progress(0, '🚀 Iniciando proceso de entrenamiento...')
+    try:
+        train_and_save(progress_tracker, config)
+    except Exception as e:
+        progress_tracker.update_progress(5, f'❌ Error entrenando modelos: {str(e)}')
+        raise
+    finally:
+        progress_tracker.complete_progress()
 
 @main.route("/entrenamiento/proceso", methods=["POST"])
 @login_required
 def entrenamiento_proceso():
     """Ruta para iniciar el proceso de entrenamiento en segundo plano"""
-
-    # Inicializar progreso
-    progress_tracker = Progress_tracker("entrenamiento", 5)
-    
     try:
         # Obtener parámetros del formulario
         data_filename = request.form.get("data_file")
@@ -358,70 +620,77 @@ def entrenamiento_proceso():
 
         var_maxlags = int(request.form.get("var_maxlags", 15))
 
-        
-        # Verificar que se haya seleccionado al menos un modelo
-        if not any(models_to_train.values()):
-            return jsonify({'error': 'Selecciona al menos un tipo de modelo para entrenar'}), 400
-        
-        
-        sarima_order = (sarima_p, sarima_d, sarima_q)
-        sarima_seasonal_order = (sarima_p, sarima_d, sarima_q, sarima_s)
-
-        # Crear configuración
-        config = Config(
-            data_filename,
-            sarima_order,
-            sarima_seasonal_order,
-            var_maxlags,
-            test_size
-        )
-        
-        # Ejecutar entrenamiento (en la práctica, esto debería ser en un hilo separado)
-        # Por simplicidad, lo hacemos sincrónico
-        progress_tracker.update_progress(0, '🚀 Iniciando proceso de entrenamiento...')
-        try:
-            train_and_save(progress_tracker, config)
-            flash("Modelos entrenados exitosamente", "success")
-        except Exception as e:
-            flash(f"Error entrenando modelos: {str(e)}", "danger")
-
-        # Completar progreso
-        progress_tracker.complete_progress()
-        
-        return jsonify({
-            'success': True,
-        })
-        
+        # No más procesos que CPUs, pida lo que pida el formulario
+        n_jobs = int(request.form.get("n_jobs", current_app.config["TRAINING_N_JOBS"]))
+        if n_jobs < 1:
+            raise ValueError("El número de procesos en paralelo debe ser al menos 1")
+        n_jobs = min(n_jobs, os.cpu_count() or 1)
+        incremental = request.form.get("incremental") in ("1", "true", "on")
+
+        # Búsqueda automática del orden SARIMA
+        auto_order = request.form.get("sarima_auto_order") in ("1", "true", "on")
+        # Vacío: sin límite de tiempo
+        order_search_budget = request.form.get("order_search_budget", "600").strip()
+        order_search_budget = float(order_search_budget) if order_search_budget else None
+        if order_search_budget is not None and not order_search_budget > 0:
+            raise ValueError("El tiempo máximo de búsqueda debe ser mayor que 0 (vacío para no limitarlo)")
+
     except Exception as e:
-        progress_tracker.update_progress(5, f'❌ Error en el proceso: {str(e)}')
-        progress_tracker.complete_progress()
-        return jsonify({'error': str(e)}), 500
+        return jsonify({'error': str(e)}), 400
+
+    # Verificar que se haya seleccionado al menos un modelo
+    if not any(models_to_train.values()):
+        return jsonify({'error': 'Selecciona al menos un tipo de modelo para entrenar'}), 400
+
+    sarima_order = (sarima_p, sarima_d, sarima_q)
+    sarima_seasonal_order = (sarima_p, sarima_d, sarima_q, sarima_s)
+
+    # Crear configuración
+    config = Config(
+        data_filename,
+        sarima_order,
+        sarima_seasonal_order,
+        var_maxlags,
+        test_size,
+        n_jobs,
+        incremental,
+        auto_order,
+        order_search_budget
+    )
+
+    # El progreso se inicializa antes de encolar para que la página de progreso lo encuentre
+    job_id = new_job_id()
+    progress_tracker = Progress_tracker(job_id, 5, user_id=current_user.id)
+
+    job_manager.submit(
+        "entrenamiento", run_training, progress_tracker, config,
+        user_id=current_user.id,
+        params={'data_file': data_filename, 'test_size': test_size, 'models': request.form.getlist("models")},
+        job_id=job_id,
+    )
+
+    return jsonify({
+        'success': True,
+        'job_id': job_id,
+        'progress_url': url_for('main.entrenamiento_progreso', job_id=job_id)
+    }), 202
 
 
 @main.route("/api/archivos_datos")
 @login_required
 def api_archivos_datos():
-    """API para obtener archivos de datos disponibles"""
-    
-    uploads_dir = Path(current_app.config["UPLOAD_FOLDER"])
-    data_files = []
-    
-    if uploads_dir.exists():
-        for file_path in uploads_dir.glob("*.csv"):
-            try:
-                # Leer información básica del archivo
-                df = pd.read_csv(file_path, nrows=1)
-                file_info = {
-                    'name': file_path.name,
-                    'size': file_path.stat().st_size,
-                    'columns': df.columns.tolist(),
-                    'rows': sum(1 for _ in open(file_path)) - 1  # Excluir encabezado
-                }
-                data_files.append(file_info)
-            except Exception as e:
-                print(f"Error leyendo {file_path}: {e}")
-    
-    return jsonify({'files': data_files})
+    """API para obtener archivos de datos disponibles.
+
+    Solo consulta los registros: los que aún no tienen metadatos y los CSV sin
+    registro aparecen tras `flask datasets backfill` (app/cli.py).
+    """
+    # Último registro de cada archivo (subir otro con el mismo nombre lo sustituye en disco)
+    latest = db.session.query(func.max(Dataset.id)).group_by(Dataset.filename)
+    datasets = (Dataset.query
+                .filter(Dataset.id.in_(latest), Dataset.content_hash.isnot(None))
+                .order_by(Dataset.filename)
+                .all())
+    return jsonify({'files': [dataset.to_file_info() for dataset in datasets]})
 
 @main.route("/api/modelos_disponibles")
 @login_required
@@ -430,7 +699,20 @@ def api_modelos_disponibles():
     modelos = []
     
     if MODELS_PATH.exists():
-        for file_path in MODELS_PATH.glob("*.pkl"):
+        # Solo los modelos, no los artefactos compartidos (escalador)
+        for file_path in find_model_files():
             modelos.append(file_path.name)
     
     return jsonify({'modelos': modelos})
+
+@main.route("/api/cache_modelos")
+@login_required
+def api_cache_modelos():
+    """API con las estadísticas de la caché de modelos cargados"""
+    return jsonify(models_lru.stats())
+
+@main.route("/api/cache_predicciones")
+@login_required
+def api_cache_predicciones():
+    """API con las estadísticas de la caché de resultados de predicción"""
+    return jsonify(forecasts_lru.stats())
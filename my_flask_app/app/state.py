@@ -1,3 +0,0 @@
-PREDICTION_PROGRESS = {}
-
-PREDICTION_RESULTS = {}
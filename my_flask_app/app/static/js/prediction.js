@@ -332,9 +332,6 @@ $(document).ready(function() {
 
         console.log(formData)
         
-        // Redirigir a la página de progreso
-        window.location.href = window.PREDICTION_PROGRESS_URL;
-
         // Enviar solicitud
         $.ajax({
             url: window.PREDICTION_PROCESS_URL,
@@ -344,7 +341,13 @@ $(document).ready(function() {
             contentType: false,
             success: function(response) {
                 if (response.success) {
-                    console.log("✅ Predicción exitosa!")
+                    if (response.cached) {
+                        // Resultado ya calculado: directamente a la página de resultados
+                        window.location.href = response.redirect_url;
+                    } else {
+                        // El trabajo queda encolado: ir a la página de progreso del trabajo
+                        window.location.href = response.progress_url || window.PREDICTION_PROGRESS_URL;
+                    }
                 } else {
                     showError(response.error || 'Error al iniciar la predicción');
                     $('#startTrainingBtn').prop('disabled', false).html('<i class="fas fa-play me-2"></i>Iniciar Predicción');
@@ -3,6 +3,8 @@ document.addEventListener('DOMContentLoaded', function() {
     let autoScrollEnabled = true;
     let startTime = new Date();
     let updateInterval;
+    // Id del trabajo en segundo plano (viene en la URL de la página de progreso)
+    const jobId = new URLSearchParams(window.location.search).get('job_id');
     
     // Elementos del DOM
     const mainProgressBar = document.getElementById('main-progress-bar');
@@ -26,8 +28,12 @@ document.addEventListener('DOMContentLoaded', function() {
     updateElapsedTime();
     setInterval(updateElapsedTime, 1000);
     
-    // Iniciar polling de progreso
-    startProgressPolling();
+    // Recibir el progreso por SSE (o por polling si el navegador no lo soporta)
+    if (window.EventSource) {
+        startProgressStream();
+    } else {
+        startProgressPolling();
+    }
 
 
     // Función para actualizar el tiempo transcurrido
@@ -43,6 +49,36 @@ document.addEventListener('DOMContentLoaded', function() {
             `${hours.toString().padStart(2, '0')}:${minutes.toString().padStart(2, '0')}:${seconds.toString().padStart(2, '0')}`;
     }
     
+    // Función para recibir el progreso como eventos del servidor (solo los mensajes nuevos)
+    function startProgressStream() {
+        const streamUrl = jobId ? `/api/progreso_entrenamiento/stream?job_id=${jobId}` : '/api/progreso_entrenamiento/stream';
+        // Al reconectar, EventSource envía el último id recibido y el servidor continúa desde ahí
+        const source = new EventSource(streamUrl);
+
+        source.addEventListener('progress', function(event) {
+            const data = JSON.parse(event.data);
+            updateProgressUI({ ...data, step_messages: [data.message] });
+        });
+
+        source.addEventListener('complete', function(event) {
+            const data = JSON.parse(event.data);
+            source.close();
+            updateProgressUI(data);
+            showCompletionScreen(data);
+        });
+
+        source.addEventListener('error', function(event) {
+            // Error enviado por el servidor (p. ej. trabajo no encontrado): se deja de escuchar
+            if (event.data) {
+                source.close();
+                addConsoleMessage(`[ERROR] ${JSON.parse(event.data).error}`, 'danger');
+            }
+        });
+
+        // Para que el botón de cancelar pueda cerrar la conexión
+        updateInterval = source;
+    }
+
     // Función para iniciar el polling de progreso
     function startProgressPolling() {
         // Primera actualización inmediata
@@ -52,10 +88,19 @@ document.addEventListener('DOMContentLoaded', function() {
         updateInterval = setInterval(fetchProgress, 2000);
     }
     
+    // Detener el stream o el polling, según cuál esté activo
+    function stopProgressUpdates() {
+        if (updateInterval && typeof updateInterval.close === 'function') {
+            updateInterval.close();
+        } else {
+            clearInterval(updateInterval);
+        }
+    }
+    
     // Función para obtener el progreso desde la API
     async function fetchProgress() {
         try {
-            const response = await fetch('/api/progreso_entrenamiento');
+            const response = await fetch(jobId ? `/api/progreso_entrenamiento?job_id=${jobId}` : '/api/progreso_entrenamiento');
             if (!response.ok) throw new Error('Error en la respuesta del servidor');
             
             const data = await response.json();
@@ -63,7 +108,7 @@ document.addEventListener('DOMContentLoaded', function() {
             
             // Si el entrenamiento está completo, detener el polling
             if (data.is_complete) {
-                clearInterval(updateInterval);
+                stopProgressUpdates();
                 showCompletionScreen(data);
             }
         } catch (error) {
@@ -262,7 +307,7 @@ document.addEventListener('DOMContentLoaded', function() {
             cancelBtn.innerHTML = '<span class="spinner-border spinner-border-sm"></span> Cancelando...';
             
             // 2. Detener procesos locales
-            clearInterval(updateInterval); 
+            stopProgressUpdates(); 
             addConsoleMessage('🛑 Cancelación confirmada. Redirigiendo...', 'warning');
             
             // 3. Redirección inmediata a la página de configuración
@@ -257,8 +257,11 @@ $(document).ready(function() {
         $('#sarima_D').val(1);
         $('#sarima_Q').val(1);
         $('#sarima_s').val(30);
+        $('#sarima_auto_order').prop('checked', false);
+        $('#order_search_budget').val(600);
         $('#var_maxlags').val(15);
         $('#var_maxlags_slider').val(15);
+        $('#incremental').prop('checked', false);
         
         // Resetear archivo seleccionado
         $('.file-card').removeClass('selected');
@@ -360,11 +363,14 @@ $(document).ready(function() {
         formData.append('sarima_D', $('#sarima_D').val());
         formData.append('sarima_Q', $('#sarima_Q').val());
         formData.append('sarima_s', $('#sarima_s').val());
+        formData.append('sarima_auto_order', $('#sarima_auto_order').is(':checked') ? '1' : '0');
+        formData.append('order_search_budget', $('#order_search_budget').val());
         formData.append('var_maxlags', $('#var_maxlags').val());
-        
-        // Redirigir a la página de progreso
-        window.location.href = window.TRAINING_PROGRESS_URL;
 
+        // Opciones de entrenamiento
+        formData.append('n_jobs', $('#n_jobs').val());
+        formData.append('incremental', $('#incremental').is(':checked') ? '1' : '0');
+        
         // Enviar solicitud
         $.ajax({
             url: window.TRAINING_PROCESS_URL,
@@ -374,7 +380,8 @@ $(document).ready(function() {
             contentType: false,
             success: function(response) {
                 if (response.success) {
-                    console.log("✅ Entrenamiento exitoso!")
+                    // El trabajo queda encolado: ir a la página de progreso del trabajo
+                    window.location.href = response.progress_url || window.TRAINING_PROGRESS_URL;
                 } else {
                     showError(response.error || 'Error al iniciar el entrenamiento');
                     $('#startTrainingBtn').prop('disabled', false).html('<i class="fas fa-play me-2"></i>Iniciar Entrenamiento');
@@ -0,0 +1,189 @@
+# app/station_data.py
+"""
+Agregación diaria de las exportaciones de las estaciones Cesens.
+
+Las estaciones de clima y suelo exportan una lectura cada pocos minutos
+(normalmente cada 15), en Excel o CSV y un archivo por año. Los modelos y el
+cálculo del riego trabajan con series diarias, así que las exportaciones se
+leen por bloques de filas (openpyxl en modo read_only para los Excel) y de cada
+bloque solo se guardan, por día y variable, la suma, el número de lecturas, el
+mínimo y el máximo. Esos acumulados se combinan con los de los bloques y
+archivos anteriores, de modo que la memoria crece con el número de días y no
+con el de lecturas, por largo que sea el histórico.
+
+Del resultado se obtienen la media, el mínimo, el máximo y la suma diarios de
+cada variable y, a partir de ellos, los datos de entrenamiento con las mismas
+columnas que datos_entrenamiento_fisico.csv (TRAINING_COLUMNS), más la ET0
+diaria de la estación por FAO-56 completo (app.evapotranspiration) con las
+temperaturas y humedades máxima y mínima de cada día.
+"""
+
+from itertools import islice
+from pathlib import Path
+
+import pandas as pd
+from openpyxl import load_workbook
+
+from app.datasets import complete_daily, date_column
+from app.evapotranspiration import et0_fao56
+
+
+CHUNK_ROWS = 50_000
+STATISTICS = ("mean", "min", "max", "sum")
+EXCEL_EXTENSIONS = {"xlsx", "xlsm"}
+
+# Columnas de los datos de entrenamiento: (variable de la estación, estadístico diario)
+TRAINING_COLUMNS = {
+    "Humedad relativa": ("Humedad relativa", "mean"),
+    "Temperatura": ("Temperatura", "mean"),
+    "Velocidad del viento": ("Velocidad del viento", "mean"),
+    "Presión atmosférica": ("Presión atmosférica", "mean"),
+    "Radiación solar": ("Radiación solar", "sum"),
+    "Precipitaciones": ("Precipitaciones", "sum"),
+    "Humedad relativa mínima": ("Humedad relativa", "min"),
+}
+
+ET0_COLUMN = "ET0"
+# Estación Clima La Canduela (Palencia)
+LATITUD_ESTACION = 42.8
+# Radiación solar media del día [W/m²] -> MJ/m²/día
+W_M2_A_MJ_DIA = 86400 / 1e6
+
+
+class DailyAggregator:
+    """Suma, número de lecturas, mínimo y máximo por día y variable, acumulados bloque a bloque.
+
+    Los bloques pueden llegar en cualquier orden, repetir días (un día partido
+    entre dos bloques o dos archivos) y traer columnas distintas.
+    """
+
+    def __init__(self):
+        self.sum = self.count = self.min = self.max = None
+        self.readings = 0
+
+    def update(self, chunk):
+        """Añadir un bloque de lecturas (DataFrame con índice de fechas)"""
+        values = chunk.select_dtypes("number")
+        days = values.groupby(values.index.normalize())
+        totals = days.sum(), days.count(), days.min(), days.max()
+        self.readings += len(values)
+
+        if self.sum is None:
+            self.sum, self.count, self.min, self.max = totals
+            return
+        chunk_sum, chunk_count, chunk_min, chunk_max = totals
+        self.sum = self.sum.add(chunk_sum, fill_value=0)
+        self.count = self.count.add(chunk_count, fill_value=0)
+        self.min = pd.concat([self.min, chunk_min]).groupby(level=0).min()
+        self.max = pd.concat([self.max, chunk_max]).groupby(level=0).max()
+
+    def daily(self, statistics=STATISTICS):
+        """Estadísticos diarios, con columnas (variable, estadístico); NaN los días sin lecturas de una variable"""
+        if self.sum is None:
+            raise ValueError("No hay lecturas que agregar")
+        valid = self.count > 0
+        frames = {
+            "mean": self.sum / self.count.where(valid),
+            "min": self.min.where(valid),
+            "max": self.max.where(valid),
+            "sum": self.sum.where(valid),
+        }
+        daily = pd.concat({statistic: frames[statistic] for statistic in statistics}, axis=1)
+        daily = daily.swaplevel(axis=1)[self.sum.columns]
+        daily.index.name = self.sum.index.name
+        return daily.astype("float64")
+
+
+def is_excel(filename):
+    return "." in str(filename) and str(filename).rsplit(".", 1)[1].lower() in EXCEL_EXTENSIONS
+
+
+def read_chunks(source, filename=None, chunk_rows=CHUNK_ROWS):
+    """Lecturas de una exportación por bloques (DataFrame con índice de fechas y columnas numéricas).
+
+    source es una ruta o un archivo abierto en binario; filename indica su formato si no es una ruta.
+    """
+    filename = filename or source
+    if is_excel(filename):
+        return excel_chunks(source, chunk_rows)
+    return csv_chunks(source, chunk_rows)
+
+
+def excel_chunks(source, chunk_rows=CHUNK_ROWS):
+    """Bloques de la primera hoja de un Excel, leída fila a fila"""
+    workbook = load_workbook(source, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = [str(column).strip() for column in next(rows, ()) if column is not None]
+        if not header:
+            raise ValueError("La hoja está vacía")
+        date_col = date_column(header)
+        while True:
+            batch = list(islice(rows, chunk_rows))
+            if not batch:
+                break
+            chunk = pd.DataFrame([row[:len(header)] for row in batch], columns=header)
+            chunk = chunk.dropna(how="all")
+            if len(chunk):
+                yield readings(chunk, date_col)
+    finally:
+        workbook.close()
+
+
+def csv_chunks(source, chunk_rows=CHUNK_ROWS):
+    chunks = pd.read_csv(source, chunksize=chunk_rows, encoding="utf-8-sig")
+    date_col = None
+    for chunk in chunks:
+        date_col = date_col or date_column(chunk.columns)
+        yield readings(chunk, date_col)
+
+
+def readings(chunk, date_col):
+    """Índice de fechas y variables numéricas (lo que no es un número cuenta como vacío)"""
+    dates = pd.to_datetime(chunk[date_col], errors="coerce")
+    if dates.isna().any():
+        # El formato se deduce de la primera fecha; con formatos distintos se interpreta cada una por separado
+        dates = pd.to_datetime(chunk[date_col], errors="coerce", format="mixed")
+    values = chunk.drop(columns=date_col).apply(pd.to_numeric, errors="coerce")
+    values.index = pd.DatetimeIndex(dates, name=date_col)
+    # Filas sin fecha válida (p. ej. totales al final de la hoja)
+    return values[values.index.notna()]
+
+
+def aggregate(sources, chunk_rows=CHUNK_ROWS):
+    """Acumular varias exportaciones (rutas o pares (archivo, nombre)) en un solo DailyAggregator"""
+    aggregator = DailyAggregator()
+    for source in sources:
+        source, filename = source if isinstance(source, tuple) else (source, Path(source).name)
+        for chunk in read_chunks(source, filename, chunk_rows):
+            aggregator.update(chunk)
+    return aggregator
+
+
+def training_data(aggregator):
+    """Datos diarios con las columnas de entrenamiento (TRAINING_COLUMNS), completos e interpolados"""
+    daily = aggregator.daily()
+    missing = sorted({variable for variable, _ in TRAINING_COLUMNS.values()} - set(daily.columns.get_level_values(0)))
+    if missing:
+        raise ValueError(f"Faltan variables de la estación: {', '.join(missing)}")
+    training = pd.DataFrame({name: daily[key] for name, key in TRAINING_COLUMNS.items()}, index=daily.index)
+    training[ET0_COLUMN] = daily_et0(daily)
+    return complete_daily(training)
+
+
+def daily_et0(daily, latitude=LATITUD_ESTACION):
+    """ET0 diaria [mm/día] por FAO-56 a partir de los estadísticos diarios de daily()"""
+    et0 = et0_fao56(
+        T=daily[("Temperatura", "mean")],
+        RH=daily[("Humedad relativa", "mean")],
+        u2=daily[("Velocidad del viento", "mean")],
+        P=daily[("Presión atmosférica", "mean")] / 10,  # hPa -> kPa
+        Rs=daily[("Radiación solar", "mean")] * W_M2_A_MJ_DIA,
+        day_of_year=daily.index.dayofyear,
+        latitude=latitude,
+        T_max=daily[("Temperatura", "max")],
+        T_min=daily[("Temperatura", "min")],
+        RH_max=daily[("Humedad relativa", "max")],
+        RH_min=daily[("Humedad relativa", "min")],
+    )
+    return pd.Series(et0, index=daily.index, name=ET0_COLUMN)
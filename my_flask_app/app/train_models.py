@@ -1,10 +1,14 @@
 # train_models.py
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import hashlib
+import json
+import multiprocessing
+import time
 import warnings
 warnings.filterwarnings("ignore")
 
 import pandas as pd
-import joblib
 
 from sklearn.pipeline import Pipeline
 from sklearn.preprocessing import StandardScaler, RobustScaler, MinMaxScaler
@@ -14,7 +18,11 @@ from sklearn.compose import ColumnTransformer
 from app.model_registry import register_custom_classes
 register_custom_classes()
 
-from app.ml_models import SarimaModel, SarimaxModel, VarModel, LSTMModel
+from app.ml_models import SarimaModel, SarimaxModel, VarModel, LSTMModel, SharedScaler
+from app.order_search import candidate_orders, search_sarima_order
+from app import models_lru
+from app.artifacts import save_model, load_model, save_scaler, find_model_files, model_file, COMPACT_EXTENSION
+from app.datasets import load_dataset, model_variables
 
 
 # =========================
@@ -26,15 +34,25 @@ BASE_DIR = DIR_APP.parent
 UPLOADS_PATH = BASE_DIR / "uploads" 
 MODELS_PATH = DIR_APP / "models"
 
+SHARED_SCALER_PREFIX = "shared_scaler_"
+# Índice {nombre del modelo: {"key": hash de sus datos y configuración, "scaler": escalador con el que se entrenó}}
+# del último entrenamiento guardado
+TRAINING_CACHE_INDEX = MODELS_PATH / "training_cache.json"
+
 MODELS_PATH.mkdir(exist_ok=True)
 
 class Config:
-    def __init__(self, data_filename, sarima_order, sarima_seasonal_order, var_maxlags, test_size):
+    def __init__(self, data_filename, sarima_order, sarima_seasonal_order, var_maxlags, test_size, n_jobs=1,
+                 incremental=False, auto_order=False, order_search_budget=None):
         self.data_filename = data_filename
         self.SARIMA_ORDER = sarima_order
         self.SARIMA_SEASONAL_ORDER = sarima_seasonal_order
         self.VAR_MAXLAGS = var_maxlags
         self.TEST_SIZE = test_size
+        self.N_JOBS = max(1, int(n_jobs))
+        self.INCREMENTAL = incremental
+        self.AUTO_ORDER = auto_order
+        self.ORDER_SEARCH_BUDGET = order_search_budget
 
 # =========================
 # FUNCIONES AUXILIARES
@@ -46,21 +64,12 @@ def load_and_prepare_data(data_filename, progress_tracker) -> pd.DataFrame:
 
     progress_tracker.update_progress(1, f"📂 Cargando datos de: {DATA_PATH}")
 
+    # Copia diaria limpia del CSV (solo se vuelve a leer el CSV si ha cambiado)
+    df, cached = load_dataset(DATA_PATH)
+    if cached:
+        progress_tracker.update_progress(1, "♻️ Datos recuperados de la caché")
+    df = model_variables(df)
 
-    
-    df = pd.read_csv(DATA_PATH)
-    
-    # Detectar columna de fecha
-    date_cols = [col for col in df.columns if 'fecha' in col.lower()]
-    if date_cols:
-        df = pd.read_csv(DATA_PATH, parse_dates=[date_cols[0]], index_col=date_cols[0])
-    else:
-        df = pd.read_csv(DATA_PATH)
-        if 'Fecha' in df.columns:
-            df['Fecha'] = pd.to_datetime(df['Fecha'])
-            df.set_index('Fecha', inplace=True)
-    
-    
     progress_tracker.update_progress(1, f"✅ Datos cargados: {df.shape[0]} filas, {df.shape[1]} columnas")
     progress_tracker.update_progress(1, f'📅 Rango temporal: {df.index.min().strftime("%Y-%m-%d")} a {df.index.max().strftime("%Y-%m-%d")}')
     progress_tracker.update_progress(1, f'📋 Columnas disponibles: {", ".join(df.columns.tolist()[:5])}...')
@@ -87,21 +96,25 @@ def temporal_train_test_split(df, test_size, progress_tracker):
 
     return train_df, test_df
 
-def create_custom_scaler(df):
-    """Crear ColumnTransformer para escalado personalizado"""
-    # Identificar columnas para cada tipo de escalado
-    all_cols = df.columns.tolist()
-    
+def scaler_columns(columns):
+    """Columnas para cada tipo de escalado: (StandardScaler, RobustScaler)"""
     # Columnas para StandardScaler (distribución normal)
     std_cols = []
     # Columnas para RobustScaler (con outliers)
     robust_cols = []
     
-    for col in all_cols:
+    for col in columns:
         if any(x in col.lower() for x in ['velocidad', 'presión', 'precipitacion', 'precipitaciones']):
             robust_cols.append(col)
         else:
             std_cols.append(col)
+
+    return std_cols, robust_cols
+
+def create_custom_scaler(df):
+    """Crear ColumnTransformer para escalado personalizado"""
+    # Identificar columnas para cada tipo de escalado
+    std_cols, robust_cols = scaler_columns(df.columns.tolist())
     
     print(f"🔧 Escalado: Standard={std_cols}, Robust={robust_cols}")
     
@@ -114,20 +127,46 @@ def create_custom_scaler(df):
         verbose_feature_names_out=False,
     ).set_output(transform="pandas")
 
+def shared_scaler_filename(train_df):
+    """Nombre del escalador compartido según el contenido y las columnas de los datos de entrenamiento.
+
+    Un escalador guardado no se sobrescribe nunca: cada modelo apunta al que se ajustó con sus
+    datos, aunque después se entrene con otro dataset o falle su reentrenamiento.
+    """
+    digest = hashlib.sha256()
+    digest.update(json.dumps(train_df.columns.tolist()).encode())
+    digest.update(pd.util.hash_pandas_object(train_df, index=True).values.tobytes())
+    return f"{SHARED_SCALER_PREFIX}{digest.hexdigest()[:16]}{COMPACT_EXTENSION}"
+
+def fit_shared_scaler(train_df, filename, progress_tracker):
+    """Ajustar el escalador una sola vez y guardarlo como artefacto compartido por todos los modelos"""
+    scaler = create_custom_scaler(train_df)
+    scaled_df = scaler.fit_transform(train_df)
+
+    save_path = MODELS_PATH / filename
+    if save_path.exists():
+        # Mismo contenido que el ya guardado (el nombre es el hash de los datos)
+        progress_tracker.update_progress(4, f"📐 Escalador compartido ajustado; se reutiliza: {save_path}")
+    else:
+        save_path = save_scaler(scaler, filename)
+        progress_tracker.update_progress(4, f"📐 Escalador compartido ajustado y guardado en: {save_path}")
+
+    return scaled_df
+
+
 # =========================
 # PIPELINES
 # =========================
-def create_sarima_pipelines(df, config):
+def create_sarima_pipelines(df, config, scaler_filename):
     """Crear pipelines SARIMA para cada variable"""
     pipelines = {}
-    scaler = create_custom_scaler(df)
     
     for col in df.columns:
         print(f"🔄 Creando pipeline SARIMA para: {col}")
         pipeline_name = f"sarima_{col}"
         
         pipelines[pipeline_name] = Pipeline([
-            ("scaler", scaler),
+            ("scaler", SharedScaler(scaler_filename)),
             ("sarima", SarimaModel(
                 column=col,
                 order=config.SARIMA_ORDER,
@@ -137,10 +176,9 @@ def create_sarima_pipelines(df, config):
     
     return pipelines
 
-def create_sarimax_pipelines(df, config):
+def create_sarimax_pipelines(df, config, scaler_filename):
     """Crear pipelines SARIMAX para cada variable"""
     pipelines = {}
-    scaler = create_custom_scaler(df)
     cols = df.columns.tolist()
     
     for target in cols:
@@ -150,7 +188,7 @@ def create_sarimax_pipelines(df, config):
         pipeline_name = f"sarimax_{target}"
         
         pipelines[pipeline_name] = Pipeline([
-            ("scaler", scaler),
+            ("scaler", SharedScaler(scaler_filename)),
             ("sarimax", SarimaxModel(
                 target_col=target,
                 exog_cols=exog,
@@ -161,13 +199,12 @@ def create_sarimax_pipelines(df, config):
     
     return pipelines
 
-def create_var_pipeline(df, config):
+def create_var_pipeline(df, config, scaler_filename):
     """Crear pipeline VAR multivariante"""
     print("🔄 Creando pipeline VAR multivariante")
-    scaler = create_custom_scaler(df)
     
     return Pipeline([
-        ("scaler", scaler),
+        ("scaler", SharedScaler(scaler_filename)),
         ("var", VarModel(maxlags=config.VAR_MAXLAGS)),
     ])
 
@@ -194,6 +231,203 @@ def create_lstm_pipeline(df):
 # =========================
 # ENTRENAMIENTO
 # =========================
+def fit_pipeline(name, pipeline, train_df, scaled_df):
+    """Entrenar un pipeline. Se ejecuta tanto en el proceso principal como en los workers"""
+    if isinstance(pipeline.steps[0][1], SharedScaler):
+        # El escalador compartido ya está ajustado: solo se entrena el estimador sobre los datos escalados
+        pipeline.steps[-1][1].fit(scaled_df)
+    else:
+        pipeline.fit(train_df)
+    return name, pipeline
+
+def save_pipeline(name, pipeline):
+    """Guardar un pipeline entrenado en MODELS_PATH (formato compacto si el modelo lo admite)"""
+    return save_model(name, pipeline)
+
+# =========================
+# CACHÉ DE ENTRENAMIENTO
+# =========================
+def training_cache_key(pipeline, train_df, config):
+    """Hash de los datos que usa el modelo y de su configuración"""
+    estimator = pipeline.steps[-1][1]
+
+    # Cada modelo solo depende de sus columnas (el escalado es independiente por columna)
+    if isinstance(estimator, SarimaModel):
+        columns = [estimator.column]
+    elif isinstance(estimator, SarimaxModel):
+        columns = [estimator.target_col] + list(estimator.exog_cols)
+    else:
+        columns = train_df.columns.tolist()
+
+    # Identidad del escalado: con un escalador compartido, el tipo de escalado de cada columna (sus
+    # estadísticos solo dependen de los datos de la columna, que ya forman parte del hash)
+    scaler = pipeline.steps[0][1]
+    if isinstance(scaler, SharedScaler):
+        _, robust_cols = scaler_columns(train_df.columns.tolist())
+        scaling = {column: 'robust' if column in robust_cols else 'std' for column in columns}
+    else:
+        scaling = type(scaler).__name__
+
+    model_config = {
+        'model': type(estimator).__name__,
+        'scaling': scaling,
+        'params': {k: v for k, v in estimator.get_params().items() if k != 'warm_start'},
+        'columns': columns,
+        'auto_order': config.AUTO_ORDER,
+        'order_search_budget': config.ORDER_SEARCH_BUDGET if config.AUTO_ORDER else None,
+    }
+
+    digest = hashlib.sha256()
+    digest.update(pd.util.hash_pandas_object(train_df[columns], index=True).values.tobytes())
+    digest.update(json.dumps(model_config, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+def load_training_cache_index():
+    try:
+        return json.loads(TRAINING_CACHE_INDEX.read_text())
+    except (FileNotFoundError, ValueError):
+        return {}
+
+def save_training_cache_index(index):
+    # Escritura atómica para no dejar un índice a medias si el proceso se interrumpe
+    tmp_path = TRAINING_CACHE_INDEX.with_suffix(".tmp")
+    tmp_path.write_text(json.dumps(index, indent=2, sort_keys=True))
+    tmp_path.replace(TRAINING_CACHE_INDEX)
+
+def pipeline_scaler(pipeline):
+    """Archivo del escalador compartido que usa un pipeline (None si lleva su propio escalador)"""
+    scaler = pipeline.steps[0][1]
+    return scaler.filename if isinstance(scaler, SharedScaler) else None
+
+def skip_cached_pipelines(pipelines, cache_keys, progress_tracker):
+    """Quitar los pipelines cuyo modelo guardado ya corresponde a los mismos datos y configuración"""
+    index = load_training_cache_index()
+    for name in list(pipelines):
+        entry = index.get(name)
+        # Entradas de versiones anteriores del índice (solo el hash): no se sabe con qué escalador se entrenó
+        if not isinstance(entry, dict) or entry.get("key") != cache_keys[name] or model_file(name) is None:
+            continue
+        if entry.get("scaler") is not None and not (MODELS_PATH / entry["scaler"]).exists():
+            continue
+        del pipelines[name]
+        progress_tracker.update_progress(4, f"   ⚡ {name}: sin cambios, se reutiliza el modelo guardado")
+
+def search_pipeline_orders(pipelines, scaled_df, config, progress_tracker):
+    """Buscar el mejor orden de cada pipeline SARIMA/SARIMAX y guardarlo en su estimador"""
+    targets = [(name, pipeline.steps[-1][1]) for name, pipeline in pipelines.items()
+               if isinstance(pipeline.steps[-1][1], (SarimaModel, SarimaxModel))]
+    candidates = candidate_orders(config.SARIMA_ORDER, config.SARIMA_SEASONAL_ORDER)
+    deadline = None if config.ORDER_SEARCH_BUDGET is None else time.monotonic() + config.ORDER_SEARCH_BUDGET
+
+    progress_tracker.update_progress(4, f"🔎 Búsqueda automática de órdenes: {len(candidates)} candidatos por variable")
+
+    for i, (name, estimator) in enumerate(targets):
+        # El presupuesto restante se reparte entre las variables que faltan
+        budget = None
+        if deadline is not None:
+            budget = max(0.0, deadline - time.monotonic()) / (len(targets) - i)
+            if budget <= 0:
+                progress_tracker.update_progress(4, f"   ⏱️ {name}: tiempo de búsqueda agotado, se mantiene el orden configurado")
+                continue
+
+        if isinstance(estimator, SarimaModel):
+            series, exog, trend = scaled_df[estimator.column], None, estimator.trend
+        else:
+            series, exog, trend = scaled_df[estimator.target_col], scaled_df[estimator.exog_cols], None
+
+        result = search_sarima_order(
+            series, candidates, exog=exog, trend=trend,
+            n_jobs=config.N_JOBS, time_budget=budget,
+            progress_callback=lambda message: progress_tracker.update_progress(4, f"   {message}")
+        )
+        if result is None:
+            progress_tracker.update_progress(4, f"   ⚠️ {name}: ningún candidato convergió, se mantiene el orden configurado")
+            continue
+
+        estimator.set_params(order=result['order'], seasonal_order=result['seasonal_order'])
+        # El resultado de la búsqueda se guarda junto al modelo
+        estimator.order_search_ = result
+        progress_tracker.update_progress(4, f"   🏆 {name}: SARIMA{result['order']}x{result['seasonal_order']} "
+                                            f"({result['criterion'].upper()}={result['value']:.1f})")
+
+def warm_start_pipelines(pipelines, progress_tracker):
+    """Sustituir cada pipeline por su modelo guardado (si es compatible) para reentrenarlo en caliente"""
+    for name, pipeline in pipelines.items():
+        save_path = model_file(name)
+        if save_path is None:
+            continue
+
+        try:
+            previous = load_model(save_path)
+        except Exception as e:
+            progress_tracker.update_progress(4, f"   ⚠️ No se pudo cargar {name} para reentrenar en caliente: {str(e)}")
+            continue
+
+        estimator = pipeline.steps[-1][1]
+        previous_estimator = previous.steps[-1][1]
+        params = {k: v for k, v in estimator.get_params().items() if k != 'warm_start'}
+        previous_params = {k: v for k, v in previous_estimator.get_params().items() if k != 'warm_start'}
+
+        # Si ha cambiado la configuración (órdenes, lags...) los parámetros anteriores no sirven
+        if type(previous_estimator) is not type(estimator) or params != previous_params:
+            progress_tracker.update_progress(4, f"   🔁 {name}: configuración distinta, se entrena desde cero")
+            continue
+
+        previous_estimator.set_params(warm_start=True)
+        if isinstance(pipeline.steps[0][1], SharedScaler):
+            # Se reentrena con los datos escalados de este entrenamiento: pasa a usar su escalador
+            previous.steps[0] = pipeline.steps[0]
+        pipelines[name] = previous
+        progress_tracker.update_progress(4, f"   ♨️ {name}: reentrenamiento en caliente desde el modelo guardado")
+
+def train_pipelines_sequential(pipelines, train_df, scaled_df, progress_tracker, total_substeps):
+    """Entrenar los pipelines uno detrás de otro en el proceso actual"""
+    saved = []
+    for name, pipeline in pipelines.items():
+        progress_tracker.update_progress(None, f"\n➡️ Entrenando: {name}", is_substep=True, substep_total=total_substeps)
+
+        try:
+            # Entrenar pipeline
+            fit_pipeline(name, pipeline, train_df, scaled_df)
+            progress_tracker.update_progress(None, f"   ✅ Entrenado exitosamente", is_substep=True)
+            # Guardar modelo
+            save_path = save_pipeline(name, pipeline)
+            saved.append(name)
+            progress_tracker.update_progress(None, f"   💾 Guardado en: {save_path}", is_substep=True)
+
+        except Exception as e:
+            progress_tracker.update_progress(4, f"   ❌ Error entrenando {name}: {str(e)}")
+
+    return saved
+
+def train_pipelines_parallel(pipelines, train_df, scaled_df, n_jobs, progress_tracker, total_substeps):
+    """Entrenar los pipelines en un pool de procesos, guardando cada modelo en cuanto termina"""
+    progress_tracker.update_progress(4, f"⚙️ Entrenamiento en paralelo con {n_jobs} procesos")
+
+    # 'spawn' en lugar de 'fork': hacer fork de un proceso con hilos (Flask, TensorFlow) puede bloquear los workers
+    context = multiprocessing.get_context("spawn")
+    saved = []
+    with ProcessPoolExecutor(max_workers=n_jobs, mp_context=context) as executor:
+        futures = {}
+        for name, pipeline in pipelines.items():
+            progress_tracker.update_progress(None, f"\n➡️ Entrenando: {name}", is_substep=True, substep_total=total_substeps)
+            futures[executor.submit(fit_pipeline, name, pipeline, train_df, scaled_df)] = name
+
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                _, fitted_pipeline = future.result()
+                progress_tracker.update_progress(None, f"   ✅ {name} entrenado exitosamente", is_substep=True)
+                # Guardar modelo
+                save_path = save_pipeline(name, fitted_pipeline)
+                saved.append(name)
+                progress_tracker.update_progress(None, f"   💾 Guardado en: {save_path}", is_substep=True)
+
+            except Exception as e:
+                progress_tracker.update_progress(4, f"   ❌ Error entrenando {name}: {str(e)}")
+
+    return saved
+
 def train_and_save(progress_tracker, config):
     """Función principal para entrenar y guardar modelos"""    
     # 1. Cargar datos
@@ -204,54 +438,66 @@ def train_and_save(progress_tracker, config):
     
     # 3. Crear pipelines
     progress_tracker.update_progress(3, "\n🔨 Creando pipelines...")
+
+    # El escalado se ajusta una única vez y se comparte entre todos los pipelines
+    scaler_filename = shared_scaler_filename(train_df)
     
     pipelines = {}
     
     # SARIMA pipelines
-    sarima_pipes = create_sarima_pipelines(train_df, config)
+    sarima_pipes = create_sarima_pipelines(train_df, config, scaler_filename)
     pipelines.update(sarima_pipes)
     
     # SARIMAX pipelines (opcional, comentar si es muy lento)
-    # sarimax_pipes = create_sarimax_pipelines(train_df, config)
+    # sarimax_pipes = create_sarimax_pipelines(train_df, config, scaler_filename)
     # pipelines.update(sarimax_pipes)
     
     # VAR pipeline
-    var_pipe = create_var_pipeline(train_df, config)
+    var_pipe = create_var_pipeline(train_df, config, scaler_filename)
     pipelines["var_multivariate"] = var_pipe
     
     # LSTM pipeline (opcional, comentar si no tienes tensorflow)
     # lstm_pipe = create_lstm_pipeline(train_df)
     # pipelines["lstm_multivariate"] = lstm_pipe
     
-    # Agregación de la cantidad de elementos por cada clave del dicc
+    # 4. Entrenar y guardar modelos
+    progress_tracker.update_progress(4, f"\n🎯 Entrenando {len(pipelines)} modelos...")
+
+    # Solo se reentrenan los modelos cuyos datos o configuración han cambiado
+    cache_keys = {name: training_cache_key(pipeline, train_df, config) for name, pipeline in pipelines.items()}
+    skip_cached_pipelines(pipelines, cache_keys, progress_tracker)
+
+    # Agregación de la cantidad de elementos por cada clave del dicc (solo los que se entrenan)
     total_models = sum(len(v) for v in pipelines.values())
     substeps_per_model = 4
     total_substeps = total_models * substeps_per_model
-                       
-    # 4. Entrenar y guardar modelos
-    progress_tracker.update_progress(4, f"\n🎯 Entrenando {len(pipelines)} modelos...")
-    
-    for name, pipeline in pipelines.items():
-            progress_tracker.update_progress(None, f"\n➡️ Entrenando: {name}", is_substep=True, substep_total=total_substeps)
 
+    # Si todos los modelos vienen de la caché no hace falta ajustar ni guardar el escalador
+    scaled_train_df = fit_shared_scaler(train_df, scaler_filename, progress_tracker) if pipelines else None
 
-            try:
-                # Entrenar pipeline
-                pipeline.fit(train_df)
-                progress_tracker.update_progress(None, f"   ✅ Entrenado exitosamente", is_substep=True)            
-                # Guardar modelo
-                save_path = MODELS_PATH / f"{name}_model.pkl"
-                joblib.dump(pipeline, save_path, compress=3)  # compress para archivos más pequeños
-                progress_tracker.update_progress(None, f"   💾 Guardado en: {save_path}", is_substep=True)            
-                
-            except Exception as e:
-                progress_tracker.update_progress(4, f"   ❌ Error entrenando {name}: {str(e)}")     
-        
+    if config.AUTO_ORDER:
+        search_pipeline_orders(pipelines, scaled_train_df, config, progress_tracker)
+
+    if config.INCREMENTAL:
+        warm_start_pipelines(pipelines, progress_tracker)
+
+    saved = []
+    n_jobs = min(config.N_JOBS, len(pipelines))
+    if n_jobs > 1:
+        saved = train_pipelines_parallel(pipelines, train_df, scaled_train_df, n_jobs, progress_tracker, total_substeps)
+    elif pipelines:
+        saved = train_pipelines_sequential(pipelines, train_df, scaled_train_df, progress_tracker, total_substeps)
 
+    if saved:
+        # Los modelos en memoria de predicciones anteriores ya no son los del disco
+        models_lru.invalidate([model_file(name) for name in saved])
 
+        index = load_training_cache_index()
+        index.update({name: {"key": cache_keys[name], "scaler": pipeline_scaler(pipelines[name])} for name in saved})
+        save_training_cache_index(index)
 
     # Verificar que se guardaron
-    model_files = list(MODELS_PATH.glob("*.pkl"))
+    model_files = find_model_files()
     for file in model_files:
         progress_tracker.update_progress(None, f"   • {file.name}", is_substep=True)          
     
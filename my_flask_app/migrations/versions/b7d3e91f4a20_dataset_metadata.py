@@ -0,0 +1,45 @@
+"""Dataset metadata
+
+Revision ID: b7d3e91f4a20
+Revises: 69bf73e7ba1d
+Create Date: 2026-10-18 10:12:41.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7d3e91f4a20'
+down_revision = '69bf73e7ba1d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Los metadatos de los registros existentes se completan en la primera llamada a /api/archivos_datos
+    with op.batch_alter_table('dataset', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('rows', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('columns', sa.JSON(), nullable=True))
+        batch_op.add_column(sa.Column('date_start', sa.Date(), nullable=True))
+        batch_op.add_column(sa.Column('date_end', sa.Date(), nullable=True))
+        batch_op.add_column(sa.Column('size', sa.BigInteger(), nullable=True))
+        batch_op.add_column(sa.Column('content_hash', sa.String(length=64), nullable=True))
+        batch_op.alter_column('user_id', existing_type=sa.Integer(), nullable=True)
+        batch_op.create_index(batch_op.f('ix_dataset_content_hash'), ['content_hash'], unique=False)
+        batch_op.create_index(batch_op.f('ix_dataset_filename'), ['filename'], unique=False)
+
+
+def downgrade():
+    # Los datos compartidos (sin usuario) no caben en el esquema anterior
+    op.execute("DELETE FROM dataset WHERE user_id IS NULL")
+    with op.batch_alter_table('dataset', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_dataset_filename'))
+        batch_op.drop_index(batch_op.f('ix_dataset_content_hash'))
+        batch_op.alter_column('user_id', existing_type=sa.Integer(), nullable=False)
+        batch_op.drop_column('content_hash')
+        batch_op.drop_column('size')
+        batch_op.drop_column('date_end')
+        batch_op.drop_column('date_start')
+        batch_op.drop_column('columns')
+        batch_op.drop_column('rows')
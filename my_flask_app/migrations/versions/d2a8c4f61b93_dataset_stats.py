@@ -0,0 +1,29 @@
+"""Dataset stats
+
+Revision ID: d2a8c4f61b93
+Revises: b7d3e91f4a20
+Create Date: 2026-10-18 12:47:05.530912
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2a8c4f61b93'
+down_revision = 'b7d3e91f4a20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('dataset', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('stats', sa.JSON(), nullable=True))
+
+    # Sin hash, `flask datasets backfill` vuelve a procesar los archivos existentes y completa sus estadísticas
+    op.execute("UPDATE dataset SET content_hash = NULL")
+
+
+def downgrade():
+    with op.batch_alter_table('dataset', schema=None) as batch_op:
+        batch_op.drop_column('stats')
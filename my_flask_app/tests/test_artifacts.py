@@ -0,0 +1,87 @@
+# tests/test_artifacts.py
+"""Equivalencia de los artefactos compactos con los resultados de statsmodels y el ColumnTransformer"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("tensorflow")
+
+from sklearn.pipeline import Pipeline
+
+from app.artifacts import COMPACT_EXTENSION, CompactScaler, load_model, load_scaler, save_model, save_scaler
+from app.ml_models import SarimaModel, SarimaxModel, SharedScaler, VarModel
+from app.train_models import create_custom_scaler
+
+
+STEPS = 30
+
+
+@pytest.fixture(scope="module")
+def data():
+    """Serie diaria con tendencia, estacionalidad semanal y variables relacionadas"""
+    rng = np.random.default_rng(0)
+    n = 300
+    t = np.arange(n)
+    a = 10 + 0.02 * t + 2 * np.sin(2 * np.pi * t / 7) + rng.normal(0, 0.5, n)
+    b = 0.5 * a + rng.normal(0, 1, n)
+    c = 1000 + np.cumsum(rng.normal(0, 0.3, n))
+    return pd.DataFrame({"a": a, "b": b, "c": c}, index=pd.date_range("2023-01-01", periods=n, freq="D"))
+
+
+def round_trip(name, estimator, step, tmp_path):
+    """Guardar y cargar el pipeline; comprueba que se ha usado el formato compacto"""
+    path = save_model(name, Pipeline([("scaler", SharedScaler()), (step, estimator)]), models_path=tmp_path)
+    assert path.suffix == COMPACT_EXTENSION
+    return load_model(path).steps[-1][1]
+
+
+def test_sarima_forecast_matches_statsmodels(data, tmp_path):
+    estimator = SarimaModel(column="a", order=(1, 1, 1), seasonal_order=(1, 0, 1, 7)).fit(data)
+    loaded = round_trip("sarima_a", estimator, "sarima", tmp_path)
+
+    expected = estimator.predict(data, n_periods=STEPS)
+    result = loaded.predict(data, n_periods=STEPS)
+
+    np.testing.assert_allclose(result.to_numpy(), expected.to_numpy(), rtol=1e-8, atol=1e-10)
+    pd.testing.assert_index_equal(result.index, expected.index)
+
+
+def test_sarimax_forecast_matches_statsmodels(data, tmp_path):
+    train, future = data.iloc[:-STEPS], data.iloc[-STEPS:]
+    estimator = SarimaxModel(target_col="a", exog_cols=["b", "c"], order=(1, 0, 1),
+                             seasonal_order=(1, 0, 0, 7)).fit(train)
+    loaded = round_trip("sarimax_a", estimator, "sarimax", tmp_path)
+
+    # Con exógenas futuras conocidas y, con menos filas que pasos, repitiendo la última
+    for X in (future, future.iloc[-1:]):
+        expected = estimator.predict(X, n_periods=STEPS)
+        result = loaded.predict(X, n_periods=STEPS)
+        np.testing.assert_allclose(result.to_numpy(), expected.to_numpy(), rtol=1e-8, atol=1e-10)
+        pd.testing.assert_index_equal(result.index, expected.index)
+
+
+def test_var_forecast_matches_statsmodels(data, tmp_path):
+    estimator = VarModel(maxlags=5, ic="aic").fit(data)
+    loaded = round_trip("var_multivariate", estimator, "var", tmp_path)
+
+    expected = estimator.predict(data, n_periods=STEPS)
+    result = loaded.predict(data, n_periods=STEPS)
+
+    assert loaded.fitted_model.k_ar == estimator.fitted_model.k_ar
+    np.testing.assert_allclose(result.to_numpy(), expected.to_numpy(), rtol=1e-8, atol=1e-10)
+
+
+def test_compact_scaler_matches_column_transformer(data, tmp_path):
+    # La presión va al RobustScaler y el resto al StandardScaler
+    data = data.rename(columns={"c": "Presión atmosférica"})
+    column_transformer = create_custom_scaler(data).fit(data)
+    compact = CompactScaler.from_column_transformer(column_transformer)
+    loaded = load_scaler(save_scaler(column_transformer, "shared_scaler_test.npz", models_path=tmp_path))
+
+    expected = column_transformer.transform(data)
+    for scaler in (compact, loaded):
+        scaled = scaler.transform(data)
+        np.testing.assert_allclose(scaled.to_numpy(), expected, rtol=1e-12)
+        np.testing.assert_allclose(scaler.inverse_transform(scaled).to_numpy(), data[scaler.columns].to_numpy(),
+                                   rtol=1e-12)
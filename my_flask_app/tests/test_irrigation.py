@@ -0,0 +1,92 @@
+# tests/test_irrigation.py
+"""Equivalencia del cálculo de riego vectorizado con la versión anterior (fila a fila)"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("tensorflow")
+
+from app.auxiliary_prediction_functions import (
+    COEF_PRECIPITACION, EFICIENCIA_RIEGO, calcular_ETc, calculate_et0_fao_penman_monteith,
+    calculate_irrigation, irrigation_kernel,
+)
+
+
+COLUMNS = ("ETc", "Pe", "NN", "NB", "ETc_RDC", "NN_RDC", "NB_RDC")
+
+
+class Tracker:
+    def update_progress(self, *args, **kwargs):
+        pass
+
+
+def rowwise_irrigation(df):
+    """Riego como lo calculaba la versión original, con apply fila a fila"""
+    df = df.copy()
+    df["ET0"] = calculate_et0_fao_penman_monteith(df)
+    df["dia"] = pd.DatetimeIndex(df.index).dayofyear
+    df["ETc"] = df.apply(lambda fila: calcular_ETc(fila["dia"], fila["ET0"], None), axis=1)
+
+    def calcular_pe(precipitacion):
+        if precipitacion > 3:
+            return precipitacion * COEF_PRECIPITACION
+        return 0
+
+    df["Pe"] = df["Precipitaciones"].apply(calcular_pe)
+    df["NN"] = (df["ETc"] - df["Pe"]).clip(lower=0)
+    df["NB"] = df["NN"] / EFICIENCIA_RIEGO
+    df["ETc_RDC"] = df.apply(lambda fila: calcular_ETc(fila["dia"], fila["ET0"], None) * 0.2, axis=1)
+    df["NN_RDC"] = (df["ETc_RDC"] - df["Pe"]).clip(lower=0)
+    df["NB_RDC"] = df["NN_RDC"] / EFICIENCIA_RIEGO
+    return df
+
+
+def forecast(start, days, seed):
+    """Predicción diaria con lluvia en torno al umbral de 3 mm y días sin datos"""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "Temperatura": rng.uniform(2, 38, days),
+        "Humedad relativa": rng.uniform(15, 100, days),
+        "Velocidad del viento": rng.uniform(0, 8, days),
+        "Presión atmosférica": rng.uniform(990, 1030, days),
+        "Radiación solar": rng.uniform(2e6, 30e6, days),
+        "Precipitaciones": rng.choice([0, 1.5, 2.999, 3, 3.001, 12.0], days),
+    }, index=pd.date_range(start, periods=days, freq="D"))
+    df.iloc[3, df.columns.get_loc("Precipitaciones")] = np.nan
+    df.iloc[5, df.columns.get_loc("Temperatura")] = np.nan
+    df.iloc[7] = np.nan
+    return df
+
+
+def test_calculate_irrigation_matches_rowwise():
+    # Año bisiesto completo: todas las etapas de la curva de Kc y el día 366
+    df = forecast("2024-01-01", 366, seed=0)
+    expected = rowwise_irrigation(df)
+    result = calculate_irrigation(df.copy(), Tracker())
+
+    for column in ("ET0", *COLUMNS):
+        np.testing.assert_allclose(result[column].to_numpy(), expected[column].to_numpy(),
+                                   rtol=1e-12, equal_nan=True, err_msg=column)
+
+
+def test_precipitation_threshold():
+    result = irrigation_kernel(np.full(4, 5.0), [2.999, 3, 3.001, np.nan], np.full(4, 100))
+    np.testing.assert_array_equal(result["Pe"], [0, 0, 3.001 * COEF_PRECIPITACION, 0])
+
+
+def test_kernel_matches_rowwise_for_many_forecasts():
+    # Varias predicciones a la vez como arrays (n_predicciones, n_dias), con fechas de inicio distintas
+    forecasts = [forecast(start, 90, seed) for seed, start in enumerate(["2023-02-10", "2024-06-01", "2024-11-20"])]
+    et0 = np.stack([calculate_et0_fao_penman_monteith(df).to_numpy() for df in forecasts])
+    precipitation = np.stack([df["Precipitaciones"].to_numpy() for df in forecasts])
+    day_of_year = np.stack([df.index.dayofyear.to_numpy() for df in forecasts])
+
+    result = irrigation_kernel(et0, precipitation, day_of_year)
+
+    for i, df in enumerate(forecasts):
+        expected = rowwise_irrigation(df)
+        for column in COLUMNS:
+            assert result[column].shape == (3, 90)
+            np.testing.assert_allclose(result[column][i], expected[column].to_numpy(),
+                                       rtol=1e-12, equal_nan=True, err_msg=column)
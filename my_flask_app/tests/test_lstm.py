@@ -0,0 +1,81 @@
+# tests/test_lstm.py
+"""Equivalencia del LSTMModel con las versiones anteriores (bucles de Python)"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+tf = pytest.importorskip("tensorflow")
+
+from app import ml_models
+from app.ml_models import LSTMModel
+
+
+def loop_sequences(data, sequence_length):
+    """Ventanas de entrenamiento como las construía el bucle original de _create_sequences"""
+    X, y = [], []
+    for i in range(sequence_length, len(data)):
+        X.append(data[i - sequence_length:i])
+        y.append(data[i])
+    return np.array(X), np.array(y)
+
+
+def test_create_sequences_matches_loop():
+    data = np.random.default_rng(0).random((120, 4))
+    X, y = LSTMModel(sequence_length=12)._create_sequences(data)
+    X_loop, y_loop = loop_sequences(data, 12)
+
+    np.testing.assert_array_equal(X, X_loop)
+    np.testing.assert_array_equal(y, y_loop)
+
+
+@pytest.mark.parametrize("max_bytes", [ml_models.WINDOW_ARRAY_MAX_BYTES, 0], ids=["array", "batched"])
+def test_sequence_dataset_matches_loop(monkeypatch, max_bytes):
+    # Con max_bytes=0 las ventanas se generan por lotes, como en las series largas
+    monkeypatch.setattr(ml_models, "WINDOW_ARRAY_MAX_BYTES", max_bytes)
+    data = np.random.default_rng(1).random((200, 3))
+    batches = list(LSTMModel(sequence_length=10, batch_size=16)._sequence_dataset(data))
+    X_loop, y_loop = loop_sequences(data.astype(np.float32), 10)
+
+    assert [len(x) for x, _ in batches] == [16] * 11 + [14]
+    np.testing.assert_array_equal(np.concatenate([x.numpy() for x, _ in batches]), X_loop)
+    np.testing.assert_array_equal(np.concatenate([y.numpy() for _, y in batches]), y_loop)
+
+
+def loop_rollout(keras_model, window, n_periods):
+    """Predicción paso a paso como la hacía LSTMModel.predict antes del rollout compilado"""
+    predictions, current = [], window.copy()
+    for _ in range(n_periods):
+        next_step = keras_model.predict(current, verbose=0)
+        predictions.append(next_step[0])
+        current = np.roll(current, -1, axis=1)
+        current[0, -1, :] = next_step[0]
+    return np.array(predictions)
+
+
+@pytest.fixture(scope="module")
+def fitted_lstm():
+    tf.keras.utils.set_random_seed(0)
+    t = np.arange(150)
+    X = pd.DataFrame({"a": np.sin(t / 7), "b": np.cos(t / 11), "c": t / 150})
+    model = LSTMModel(sequence_length=8, lstm_units=[6, 4], epochs=2, batch_size=16)
+    return model.fit(X), X
+
+
+def test_predict_matches_loop(fitted_lstm):
+    model, X = fitted_lstm
+    expected = model.scaler.inverse_transform(loop_rollout(model.model, model.last_sequence, 20))
+
+    np.testing.assert_allclose(model.predict(X, n_periods=20).to_numpy(), expected, rtol=1e-5, atol=1e-6)
+
+
+def test_predict_many_matches_loop(fitted_lstm):
+    model, X = fitted_lstm
+    windows = np.stack([X.to_numpy()[start:start + 8] for start in (0, 40, 100)])
+    predictions = model.predict_many(windows, n_periods=15)
+
+    assert predictions.shape == (3, 15, 3)
+    for window, predicted in zip(windows, predictions):
+        scaled = model.scaler.transform(pd.DataFrame(window, columns=X.columns))[np.newaxis]
+        expected = model.scaler.inverse_transform(loop_rollout(model.model, scaled, 15))
+        np.testing.assert_allclose(predicted, expected, rtol=1e-5, atol=1e-6)